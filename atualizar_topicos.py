@@ -0,0 +1,187 @@
+import pandas as pd
+import typer
+from pathlib import Path
+from datetime import datetime
+import sys
+import time
+import numpy as np
+from matriz_embeddings import ler_documentos, carregar_matriz
+from resultados_topicos import garantir_coluna_pais, tabela_topicos
+from instrumentacao import Medicao
+
+app = typer.Typer()
+
+# Atualização incremental do modelo global (KMeans) com um lote de documentos novos:
+#   - UMAP já treinado é usado só com transform (redutor congelado)
+#   - centros do KMeans são atualizados como k-means online (média acumulada por cluster)
+#   - c-TF-IDF, palavras e embedding só dos tópicos que receberam documentos
+
+def path_contagens(model_path: Path) -> Path:
+    return Path(f"{model_path}_contagens.npy")
+
+def contagens_clusters(model, model_path: Path) -> np.ndarray:
+    """Quantos documentos cada cluster já absorveu (do treino + atualizações anteriores)."""
+    path = path_contagens(model_path)
+    if path.exists():
+        return np.load(path)
+    km = model.hdbscan_model
+    return np.bincount(km.labels_, minlength=km.n_clusters).astype(np.int64)
+
+def atualizar_centros(centros, contagens, reduzidos, clusters):
+    """Um passo de k-means online: cada centro vira a média de tudo que ele já recebeu."""
+    soma_novos = np.zeros_like(centros, dtype=np.float64)
+    np.add.at(soma_novos, clusters, reduzidos)
+    n_novos = np.bincount(clusters, minlength=len(centros))
+
+    total = contagens + n_novos
+    novos_centros = centros.astype(np.float64).copy()
+    afetados = n_novos > 0
+    novos_centros[afetados] = (
+        centros[afetados] * contagens[afetados, None] + soma_novos[afetados]
+    ) / total[afetados, None]
+    return novos_centros.astype(centros.dtype), total, n_novos
+
+def atualizar_representacoes(model, textos, topicos, embeddings):
+    """Atualiza c-TF-IDF, palavras e embedding só dos tópicos afetados.
+
+    A linha nova é a média ponderada (pelo nº de documentos) entre a linha antiga
+    e o c-TF-IDF dos documentos novos, calculado com o mesmo vocabulário e o mesmo idf.
+    """
+    offset = 1 if -1 in model.topic_sizes_ else 0
+    palavras = model.vectorizer_model.get_feature_names_out()
+
+    docs = pd.DataFrame({"texto": textos, "topico": topicos})
+    docs_por_topico = docs.groupby("topico")["texto"].apply(" ".join)
+    novos_ctfidf = model.ctfidf_model.transform(model.vectorizer_model.transform(docs_por_topico.values))
+
+    c_tf_idf = model.c_tf_idf_.tolil()
+    for i, topico in enumerate(docs_por_topico.index):
+        topico = int(topico)
+        linha = topico + offset
+        n_antes = model.topic_sizes_.get(topico, 0)
+        n_novos = int((topicos == topico).sum())
+        peso_antigo = n_antes / (n_antes + n_novos)
+
+        nova_linha = peso_antigo * model.c_tf_idf_[linha] + (1 - peso_antigo) * novos_ctfidf[i]
+        c_tf_idf[linha] = nova_linha
+
+        valores = nova_linha.toarray().ravel()
+        melhores = np.argsort(valores)[::-1][:model.top_n_words]
+        model.topic_representations_[topico] = [(palavras[j], float(valores[j])) for j in melhores if valores[j] > 0]
+
+        if getattr(model, "topic_embeddings_", None) is not None:
+            media_novos = np.asarray(embeddings[topicos == topico], dtype=np.float64).mean(axis=0)
+            model.topic_embeddings_[linha] = peso_antigo * model.topic_embeddings_[linha] + (1 - peso_antigo) * media_novos
+
+        model.topic_sizes_[topico] = n_antes + n_novos
+
+    from scipy import sparse
+    model.c_tf_idf_ = sparse.csr_matrix(c_tf_idf)
+    return [int(t) for t in docs_por_topico.index]
+
+def divergencia_js(p, q):
+    p = p / p.sum()
+    q = q / q.sum()
+    m = (p + q) / 2
+    kl = lambda a, b: np.sum(np.where(a > 0, a * np.log2(np.where(a > 0, a, 1) / np.where(b > 0, b, 1)), 0))
+    return float((kl(p, m) + kl(q, m)) / 2)
+
+@app.command()
+def main(
+    input_file: str = typer.Argument(..., help="Parquet de embeddings dos documentos novos (saída do embeddings.py)"),
+    model_path: str = typer.Option("results/topics/global_bertopic_model", help="Modelo global salvo"),
+    output_file: str = typer.Option("results/topics/topics_atualizacao.parquet", help="Tópicos atribuídos aos documentos novos"),
+    drift_file: str = typer.Option("results/topics/topic_drift.csv", help="Histórico de drift (uma linha por tópico afetado)"),
+):
+    medicao = Medicao("atualizar_topicos", input_file=input_file, model_path=model_path)
+    print("--- Atualização incremental do modelo global ---")
+    inicio = time.perf_counter()
+
+    path_in = Path(input_file)
+    path_model = Path(model_path)
+    for path in [path_in, path_model]:
+        if not path.exists():
+            print(f"ERRO: Arquivo não encontrado: {path}")
+            sys.exit(1)
+
+    df = ler_documentos(path_in)
+    if 'texto' not in df.columns or not garantir_coluna_pais(df):
+        print(f"ERRO: Faltam colunas obrigatórias ('texto' e 'pais' ou 'id'). Encontrado: {list(df.columns)}")
+        sys.exit(1)
+
+    embeddings = carregar_matriz(df, path_in)
+    if embeddings is None:
+        print("ERRO: Embeddings não encontrados (nem coluna 'embedding' nem matriz .npy).")
+        sys.exit(1)
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    print(f"Carregando modelo: {model_path}")
+    from bertopic import BERTopic
+    model = BERTopic.load(str(path_model))
+    km = model.hdbscan_model
+    if not hasattr(km, "cluster_centers_"):
+        print("ERRO: A atualização incremental só funciona com o modelo KMeans (BERTopic.py).")
+        sys.exit(1)
+    medicao.marcar("model_load")
+
+    # 1. Redução com o UMAP já treinado + atribuição ao centro mais próximo
+    reduzidos = model.umap_model.transform(embeddings)
+    clusters = km.predict(reduzidos)
+
+    # 2. Atualiza os centros (k-means online)
+    contagens = contagens_clusters(model, path_model)
+    centros_antigos = km.cluster_centers_.copy()
+    km.cluster_centers_, contagens_novas, n_novos = atualizar_centros(centros_antigos, contagens, reduzidos, clusters)
+
+    # cluster do KMeans -> id do tópico no BERTopic
+    mapa = model.topic_mapper_.get_mappings(original_topics=True)
+    topicos = np.array([mapa[c] for c in clusters])
+
+    # 3. Drift: antes de mexer nos tamanhos dos tópicos
+    distancias = np.linalg.norm(reduzidos - km.cluster_centers_[clusters], axis=1)
+    agora = datetime.now().isoformat(timespec="seconds")
+    afetados = np.flatnonzero(n_novos)
+    drift = pd.DataFrame({
+        "data": agora,
+        "topic_id": [mapa[c] for c in afetados],
+        "docs_antes": contagens[afetados],
+        "docs_novos": n_novos[afetados],
+        "deslocamento_centro": np.linalg.norm(km.cluster_centers_[afetados] - centros_antigos[afetados], axis=1),
+        "dist_media_novos": [distancias[clusters == c].mean() for c in afetados],
+    })
+    js = divergencia_js(contagens.astype(float), n_novos.astype(float))
+
+    # 4. Representações só dos tópicos afetados
+    atualizados = atualizar_representacoes(model, df['texto'].astype(str).tolist(), topicos, embeddings)
+
+    medicao.marcar("process")
+
+    # 5. Salvamento
+    model.save(str(path_model))
+    np.save(path_contagens(path_model), contagens_novas)
+
+    df['topic_id'] = topicos
+    df['topic_prob'] = None
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    tabela_topicos(df).to_parquet(path_out, index=False)
+
+    path_drift = Path(drift_file)
+    path_drift.parent.mkdir(parents=True, exist_ok=True)
+    drift.assign(js_distribuicao=js).to_csv(
+        path_drift, mode='a', header=not path_drift.exists(), index=False, encoding='utf-8'
+    )
+
+    medicao.marcar("write")
+
+    duracao = time.perf_counter() - inicio
+    print(f"\n   -> {len(df)} documentos novos em {len(atualizados)} tópicos")
+    print(f"   -> Divergência JS (histórico x lote): {js:.4f}")
+    print(f"   -> Maior deslocamento de centro: {drift['deslocamento_centro'].max():.4f}")
+    print(f"   -> Tópicos salvos em: {output_file}")
+    print(f"\n✅ Modelo atualizado em {duracao:.1f}s: {model_path}")
+    medicao.finalizar(n_docs=len(df))
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,262 @@
+import pandas as pd
+import numpy as np
+import typer
+import json
+import platform
+import sys
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+app = typer.Typer()
+
+# Benchmark das funções centrais de cada etapa sobre corpora sintéticos.
+# O corpus sintético copia as estatísticas dos CSVs de país (mistura de idiomas,
+# tamanho dos textos, hashtags) e é gerado em múltiplos do tamanho real (1x, 10x, ...).
+
+PAISES = ['Brasil', 'Chile', 'Espanha', 'Inglaterra', 'Moçambique']
+ETAPAS = ['detect_language', 'pegar_lemas', 'pegar_lemas_em_lote', 'extrair_entidades',
+          'kwic_for_term', 'kwic_indexado', 'encoding', 'fit_transform']
+TERMOS_KWIC = ['mulher', 'mujer', 'woman', 'violencia', 'trabalho']
+
+def slug(nome):
+    nome = nome.strip().lower()
+    return ''.join(c for c in unicodedata.normalize('NFD', nome) if unicodedata.category(c) != 'Mn')
+
+def estatisticas_corpus(pasta="."):
+    """Lê os CSVs de país (e os *_lang.csv, quando existem) e junta as estatísticas usadas no gerador."""
+    stats = {"paises": {}, "vocab": {}, "hashtags": Counter()}
+    for pais in PAISES:
+        path = Path(pasta) / f"{pais}.csv"
+        if not path.exists():
+            continue
+        df = pd.read_csv(path, sep=';', encoding='utf-8-sig')
+        df.columns = [c.lower() for c in df.columns]
+        textos = df['texto'].dropna().astype(str)
+
+        path_lang = Path(pasta) / "data" / "interim" / f"{slug(pais)}_lang.csv"
+        if path_lang.exists():
+            idiomas = pd.read_csv(path_lang)['idioma'].dropna().astype(str)
+        else:
+            idiomas = pd.Series(['desconhecido'] * len(textos))
+        idiomas = idiomas.iloc[:len(textos)].reset_index(drop=True)
+
+        palavras = textos.str.split()
+        stats["paises"][pais] = {
+            "n": len(textos),
+            "idiomas": idiomas.value_counts(normalize=True).to_dict(),
+            "tamanhos": palavras.map(len).tolist(),
+            "n_hashtags": palavras.map(lambda p: sum(w.startswith('#') for w in p)).tolist(),
+        }
+        for idioma, lista in zip(idiomas, palavras):
+            vocab = stats["vocab"].setdefault(idioma, Counter())
+            vocab.update(w for w in lista if not w.startswith('#'))
+            stats["hashtags"].update(w for w in lista if w.startswith('#'))
+    return stats
+
+def gerar_corpus(stats, escala, seed=42):
+    """Gera um corpus sintético com escala * (tamanho real) documentos."""
+    rng = np.random.default_rng(seed)
+    paises = list(stats["paises"])
+    tamanhos_pais = np.array([stats["paises"][p]["n"] for p in paises], dtype=float)
+    n_docs = int(tamanhos_pais.sum() * escala)
+
+    vocabs = {}
+    for idioma, contagem in stats["vocab"].items():
+        palavras, freq = zip(*contagem.items())
+        vocabs[idioma] = (np.array(palavras, dtype=object), np.array(freq, dtype=float) / sum(freq))
+    tags, freq_tags = zip(*stats["hashtags"].items()) if stats["hashtags"] else (("#cyber",), (1,))
+    tags, freq_tags = np.array(tags, dtype=object), np.array(freq_tags, dtype=float) / sum(freq_tags)
+
+    pais_doc = rng.choice(len(paises), size=n_docs, p=tamanhos_pais / tamanhos_pais.sum())
+
+    # idioma, tamanho e número de hashtags sorteados de uma vez para todos os docs de cada país
+    idioma_doc = np.empty(n_docs, dtype=object)
+    tamanho_doc = np.empty(n_docs, dtype=np.int64)
+    tags_doc = np.empty(n_docs, dtype=np.int64)
+    for p, nome in enumerate(paises):
+        docs = np.flatnonzero(pais_doc == p)
+        info = stats["paises"][nome]
+        idiomas, probs = zip(*info["idiomas"].items())
+        probs = np.array(probs, dtype=float)
+        idioma_doc[docs] = np.array(idiomas, dtype=object)[rng.choice(len(idiomas), size=len(docs), p=probs / probs.sum())]
+        tamanho_doc[docs] = np.maximum(1, rng.choice(info["tamanhos"], size=len(docs)).astype(np.int64))
+        tags_doc[docs] = rng.choice(info["n_hashtags"], size=len(docs)).astype(np.int64)
+    n_palavras = np.maximum(1, tamanho_doc - tags_doc)
+
+    # lemas "baratos" (minúsculas, sem pontuação) pra medir o KWIC sem depender do spaCy,
+    # calculados uma vez por palavra distinta e não por documento
+    lematizar = lambda v: pd.Series(v, dtype=object).str.lower().str.findall(r"[^\W\d_]+").str.join(" ").to_numpy(dtype=object)
+    lemas_tags = lematizar(tags)
+
+    # todas as palavras de um idioma num sorteio só, depois cortadas por documento
+    textos = np.empty(n_docs, dtype=object)
+    lemas = np.empty(n_docs, dtype=object)
+    for idioma in pd.unique(idioma_doc):
+        docs = np.flatnonzero(idioma_doc == idioma)
+        palavras, pesos = vocabs.get(idioma, next(iter(vocabs.values())))
+        idx_p = rng.choice(len(palavras), size=int(n_palavras[docs].sum()), p=pesos)
+        idx_t = rng.choice(len(tags), size=int(tags_doc[docs].sum()), p=freq_tags)
+        sorteadas, hashtags = palavras[idx_p].tolist(), tags[idx_t].tolist()
+        lemas_p, lemas_t = lematizar(palavras)[idx_p].tolist(), lemas_tags[idx_t].tolist()
+
+        fim_p, fim_t = np.cumsum(n_palavras[docs]), np.cumsum(tags_doc[docs])
+        cortes = list(zip(fim_p, n_palavras[docs], fim_t, tags_doc[docs]))
+        textos[docs] = [" ".join(sorteadas[a - n:a] + hashtags[b - m:b]) for a, n, b, m in cortes]
+        lemas[docs] = [" ".join(lemas_p[a - n:a] + lemas_t[b - m:b]).split() for a, n, b, m in cortes]
+
+    df = pd.DataFrame({
+        "id": [f"{paises[p]}_{i:07d}" for i, p in enumerate(pais_doc)],
+        "pais": np.array(paises, dtype=object)[pais_doc],
+        "idioma": idioma_doc,
+        "texto": textos,
+        "lemas": lemas,
+    })
+    return df
+
+def cronometrar(funcao, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def preparar_etapa(etapa, df, pasta_tmp):
+    """Devolve a função a ser cronometrada (sem o custo de import/carregar modelo)."""
+    if etapa == "detect_language":
+        import langid
+        from lang_detect import detect_language, supported_languages
+        langid.set_languages(supported_languages)
+        return lambda: [detect_language(t) for t in df["texto"]]
+
+    if etapa in ["pegar_lemas", "pegar_lemas_em_lote"]:
+        import tokens
+        cache = tokens.carregar_modelos()
+        if not cache:
+            raise RuntimeError("nenhum modelo do spaCy instalado")
+        if etapa == "pegar_lemas":
+            return lambda: [tokens.pegar_lemas(t, i, cache) for t, i in zip(df["texto"], df["idioma"])]
+        return lambda: tokens.pegar_lemas_em_lote(df, cache)
+
+    if etapa == "extrair_entidades":
+        import ner
+        cache = ner.carregar_modelos()
+        idiomas = ner.normalizar_idioma(df["idioma"])
+        return lambda: [ner.extrair_entidades(t, i, cache) for t, i in zip(df["texto"], idiomas)]
+
+    if etapa == "kwic_for_term":
+        from kwic import kwic_for_term
+        return lambda: [kwic_for_term(df, t) for t in TERMOS_KWIC]
+
+    if etapa == "kwic_indexado":
+        from kwic import construir_indice, carregar_indice, kwic_indexado
+        path_tokens = Path(pasta_tmp) / "bench_tokens.parquet"
+        df.to_parquet(path_tokens, index=False)
+        construir_indice([path_tokens], Path(pasta_tmp) / "kwic_indice")
+        indice = carregar_indice(Path(pasta_tmp) / "kwic_indice")
+        return lambda: [kwic_indexado(indice, t) for t in TERMOS_KWIC]
+
+    if etapa == "encoding":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+        return lambda: model.encode(df["texto"].tolist())
+
+    if etapa == "fit_transform":
+        from bertopic import BERTopic
+        from sklearn.cluster import KMeans
+        from umap import UMAP
+        from BERTopic import KMEANS_N_CLUSTERS, UMAP_N_NEIGHBORS
+        # embeddings aleatórios: aqui o que interessa é o custo do UMAP + KMeans + c-TF-IDF
+        embeddings = np.random.default_rng(0).normal(size=(len(df), 384)).astype(np.float32)
+        k = min(KMEANS_N_CLUSTERS, max(2, len(df) // 10))
+        return lambda: BERTopic(
+            hdbscan_model=KMeans(n_clusters=k, random_state=42, n_init='auto'),
+            umap_model=UMAP(n_neighbors=UMAP_N_NEIGHBORS, metric='cosine', random_state=42),
+        ).fit_transform(df["texto"].tolist(), embeddings=embeddings)
+
+    raise ValueError(f"etapa desconhecida: {etapa}")
+
+def comparar(resultados, baseline, tolerancia):
+    """Junta com o baseline por (etapa, escala) e marca regressão quando fica mais lento que a tolerância."""
+    atual = pd.DataFrame([r for r in resultados if r["status"] == "ok"])
+    base = pd.DataFrame([r for r in baseline if r["status"] == "ok"])
+    if atual.empty or base.empty:
+        return pd.DataFrame()
+    comp = atual.merge(base[["etapa", "escala", "segundos"]], on=["etapa", "escala"], suffixes=("", "_baseline"))
+    comp["razao"] = comp["segundos"] / comp["segundos_baseline"]
+    comp["regressao"] = comp["razao"] > tolerancia
+    return comp[["etapa", "escala", "n_docs", "segundos_baseline", "segundos", "razao", "regressao"]]
+
+@app.command()
+def main(
+    escalas: list[int] = typer.Option([1, 10], "--escala", help="Múltiplos do tamanho real do corpus (pode repetir: 1, 10, 100, 1000)"),
+    etapas: list[str] = typer.Option(ETAPAS, "--etapa", help="Etapas a medir (pode repetir)"),
+    repeticoes: int = typer.Option(3, help="Repetições por medida (fica o melhor tempo)"),
+    output_file: str = typer.Option(None, "--output", "-o", help="JSON de saída (padrão: results/bench/bench_<data>.json)"),
+    baseline: str = typer.Option(None, help="JSON de uma execução anterior pra comparar"),
+    tolerancia: float = typer.Option(1.2, help="Razão tempo/baseline acima da qual conta como regressão"),
+):
+    print("--- Benchmark das etapas ---")
+    desconhecidas = [e for e in etapas if e not in ETAPAS]
+    if desconhecidas:
+        print(f"ERRO: etapas desconhecidas {desconhecidas}. Opções: {ETAPAS}")
+        sys.exit(1)
+
+    stats = estatisticas_corpus()
+    if not stats["paises"]:
+        print("ERRO: nenhum CSV de país encontrado (Brasil.csv, Chile.csv, ...).")
+        sys.exit(1)
+
+    agora = datetime.now()
+    path_out = Path(output_file or f"results/bench/bench_{agora:%Y%m%d_%H%M%S}.json")
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    pasta_tmp = path_out.parent / "tmp"
+    pasta_tmp.mkdir(parents=True, exist_ok=True)
+
+    resultados = []
+    for escala in escalas:
+        df = gerar_corpus(stats, escala)
+        print(f"\nEscala {escala}x: {len(df)} documentos sintéticos")
+        for etapa in etapas:
+            registro = {"etapa": etapa, "escala": escala, "n_docs": len(df)}
+            try:
+                funcao = preparar_etapa(etapa, df, pasta_tmp)
+                segundos = cronometrar(funcao, repeticoes)
+                registro.update(status="ok", segundos=segundos, docs_por_seg=len(df) / max(segundos, 1e-9))
+                print(f"   {etapa:<22} {segundos:9.3f}s  {registro['docs_por_seg']:12.0f} docs/s")
+            except (ImportError, OSError, RuntimeError) as e:
+                # dependência ou modelo que não está instalado nessa máquina
+                registro.update(status="pulado", motivo=str(e))
+                print(f"   {etapa:<22} pulado ({e})")
+            except SystemExit:
+                # os scripts saem com sys.exit quando falta modelo do spaCy
+                registro.update(status="pulado", motivo="a etapa encerrou ao carregar os modelos")
+                print(f"   {etapa:<22} pulado (modelos não encontrados)")
+            resultados.append(registro)
+
+    saida = {
+        "data": agora.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "repeticoes": repeticoes,
+        "resultados": resultados,
+    }
+    path_out.write_text(json.dumps(saida, indent=2, ensure_ascii=False))
+    print(f"\n✅ Resultados salvos em: {path_out}")
+
+    if baseline:
+        comp = comparar(resultados, json.loads(Path(baseline).read_text())["resultados"], tolerancia)
+        if comp.empty:
+            print("Nada em comum com o baseline pra comparar.")
+            return
+        print("\nComparação com o baseline:")
+        print(comp.to_string(index=False))
+        if comp["regressao"].any():
+            print(f"\n[!] {int(comp['regressao'].sum())} regressão(ões) acima de {tolerancia}x")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,285 @@
+import pandas as pd
+import typer
+from pathlib import Path
+import json
+import sys
+import time
+import numpy as np
+from matriz_embeddings import ler_documentos, carregar_matriz
+from resultados_topicos import garantir_coluna_pais
+from instrumentacao import Medicao
+
+app = typer.Typer()
+
+# Índice de vizinhos mais próximos sobre a matriz de embeddings (similaridade de cosseno).
+#   exato: produto matricial em blocos sobre vetores.npy (mmap)
+#   ivf:   IVF + product quantization em NumPy (lista invertida por centróide grosso,
+#          resíduos codificados em m subespaços de 256 centróides cada)
+
+LIMITE_EXATO = 200_000
+TAMANHO_BLOCO = 65536
+
+def normalizar(x):
+    x = np.asarray(x, dtype=np.float32)
+    normas = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(normas, 1e-12)
+
+def atribuir(X, centros):
+    """Índice do centro mais próximo (distância euclidiana) de cada linha de X, em blocos."""
+    meio_norma = (centros ** 2).sum(axis=1) / 2
+    rotulos = np.empty(len(X), dtype=np.int64)
+    for i in range(0, len(X), TAMANHO_BLOCO):
+        bloco = np.asarray(X[i:i + TAMANHO_BLOCO], dtype=np.float32)
+        rotulos[i:i + TAMANHO_BLOCO] = np.argmax(bloco @ centros.T - meio_norma, axis=1)
+    return rotulos
+
+def kmeans_numpy(X, k, iteracoes=20, amostra=100_000, seed=42):
+    """K-means simples (Lloyd) numa amostra de X."""
+    rng = np.random.default_rng(seed)
+    if len(X) > amostra:
+        X = X[np.sort(rng.choice(len(X), amostra, replace=False))]
+    X = np.asarray(X, dtype=np.float32)
+    k = min(k, len(X))
+    centros = X[rng.choice(len(X), k, replace=False)].copy()
+
+    for _ in range(iteracoes):
+        rotulos = atribuir(X, centros)
+        somas = np.zeros_like(centros)
+        np.add.at(somas, rotulos, X)
+        contagens = np.bincount(rotulos, minlength=k)
+        cheios = contagens > 0
+        centros[cheios] = somas[cheios] / contagens[cheios, None]
+        # centro vazio recomeça num ponto aleatório
+        if (~cheios).any():
+            centros[~cheios] = X[rng.choice(len(X), int((~cheios).sum()))]
+    return centros
+
+def top_k(scores, ids, k):
+    if len(scores) <= k:
+        ordem = np.argsort(-scores)
+    else:
+        parte = np.argpartition(-scores, k)[:k]
+        ordem = parte[np.argsort(-scores[parte])]
+    return scores[ordem], ids[ordem]
+
+def construir_ivf(vetores, pasta, nlist, m, iteracoes):
+    d = vetores.shape[1]
+    if d % m != 0:
+        raise ValueError(f"dimensão {d} não é divisível por m={m}")
+    dsub = d // m
+
+    print(f"Treinando {nlist} centróides grossos...")
+    centroides = kmeans_numpy(vetores, nlist, iteracoes)
+    listas = atribuir(vetores, centroides)
+
+    print(f"Treinando product quantization ({m} subespaços x 256)...")
+    rng = np.random.default_rng(42)
+    amostra = np.sort(rng.choice(len(vetores), min(len(vetores), 100_000), replace=False))
+    residuos_amostra = np.asarray(vetores[amostra]) - centroides[listas[amostra]]
+    codebooks = np.zeros((m, 256, dsub), dtype=np.float32)
+    for j in range(m):
+        cb = kmeans_numpy(residuos_amostra[:, j * dsub:(j + 1) * dsub], 256, iteracoes)
+        codebooks[j, :len(cb)] = cb
+
+    print("Codificando vetores...")
+    codigos = np.empty((len(vetores), m), dtype=np.uint8)
+    for i in range(0, len(vetores), TAMANHO_BLOCO):
+        residuos = np.asarray(vetores[i:i + TAMANHO_BLOCO]) - centroides[listas[i:i + TAMANHO_BLOCO]]
+        for j in range(m):
+            codigos[i:i + TAMANHO_BLOCO, j] = atribuir(residuos[:, j * dsub:(j + 1) * dsub], codebooks[j])
+
+    # ordena pelo número da lista pra cada lista ficar contígua no disco
+    ordem = np.argsort(listas, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(listas, minlength=len(centroides)))])
+
+    np.save(pasta / "centroides.npy", centroides)
+    np.save(pasta / "pq_codebooks.npy", codebooks)
+    np.save(pasta / "codigos.npy", codigos[ordem])
+    np.save(pasta / "ids_listas.npy", ordem.astype(np.int64))
+    np.save(pasta / "offsets.npy", offsets.astype(np.int64))
+
+def carregar_indice(pasta):
+    pasta = Path(pasta)
+    config = json.loads((pasta / "config.json").read_text())
+    indice = {
+        "config": config,
+        "meta": pd.read_parquet(pasta / "meta.parquet"),
+        "vetores": np.load(pasta / "vetores.npy", mmap_mode="r"),
+    }
+    if config["modo"] == "ivf":
+        for nome in ["centroides", "pq_codebooks", "offsets"]:
+            indice[nome] = np.load(pasta / f"{nome}.npy")
+        for nome in ["codigos", "ids_listas"]:
+            indice[nome] = np.load(pasta / f"{nome}.npy", mmap_mode="r")
+    return indice
+
+def mascara_filtros(meta, pais, idioma):
+    mascara = np.ones(len(meta), dtype=bool)
+    if pais:
+        mascara &= meta["pais"].astype(str).str.lower().isin([p.lower() for p in pais]).to_numpy()
+    if idioma:
+        mascara &= meta["idioma"].astype(str).str.lower().isin([i.lower() for i in idioma]).to_numpy()
+    return mascara
+
+def buscar_exato(indice, q, k, mascara):
+    vetores = indice["vetores"]
+    melhores_s, melhores_i = np.array([], dtype=np.float32), np.array([], dtype=np.int64)
+    for i in range(0, len(vetores), TAMANHO_BLOCO):
+        scores = np.asarray(vetores[i:i + TAMANHO_BLOCO], dtype=np.float32) @ q
+        ids = np.arange(i, i + len(scores))
+        ok = mascara[i:i + len(scores)]
+        s, ids = top_k(scores[ok], ids[ok], k)
+        melhores_s, melhores_i = top_k(np.concatenate([melhores_s, s]), np.concatenate([melhores_i, ids]), k)
+    return melhores_s, melhores_i
+
+def buscar_ivf(indice, q, k, mascara, nprobe, rerank):
+    centroides, codebooks, offsets = indice["centroides"], indice["pq_codebooks"], indice["offsets"]
+    m, _, dsub = codebooks.shape
+
+    score_listas = centroides @ q
+    listas = np.argsort(-score_listas)[:nprobe]
+
+    # tabela q_j . codebook_j[c] de cada subespaço
+    tabela = np.einsum("jcd,jd->jc", codebooks, q.reshape(m, dsub))
+
+    todos_s, todos_i = [], []
+    for lista in listas:
+        ini, fim = offsets[lista], offsets[lista + 1]
+        if fim == ini:
+            continue
+        ids = np.asarray(indice["ids_listas"][ini:fim])
+        ok = mascara[ids]
+        if not ok.any():
+            continue
+        codigos = np.asarray(indice["codigos"][ini:fim])[ok]
+        scores = score_listas[lista] + tabela[np.arange(m), codigos].sum(axis=1)
+        todos_s.append(scores)
+        todos_i.append(ids[ok])
+
+    if not todos_s:
+        return np.array([], dtype=np.float32), np.array([], dtype=np.int64)
+
+    scores, ids = np.concatenate(todos_s), np.concatenate(todos_i)
+    # pega mais candidatos e reordena com os vetores exatos
+    scores, ids = top_k(scores, ids, k * rerank if rerank > 1 else k)
+    if rerank > 1:
+        ordem = np.argsort(ids)
+        exatos = np.asarray(indice["vetores"][ids[ordem]], dtype=np.float32) @ q
+        scores, ids = top_k(exatos, ids[ordem], k)
+    return scores, ids
+
+@app.command()
+def indexar(
+    input_file: str = typer.Argument("data/embeddings/embeddings.parquet", help="Parquet de embeddings (saída do embeddings.py)"),
+    output_dir: str = typer.Option("data/index/semantico", "--output-dir", "-o", help="Pasta do índice"),
+    model_name: str = typer.Option("paraphrase-multilingual-MiniLM-L12-v2", help="Modelo usado pra gerar os embeddings"),
+    modo: str = typer.Option("auto", help=f"exato, ivf ou auto (ivf acima de {LIMITE_EXATO} documentos)"),
+    nlist: int = typer.Option(0, help="Número de listas do IVF (0 = 4*sqrt(n))"),
+    m: int = typer.Option(48, help="Subespaços do product quantization (precisa dividir a dimensão)"),
+    iteracoes: int = typer.Option(20, help="Iterações do k-means no treino do IVF/PQ"),
+):
+    medicao = Medicao("busca_semantica_indexar", input_file=input_file, modo=modo, nlist=nlist, m=m)
+    print("--- Construção do índice semântico ---")
+    path_in = Path(input_file)
+    if not path_in.exists():
+        print(f"ERRO: Arquivo não encontrado: {input_file}")
+        sys.exit(1)
+
+    df = ler_documentos(path_in)
+    garantir_coluna_pais(df)
+    embeddings = carregar_matriz(df, path_in)
+    if embeddings is None:
+        print("ERRO: Embeddings não encontrados (nem coluna 'embedding' nem matriz .npy).")
+        sys.exit(1)
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    if modo == "auto":
+        modo = "exato" if len(df) < LIMITE_EXATO else "ivf"
+    if modo not in ["exato", "ivf"]:
+        print(f"ERRO: modo '{modo}' desconhecido. Use exato, ivf ou auto.")
+        sys.exit(1)
+
+    pasta = Path(output_dir)
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    # vetores normalizados: produto interno = cosseno
+    vetores = np.lib.format.open_memmap(pasta / "vetores.npy", mode="w+", dtype=np.float32, shape=embeddings.shape)
+    for i in range(0, len(df), TAMANHO_BLOCO):
+        vetores[i:i + TAMANHO_BLOCO] = normalizar(embeddings[i:i + TAMANHO_BLOCO])
+    vetores.flush()
+
+    meta = pd.DataFrame({
+        c: df[c].to_numpy() if c in df.columns else "" for c in ["id", "pais", "idioma", "texto"]
+    })
+    meta.to_parquet(pasta / "meta.parquet", index=False)
+    medicao.marcar("write")
+
+    config = {"modo": modo, "model_name": model_name, "n": int(len(df)), "dim": int(embeddings.shape[1])}
+    if modo == "ivf":
+        nlist = nlist or max(1, int(4 * np.sqrt(len(df))))
+        construir_ivf(vetores, pasta, nlist, m, iteracoes)
+        config.update({"nlist": nlist, "m": m})
+        medicao.marcar("process")
+
+    (pasta / "config.json").write_text(json.dumps(config, indent=2))
+    print(f"\n✅ Índice ({modo}, {len(df)} documentos) salvo em: {output_dir}")
+    medicao.finalizar(n_docs=len(df))
+
+@app.command()
+def buscar(
+    consultas: list[str] = typer.Argument(..., help="Frases para buscar"),
+    index_dir: str = typer.Option("data/index/semantico", "--indice", "-i", help="Pasta do índice"),
+    k: int = typer.Option(10, "--top-k", "-k", help="Quantos resultados por consulta"),
+    pais: list[str] = typer.Option([], "--pais", help="Filtra por país (pode repetir)"),
+    idioma: list[str] = typer.Option([], "--idioma", help="Filtra por idioma (pode repetir)"),
+    nprobe: int = typer.Option(16, help="Listas visitadas no modo ivf"),
+    rerank: int = typer.Option(4, help="No modo ivf, reordena k*rerank candidatos com os vetores exatos (1 = desliga)"),
+    output_file: str = typer.Option(None, "--output", "-o", help="CSV opcional com os resultados"),
+):
+    medicao = Medicao("busca_semantica_buscar", index_dir=index_dir, k=k, nprobe=nprobe, rerank=rerank)
+    # só a busca precisa do modelo; o 'indexar' roda sem carregar o torch
+    from sentence_transformers import SentenceTransformer
+
+    if not (Path(index_dir) / "config.json").exists():
+        print(f"ERRO: índice não encontrado em {index_dir}. Rode 'indexar' antes.")
+        sys.exit(1)
+
+    indice = carregar_indice(index_dir)
+    config = indice["config"]
+    meta = indice["meta"]
+    mascara = mascara_filtros(meta, pais, idioma)
+    medicao.marcar("load")
+
+    # mesmo modelo que gerou os embeddings do índice
+    model = SentenceTransformer(config["model_name"])
+    medicao.marcar("model_load")
+    qs = normalizar(model.encode(consultas))
+
+    resultados = []
+    for consulta, q in zip(consultas, qs):
+        inicio = time.perf_counter()
+        if config["modo"] == "ivf":
+            scores, ids = buscar_ivf(indice, q, k, mascara, nprobe, rerank)
+        else:
+            scores, ids = buscar_exato(indice, q, k, mascara)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+
+        print(f"\n🔎 \"{consulta}\" ({duracao_ms:.1f} ms, modo {config['modo']})")
+        achados = meta.iloc[ids].assign(consulta=consulta, score=scores)
+        for _, linha in achados.iterrows():
+            print(f"   {linha['score']:.3f}  [{linha['pais']}/{linha['idioma']}] {str(linha['texto'])[:120]}")
+        resultados.append(achados)
+    medicao.marcar("process")
+
+    if output_file and resultados:
+        path_out = Path(output_file)
+        path_out.parent.mkdir(parents=True, exist_ok=True)
+        colunas = ["consulta", "score", "id", "pais", "idioma", "texto"]
+        pd.concat(resultados, ignore_index=True)[colunas].to_csv(path_out, index=False, encoding="utf-8-sig")
+        print(f"\n✅ Resultados salvos em: {output_file}")
+        medicao.marcar("write")
+    medicao.finalizar(n_docs=len(consultas))
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,110 @@
+import pandas as pd
+import typer
+from pathlib import Path
+from tqdm import tqdm
+import sys
+import time
+import numpy as np
+from matriz_embeddings import ler_documentos, carregar_matriz
+from resultados_topicos import garantir_coluna_pais, tabela_topicos
+from embeddings import abrir_cache, encode_com_cache
+from instrumentacao import Medicao
+
+app = typer.Typer()
+
+def ler_entrada(path_in: Path, sep: str):
+    """Lê parquet (com ou sem embeddings) ou CSV de textos novos. Devolve (df, embeddings ou None)."""
+    if path_in.suffix == ".parquet":
+        df = ler_documentos(path_in)
+        return df, carregar_matriz(df, path_in)
+    df = pd.read_csv(path_in, sep=sep)
+    df.columns = [c.lower() for c in df.columns]
+    if 'texto' not in df.columns and 'text' in df.columns:
+        df = df.rename(columns={'text': 'texto'})
+    return df, None
+
+@app.command()
+def main(
+    input_file: str = typer.Argument(..., help="Parquet ou CSV com os textos novos (coluna 'texto')"),
+    output_file: str = typer.Option("results/topics/topics_classificados.parquet", "--output", "-o", help="Saída (.parquet ou .csv)"),
+    model_path: str = typer.Option("results/topics/global_bertopic_model", help="Modelo global salvo"),
+    model_name: str = typer.Option("paraphrase-multilingual-MiniLM-L12-v2", help="Modelo de embeddings, quando a entrada não tem embeddings"),
+    cache_file: str = typer.Option("data/embeddings/cache.sqlite", help="Cache de embeddings do embeddings.py"),
+    batch_size: int = typer.Option(10000, help="Documentos por lote no transform"),
+    sep: str = typer.Option(",", help="Separador do CSV de entrada"),
+):
+    medicao = Medicao("classificar_topicos", input_file=input_file, model_path=model_path, batch_size=batch_size)
+    print("--- Classificação de documentos novos (transform) ---")
+
+    path_in = Path(input_file)
+    path_model = Path(model_path)
+    for path in [path_in, path_model]:
+        if not path.exists():
+            print(f"ERRO: Arquivo não encontrado: {path}")
+            sys.exit(1)
+
+    df, embeddings = ler_entrada(path_in, sep)
+    if 'texto' not in df.columns:
+        print(f"ERRO: Falta a coluna obrigatória 'texto'. Encontrado: {list(df.columns)}")
+        sys.exit(1)
+    if not garantir_coluna_pais(df):
+        df['pais'] = 'Desconhecido'
+
+    texts = df['texto'].fillna("").astype(str).tolist()
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    # Embeddings: reaproveita os da entrada; senão calcula (passando pelo cache)
+    if embeddings is None:
+        print(f"Entrada sem embeddings. Calculando com {model_name}...")
+        conn = abrir_cache(cache_file)
+        try:
+            embeddings = encode_com_cache(texts, model_name, conn)
+        finally:
+            conn.close()
+        medicao.marcar("embeddings")
+
+    # O modelo é carregado uma vez só
+    print(f"Carregando modelo: {model_path}")
+    from bertopic import BERTopic
+    model = BERTopic.load(str(path_model))
+    medicao.marcar("model_load")
+
+    print(f"Classificando {len(df)} documentos em lotes de {batch_size}...")
+    inicio = time.perf_counter()
+    topicos, probs = [], []
+    for i in tqdm(range(0, len(texts), batch_size)):
+        lote_topicos, lote_probs = model.transform(
+            texts[i:i + batch_size],
+            embeddings=np.asarray(embeddings[i:i + batch_size])
+        )
+        topicos.append(np.asarray(lote_topicos))
+        # KMeans não tem probabilidade; com HDBSCAN vem uma por documento
+        if lote_probs is None:
+            probs.append(np.full(len(lote_topicos), np.nan))
+        else:
+            lote_probs = np.asarray(lote_probs)
+            probs.append(lote_probs.max(axis=1) if lote_probs.ndim == 2 else lote_probs)
+    duracao = time.perf_counter() - inicio
+
+    df['topic_id'] = np.concatenate(topicos) if topicos else np.array([], dtype=int)
+    df['topic_prob'] = np.concatenate(probs) if probs else np.array([])
+    medicao.marcar("process")
+
+    # Mesmo esquema do save_topic_results: id, pais, topic_id, topic_prob
+    resultado = tabela_topicos(df)
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    if path_out.suffix == ".csv":
+        resultado.to_csv(path_out, index=False, encoding='utf-8-sig')
+    else:
+        resultado.to_parquet(path_out, index=False)
+    medicao.marcar("write")
+
+    print(f"\n   -> Vazão: {len(df) / max(duracao, 1e-9):.0f} docs/s ({duracao:.2f}s no transform)")
+    print(f"   -> Tópicos distintos: {resultado['topic_id'].nunique()}")
+    print(f"\n✅ Resultado salvo em: {output_file}")
+    medicao.finalizar(n_docs=len(df))
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,133 @@
+import importlib
+import subprocess
+import sys
+import time
+import typer
+from pathlib import Path
+
+# Ponto de entrada único: `python cli.py <comando> [opções do script]`.
+# Cada subcomando só importa o seu script na hora em que é chamado e repassa os
+# argumentos para o app typer dele, então o `--help` geral não carrega pandas,
+# spaCy, BERTopic etc. Os scripts continuam rodando sozinhos como antes.
+
+app = typer.Typer(help="Pipeline ciberML: todos os scripts como subcomandos.")
+
+# nome do subcomando -> (módulo, ajuda)
+COMANDOS = {
+    "ingestao": ("ingestao", "Ingere os CSVs brutos no dataset parquet particionado."),
+    "lang-detect": ("lang_detect", "Detecta o idioma de cada texto (langid)."),
+    "dedup": ("dedup", "Quase-duplicatas com MinHash/LSH (deduplicar / expandir)."),
+    "tokens": ("tokens", "Lematização com spaCy."),
+    "ner": ("ner", "Extração de entidades com spaCy."),
+    "nlp": ("nlp_unico", "Lemas e entidades numa passada só do spaCy."),
+    "kwic": ("kwic", "Concordâncias KWIC dos termos."),
+    "kwic-indice": ("kwic_indice", "Monta o índice invertido do KWIC."),
+    "colocacoes": ("colocacoes", "Colocações PMI/LL/t-score sobre os lemas (construir / consultar)."),
+    "keywords": ("keywords", "Palavras-chave por país/idioma."),
+    "keyness": ("keyness", "Keyness (LL e %DIFF) de cada país contra o resto do corpus."),
+    "embeddings": ("embeddings", "Embeddings dos textos (sentence-transformers)."),
+    "topicos-kmeans": ("BERTopic", "BERTopic global com KMeans."),
+    "topicos-hdbscan": ("bertopicc", "BERTopic global com HDBSCAN."),
+    "topicos-por-pais": ("topicos_por_pais", "Um modelo por país em paralelo, alinhado ao global."),
+    "exportar-html": ("exportar_html", "Gráficos HTML a partir do mapa de tópicos salvo."),
+    "varredura-topicos": ("varredura_topicos", "Varredura de hiperparâmetros com cache do UMAP."),
+    "atualizar-topicos": ("atualizar_topicos", "Atualização incremental do modelo KMeans."),
+    "classificar-topicos": ("classificar_topicos", "Aplica o modelo salvo a documentos novos."),
+    "busca": ("busca_semantica", "Índice e busca semântica (indexar / buscar)."),
+    "pipeline": ("pipeline", "Roda o DAG de etapas com cache."),
+    "benchmark": ("benchmark", "Benchmark com corpus sintético."),
+}
+
+# bibliotecas que não podem ser carregadas só por importar um script
+# (o pandas fica de fora de propósito: quase todos os scripts importam pandas no topo e usam
+# em funções auxiliares importadas por outros scripts; ele custa ~0,35s e entra no orçamento de tempo abaixo)
+PESADAS = ["spacy", "bertopic", "umap", "sklearn", "sentence_transformers", "torch", "yake", "scipy"]
+
+# tempo máximo (s) de `cli.py <comando> --help` numa máquina normal
+ORCAMENTO_INICIO_S = 1.5
+
+def registrar(nome, modulo, ajuda):
+    @app.command(
+        nome,
+        help=ajuda,
+        add_help_option=False,
+        context_settings={"allow_extra_args": True, "ignore_unknown_options": True},
+    )
+    def comando(ctx: typer.Context):
+        script = importlib.import_module(modulo)
+        script.app(args=ctx.args, prog_name=f"cli.py {nome}")
+
+for nome, (modulo, ajuda) in COMANDOS.items():
+    registrar(nome, modulo, ajuda)
+
+def medir_inicio(nome, repeticoes):
+    """Melhor tempo (s) de `cli.py <nome> --help` num processo novo."""
+    cmd = [sys.executable, str(Path(__file__).resolve())] + ([nome] if nome else []) + ["--help"]
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos)
+
+def pesadas_no_import(modulo):
+    """Bibliotecas pesadas que aparecem em sys.modules só de importar o script."""
+    codigo = (
+        "import importlib, sys; importlib.import_module(%r); "
+        "print(','.join(m for m in %r if m in sys.modules))" % (modulo, PESADAS)
+    )
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True,
+    )
+    if saida.returncode != 0:
+        return None
+    return [m for m in saida.stdout.strip().split(",") if m]
+
+@app.command("inicializacao")
+def inicializacao(
+    comandos: list[str] = typer.Argument(None, help="Subcomandos a medir (padrão: todos)"),
+    orcamento: float = typer.Option(ORCAMENTO_INICIO_S, help="Tempo máximo (s) de `<comando> --help`"),
+    repeticoes: int = typer.Option(3, help="Execuções por comando (vale a melhor)"),
+):
+    """Mede o tempo de inicialização de cada subcomando e confere o orçamento."""
+    nomes = comandos or list(COMANDOS)
+    desconhecidos = [n for n in nomes if n not in COMANDOS]
+    if desconhecidos:
+        print(f"Erro: comandos desconhecidos: {', '.join(desconhecidos)}")
+        raise typer.Exit(code=1)
+
+    estourou = []
+    base = medir_inicio(None, repeticoes)
+    print(f"{'cli.py --help':<28} {base:6.2f}s")
+
+    for nome in nomes:
+        modulo = COMANDOS[nome][0]
+        tempo = medir_inicio(nome, repeticoes)
+        pesadas = pesadas_no_import(modulo)
+
+        problemas = []
+        if tempo > orcamento:
+            problemas.append("acima do orçamento")
+        if pesadas is None:
+            problemas.append("falhou ao importar")
+        elif pesadas:
+            problemas.append(f"importa {', '.join(pesadas)} no topo")
+        if problemas:
+            estourou.append(nome)
+
+        print(f"{nome:<28} {tempo:6.2f}s  {'; '.join(problemas) if problemas else 'ok'}")
+
+    if base > orcamento:
+        estourou.append("cli.py")
+
+    print(f"\norçamento: {orcamento:.2f}s por comando")
+    if estourou:
+        print(f"fora do orçamento: {', '.join(estourou)}")
+        raise typer.Exit(code=1)
+    print("todos dentro do orçamento.")
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,136 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Backend de codificação em CPU para o embeddings.py.
+# - ordena os textos pelo número de tokens e divide em baldes de tamanho parecido,
+#   então cada lote do encode quase não tem padding
+# - os baldes são distribuídos num pool de processos (cada um com o seu modelo)
+# - backend 'int8' (quantização dinâmica das camadas Linear) ou 'onnx' (onnxruntime),
+#   conferidos contra o modelo float com verificar_precisao
+
+BACKENDS = ['float', 'int8', 'onnx']
+
+# textos por tarefa do pool; baldes menores equilibram melhor, maiores gastam menos com pickle
+TEXTOS_POR_BALDE = 2048
+
+def carregar_modelo(model_name, backend='float', threads=None):
+    """SentenceTransformer em CPU no backend pedido."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    if backend == 'onnx':
+        # exporta (ou reaproveita) o ONNX do modelo e roda no onnxruntime
+        return SentenceTransformer(model_name, device='cpu', backend='onnx')
+
+    model = SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        # pesos das Linear em int8, ativações continuam float (não precisa de calibração)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+def carregar_tokenizer(model_name):
+    """Só o tokenizer do modelo, pra medir os textos sem carregar os pesos."""
+    from transformers import AutoTokenizer
+
+    # mesmo atalho do sentence-transformers: nome curto = repositório sentence-transformers/<nome>
+    if '/' not in model_name and not Path(model_name).exists():
+        model_name = f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(model_name)
+
+def max_seq_length(model_name, tokenizer):
+    """max_seq_length do modelo sem carregar os pesos (sentence_bert_config.json), ou o do tokenizer."""
+    import json
+
+    repo = model_name if '/' in model_name or Path(model_name).exists() else f"sentence-transformers/{model_name}"
+    try:
+        if Path(repo).exists():
+            caminho = Path(repo) / "sentence_bert_config.json"
+        else:
+            from huggingface_hub import hf_hub_download
+            caminho = hf_hub_download(repo, "sentence_bert_config.json")
+        return int(json.loads(Path(caminho).read_text())["max_seq_length"])
+    except Exception:
+        return min(tokenizer.model_max_length, 512)
+
+def comprimentos_tokens(tokenizer, textos, max_len=128, lote=4096):
+    """Número de tokens de cada texto (cortado em max_len, como no encode)."""
+    comprimentos = np.empty(len(textos), dtype=np.int32)
+    for i in range(0, len(textos), lote):
+        ids = tokenizer(textos[i:i + lote], truncation=True, max_length=max_len)['input_ids']
+        comprimentos[i:i + len(ids)] = [len(x) for x in ids]
+    return comprimentos
+
+def baldes_por_tamanho(comprimentos, tamanho=TEXTOS_POR_BALDE):
+    """Índices dos textos em ordem de tamanho, cortados em baldes (do maior para o menor)."""
+    ordem = np.argsort(-comprimentos, kind='stable')
+    return [ordem[i:i + tamanho] for i in range(0, len(ordem), tamanho)]
+
+# --- parte que roda dentro dos processos do pool ---
+
+_modelo = None
+_batch_size = 32
+
+def iniciar_worker(model_name, backend, threads, batch_size):
+    global _modelo, _batch_size
+    _modelo = carregar_modelo(model_name, backend, threads)
+    _batch_size = batch_size
+
+def codificar_balde(textos):
+    return np.asarray(
+        _modelo.encode(textos, batch_size=_batch_size, convert_to_numpy=True, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+def codificar(textos, model_name, backend='float', workers=1, batch_size=32):
+    """Codifica os textos e devolve a matriz float32 na ordem original."""
+    textos = [str(t) for t in textos]
+    if not textos:
+        return np.empty((0, 0), dtype=np.float32)
+
+    if workers <= 1:
+        model = carregar_modelo(model_name, backend)
+        baldes = baldes_por_tamanho(comprimentos_tokens(model.tokenizer, textos, model.max_seq_length))
+        partes = (
+            np.asarray(model.encode([textos[i] for i in b], batch_size=batch_size,
+                                    convert_to_numpy=True, show_progress_bar=False), dtype=np.float32)
+            for b in baldes
+        )
+        return juntar(baldes, partes, len(textos))
+
+    # o processo principal só carrega o tokenizer; o max_seq_length vem do config do sentence-transformers
+    tokenizer = carregar_tokenizer(model_name)
+    baldes = baldes_por_tamanho(comprimentos_tokens(tokenizer, textos, max_seq_length(model_name, tokenizer)))
+
+    # divide os núcleos entre os processos pra não brigarem pelas threads do torch
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_worker,
+                             initargs=(model_name, backend, threads, batch_size)) as pool:
+        partes = pool.map(codificar_balde, [[textos[i] for i in b] for b in baldes])
+        return juntar(baldes, partes, len(textos))
+
+def juntar(baldes, partes, n):
+    """Põe os vetores de cada balde de volta nas posições originais."""
+    from tqdm import tqdm
+
+    matriz = None
+    for b, vetores in tqdm(zip(baldes, partes), total=len(baldes), desc="codificando"):
+        if matriz is None:
+            matriz = np.empty((n, vetores.shape[1]), dtype=np.float32)
+        matriz[b] = vetores
+    return matriz
+
+def verificar_precisao(textos, model_name, backend, amostra=256, seed=42):
+    """Cosseno entre o modelo float e o backend numa amostra: (média, mínimo)."""
+    textos = [str(t) for t in textos]
+    rng = np.random.default_rng(seed)
+    escolhidos = [textos[i] for i in rng.choice(len(textos), size=min(amostra, len(textos)), replace=False)]
+
+    ref = carregar_modelo(model_name, 'float').encode(escolhidos, convert_to_numpy=True, normalize_embeddings=True)
+    alt = carregar_modelo(model_name, backend).encode(escolhidos, convert_to_numpy=True, normalize_embeddings=True)
+    cos = np.sum(np.asarray(ref) * np.asarray(alt), axis=1)
+    return float(cos.mean()), float(cos.min())
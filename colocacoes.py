@@ -0,0 +1,244 @@
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+import typer
+import json
+import sys
+from pathlib import Path
+from kwic import normalize
+from instrumentacao import Medicao
+
+app = typer.Typer()
+
+# Colocações sobre os lemas dos *_tokens.parquet.
+#   construir: conta os pares (lema, vizinho) dentro de uma janela em todos os documentos
+#              numa matriz esparsa CSR (uma passada vetorizada por distância) e calcula
+#              PMI, log-likelihood e t-score de todos os pares de uma vez
+#   consultar: lê a matriz salva e lista os colocados de cada termo
+# Arquivos dentro da pasta:
+#   coocorrencias.npz   matriz CSR termo x termo (simétrica), contagens dentro da janela
+#   pmi.npy, ll.npy, t.npy   medida de cada par, alinhada com matriz.data
+#   vocab.parquet       termo normalizado e frequência, na ordem das linhas da matriz
+#   config.json         janela, filtros e totais usados na construção
+
+MEDIDAS = ["pmi", "ll", "t"]
+
+def ler_lemas(arquivos, paises=None, idiomas=None):
+    """Lê só as colunas lemas/pais/idioma, com o filtro empurrado para o parquet."""
+    partes = []
+    for arquivo in arquivos:
+        nomes = pq.read_schema(arquivo).names
+        colunas = [c for c in ["lemas", "pais", "idioma"] if c in nomes]
+        filtros = []
+        if paises and "pais" in nomes:
+            filtros.append(("pais", "in", list(paises)))
+        if idiomas and "idioma" in nomes:
+            filtros.append(("idioma", "in", list(idiomas)))
+        partes.append(pd.read_parquet(arquivo, columns=colunas, filters=filtros or None))
+    return pd.concat(partes, ignore_index=True)
+
+def codificar_lemas(listas, min_freq):
+    """Sequência única de ids de termo (-1 = termo raro) e o documento de cada posição."""
+    tamanhos = np.array([len(x) for x in listas], dtype=np.int64)
+    lemas = pd.Series([l for x in listas for l in x], dtype=object)
+
+    # normaliza cada lema distinto uma vez só (mesma regra do kwic)
+    codigos, distintos = pd.factorize(lemas, use_na_sentinel=False)
+    termo_por_distinto, termos = pd.factorize(pd.Series([normalize(l) for l in distintos], dtype=object))
+    ids = termo_por_distinto[codigos] if len(codigos) else np.array([], dtype=np.int64)
+
+    # termos raros saem do vocabulário, mas continuam ocupando a posição na janela
+    freq = np.bincount(ids, minlength=len(termos))
+    manter = (freq >= min_freq) & (np.asarray(termos, dtype=object) != "")
+    novo_id = np.full(len(termos), -1, dtype=np.int64)
+    novo_id[manter] = np.arange(manter.sum())
+    ids = novo_id[ids]
+
+    doc = np.repeat(np.arange(len(listas), dtype=np.int32), tamanhos)
+    vocab = pd.DataFrame({"termo": np.asarray(termos, dtype=object)[manter], "freq": freq[manter]})
+    return ids, doc, vocab
+
+def matriz_coocorrencias(ids, doc, n_termos, janela):
+    """Matriz CSR com quantas vezes cada par aparece a até `janela` posições de distância."""
+    from scipy import sparse
+
+    matriz = sparse.csr_matrix((n_termos, n_termos), dtype=np.int64)
+    for d in range(1, janela + 1):
+        a, b = ids[:-d], ids[d:]
+        validos = (doc[:-d] == doc[d:]) & (a >= 0) & (b >= 0)
+        a, b = a[validos], b[validos]
+        # janela dos dois lados: conta (a, b) e (b, a)
+        linhas = np.concatenate([a, b])
+        colunas = np.concatenate([b, a])
+        uns = np.ones(len(linhas), dtype=np.int64)
+        matriz = matriz + sparse.coo_matrix((uns, (linhas, colunas)), shape=(n_termos, n_termos)).tocsr()
+    matriz.sum_duplicates()
+    matriz.sort_indices()
+    return matriz
+
+def xlogx_sobre(o, e):
+    """o * ln(o / e), com 0 quando o = 0."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(o > 0, o * np.log(o / e), 0.0)
+
+def medidas_associacao(matriz):
+    """PMI, log-likelihood (G²) e t-score de todos os pares não nulos, alinhados com matriz.data."""
+    linhas = np.repeat(np.arange(matriz.shape[0]), np.diff(matriz.indptr))
+    colunas = matriz.indices
+    o11 = matriz.data.astype(np.float64)
+
+    # tabela 2x2 de cada par a partir das margens da matriz
+    r = np.asarray(matriz.sum(axis=1)).ravel().astype(np.float64)
+    c = np.asarray(matriz.sum(axis=0)).ravel().astype(np.float64)
+    n = float(matriz.sum())
+    r1, c1 = r[linhas], c[colunas]
+    o12, o21 = r1 - o11, c1 - o11
+    o22 = n - r1 - c1 + o11
+
+    e11 = r1 * c1 / n
+    e12 = r1 * (n - c1) / n
+    e21 = (n - r1) * c1 / n
+    e22 = (n - r1) * (n - c1) / n
+
+    pmi = np.log2(o11 / e11)
+    ll = 2 * (xlogx_sobre(o11, e11) + xlogx_sobre(o12, e12) + xlogx_sobre(o21, e21) + xlogx_sobre(o22, e22))
+    # LL com sinal: negativo quando o par aparece menos que o esperado
+    ll = np.where(o11 < e11, -ll, ll)
+    t = (o11 - e11) / np.sqrt(o11)
+    return {"pmi": pmi.astype(np.float32), "ll": ll.astype(np.float32), "t": t.astype(np.float32)}
+
+def carregar_colocacoes(pasta):
+    from scipy import sparse
+
+    pasta = Path(pasta)
+    return {
+        "config": json.loads((pasta / "config.json").read_text()),
+        "matriz": sparse.load_npz(pasta / "coocorrencias.npz"),
+        "vocab": pd.read_parquet(pasta / "vocab.parquet"),
+        **{m: np.load(pasta / f"{m}.npy", mmap_mode="r") for m in MEDIDAS},
+    }
+
+def colocados(dados, termo, medida, top_k, min_coocorrencia):
+    """Vizinhos de um termo ordenados pela medida (só uma fatia da linha da CSR)."""
+    termos = dados["vocab"]["termo"].to_numpy(dtype=object)
+    posicao = dados.setdefault("posicao", {t: i for i, t in enumerate(termos)})
+    i = posicao.get(normalize(termo))
+    if i is None:
+        return pd.DataFrame()
+
+    matriz = dados["matriz"]
+    ini, fim = matriz.indptr[i], matriz.indptr[i + 1]
+    vizinhos = matriz.indices[ini:fim]
+    contagens = matriz.data[ini:fim]
+    medidas = {m: np.asarray(dados[m][ini:fim]) for m in MEDIDAS}
+
+    manter = contagens >= min_coocorrencia
+    ordem = np.argsort(-medidas[medida][manter], kind="stable")[:top_k]
+    freq = dados["vocab"]["freq"].to_numpy()
+    return pd.DataFrame({
+        "termo": termos[i],
+        "colocado": termos[vizinhos[manter][ordem]],
+        "coocorrencias": contagens[manter][ordem],
+        "freq_colocado": freq[vizinhos[manter][ordem]],
+        **{m: np.round(medidas[m][manter][ordem], 4) for m in MEDIDAS},
+    })
+
+@app.command()
+def construir(
+    input_glob: str = typer.Argument("data/processed/*_tokens.parquet", help="Parquet(s) de lemas (tokens.py / nlp_unico.py)"),
+    output_dir: str = typer.Option("data/index/colocacoes", "--output-dir", "-o", help="Pasta da matriz de colocações"),
+    janela: int = typer.Option(5, help="Distância máxima (em lemas) entre os dois termos do par"),
+    min_freq: int = typer.Option(5, help="Termos com menos ocorrências que isso ficam fora da matriz"),
+    pais: list[str] = typer.Option([], "--pais", help="Só esses países (pode repetir)"),
+    idioma: list[str] = typer.Option([], "--idioma", help="Só esses idiomas (pode repetir)"),
+):
+    medicao = Medicao("colocacoes", input_glob=input_glob, janela=janela, min_freq=min_freq)
+    print("--- Construção da matriz de colocações ---")
+
+    arquivos = sorted(Path().glob(input_glob)) if any(c in input_glob for c in "*?[") else [Path(input_glob)]
+    arquivos = [a for a in arquivos if a.exists()]
+    if not arquivos:
+        print(f"ERRO: nenhum arquivo encontrado para {input_glob}")
+        sys.exit(1)
+
+    df = ler_lemas(arquivos, pais, idioma)
+    if "lemas" not in df.columns:
+        print("ERRO: os arquivos não têm a coluna 'lemas'. Rode o tokens.py (ou o nlp_unico.py) antes.")
+        sys.exit(1)
+
+    listas = [x.tolist() if hasattr(x, "tolist") else x for x in df["lemas"]]
+    listas = [x if isinstance(x, list) else [] for x in listas]
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+    print(f"{len(listas)} documentos de {len(arquivos)} arquivo(s)")
+
+    ids, doc, vocab = codificar_lemas(listas, min_freq)
+    if vocab.empty:
+        print(f"ERRO: nenhum termo com pelo menos {min_freq} ocorrências.")
+        sys.exit(1)
+
+    matriz = matriz_coocorrencias(ids, doc, len(vocab), janela)
+    medidas = medidas_associacao(matriz)
+    medicao.marcar("process")
+
+    from scipy import sparse
+    pasta = Path(output_dir)
+    pasta.mkdir(parents=True, exist_ok=True)
+    sparse.save_npz(pasta / "coocorrencias.npz", matriz)
+    for m, valores in medidas.items():
+        np.save(pasta / f"{m}.npy", valores)
+    vocab.to_parquet(pasta / "vocab.parquet", index=False)
+
+    config = {
+        "janela": janela, "min_freq": min_freq, "paises": pais, "idiomas": idioma,
+        "arquivos": [str(a) for a in arquivos], "n_docs": len(listas), "n_lemas": int(len(ids)),
+        "n_termos": int(len(vocab)), "n_pares": int(matriz.nnz),
+    }
+    (pasta / "config.json").write_text(json.dumps(config, indent=2, ensure_ascii=False))
+    medicao.marcar("write")
+
+    print(f"\n✅ Matriz salva em: {output_dir}")
+    print(f"Lemas: {len(ids)} | Termos: {len(vocab)} | Pares distintos: {sparse.triu(matriz).nnz}")
+    medicao.finalizar(n_docs=len(listas))
+
+@app.command()
+def consultar(
+    termos: list[str] = typer.Argument(..., help="Termos para listar os colocados"),
+    index_dir: str = typer.Option("data/index/colocacoes", "--indice", "-i", help="Pasta gerada pelo 'construir'"),
+    medida: str = typer.Option("ll", help="Ordenar por pmi, ll (log-likelihood) ou t (t-score)"),
+    k: int = typer.Option(20, "--top-k", "-k", help="Quantos colocados por termo"),
+    min_coocorrencia: int = typer.Option(3, help="Ignora pares que aparecem juntos menos vezes (o PMI exagera os raros)"),
+    output_file: str = typer.Option(None, "--output", "-o", help="CSV opcional com os resultados"),
+):
+    if medida not in MEDIDAS:
+        print(f"ERRO: medida '{medida}' desconhecida. Use {', '.join(MEDIDAS)}.")
+        sys.exit(1)
+
+    if not (Path(index_dir) / "config.json").exists():
+        print(f"ERRO: matriz não encontrada em {index_dir}. Rode 'construir' antes.")
+        sys.exit(1)
+
+    dados = carregar_colocacoes(index_dir)
+    config = dados["config"]
+    filtros = ", ".join(config["paises"] + config["idiomas"]) or "corpus inteiro"
+    print(f"Matriz: janela {config['janela']}, {config['n_termos']} termos ({filtros})")
+
+    resultados = []
+    for termo in termos:
+        achados = colocados(dados, termo, medida, k, min_coocorrencia)
+        if achados.empty:
+            print(f"\n[!] '{termo}' não está no vocabulário (ou tem menos de {config['min_freq']} ocorrências)")
+            continue
+        print(f"\n🔎 {termo} (por {medida})")
+        for _, linha in achados.iterrows():
+            print(f"   {linha['colocado']:<20} n={linha['coocorrencias']:<6} pmi={linha['pmi']:.2f}  ll={linha['ll']:.1f}  t={linha['t']:.2f}")
+        resultados.append(achados)
+
+    if output_file and resultados:
+        path_out = Path(output_file)
+        path_out.parent.mkdir(parents=True, exist_ok=True)
+        pd.concat(resultados, ignore_index=True).to_csv(path_out, index=False, encoding="utf-8-sig")
+        print(f"\n✅ Resultados salvos em: {output_file}")
+
+if __name__ == "__main__":
+    app()
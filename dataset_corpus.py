@@ -0,0 +1,109 @@
+import unicodedata
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pathlib import Path
+
+# Corpus canônico em parquet particionado por país e idioma:
+#   data/corpus/pais=<pais>/idioma=<idioma>/<arquivo de origem>.parquet
+# Gravado pelo ingestao.py. pais/idioma ficam no nome das pastas (hive) e voltam
+# como categóricas; o resto do esquema é fixo, com as colunas ausentes em nulo.
+
+COLUNAS_TEXTO = [
+    'id', 'texto', 'codigo legenda', 'hashtags', 'data',
+    'doc_origin', 'source', 'manual_theme', 'url', 'notes', 'arquivo_origem', 'hash_texto',
+]
+COLUNAS_PARTICAO = ['pais', 'idioma']
+
+# esquema de cada arquivo (as colunas de partição vêm das pastas)
+SCHEMA_ARQUIVO = pa.schema([(c, pa.string()) for c in COLUNAS_TEXTO])
+SCHEMA_PARTICAO = pa.schema([(c, pa.string()) for c in COLUNAS_PARTICAO])
+
+# colunas de valores repetidos: dicionário no parquet (o texto fica de fora)
+COLUNAS_DICIONARIO = ['codigo legenda', 'data', 'doc_origin', 'source', 'manual_theme', 'arquivo_origem']
+
+# variações de nome que aparecem nos exports (já sem acento e em minúsculo)
+RENOMEAR = {
+    'text': 'texto',
+    'country': 'pais',
+    'date': 'data',
+    'codigo_legenda': 'codigo legenda',
+    'language': 'idioma',
+}
+
+def nome_coluna(nome):
+    """'País' -> 'pais', '\\ufeffTexto' -> 'texto', 'Codigo Legenda' -> 'codigo legenda'."""
+    nome = str(nome).replace('\ufeff', '').strip().lower()
+    nome = ''.join(c for c in unicodedata.normalize('NFD', nome) if unicodedata.category(c) != 'Mn')
+    return RENOMEAR.get(nome, nome)
+
+def detectar_separador(path, padrao=';'):
+    """Descobre se o CSV usa ';', ',' ou tab pelo cabeçalho (o texto tem vírgula demais pra olhar o resto)."""
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        cabecalho = f.readline()
+    contagem = {sep: cabecalho.count(sep) for sep in (';', ',', '\t')}
+    sep = max(contagem, key=contagem.get)
+    return sep if contagem[sep] else padrao
+
+def eh_dataset(path):
+    return Path(path).is_dir()
+
+def filtro_particoes(paises=None, idiomas=None):
+    filtro = None
+    for campo, valores in (('pais', paises), ('idioma', idiomas)):
+        if valores:
+            cond = ds.field(campo).isin(list(valores))
+            filtro = cond if filtro is None else filtro & cond
+    return filtro
+
+def abrir_dataset(path):
+    return ds.dataset(path, format='parquet', partitioning=ds.partitioning(SCHEMA_PARTICAO, flavor='hive'))
+
+def colunas_corpus(path):
+    """Nomes das colunas: esquema do dataset ou cabeçalho do CSV."""
+    if eh_dataset(path):
+        return abrir_dataset(path).schema.names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+def para_pandas(tabela):
+    df = tabela.to_pandas()
+    for c in COLUNAS_PARTICAO:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    return df
+
+def ler_corpus(path, paises=None, idiomas=None, colunas=None):
+    """Lê o corpus só com as partições e colunas pedidas (filtro empurrado para o parquet).
+
+    Aceita também um CSV (como os data/interim/*_lang.csv): aí lê tudo e filtra no pandas.
+    """
+    if not eh_dataset(path):
+        df = pd.read_csv(path, usecols=colunas)
+        if paises and 'pais' in df.columns:
+            df = df[df['pais'].isin(paises)]
+        if idiomas and 'idioma' in df.columns:
+            df = df[df['idioma'].isin(idiomas)]
+        return df.reset_index(drop=True)
+
+    tabela = abrir_dataset(path).to_table(columns=colunas, filter=filtro_particoes(paises, idiomas))
+    return para_pandas(tabela)
+
+def blocos_corpus(path, colunas=None, chunk_size=20000, paises=None, idiomas=None):
+    """Gera DataFrames de até chunk_size linhas, do dataset ou do CSV, sem carregar tudo."""
+    if not eh_dataset(path):
+        for bloco in pd.read_csv(path, usecols=colunas, chunksize=chunk_size):
+            if paises and 'pais' in bloco.columns:
+                bloco = bloco[bloco['pais'].isin(paises)]
+            if idiomas and 'idioma' in bloco.columns:
+                bloco = bloco[bloco['idioma'].isin(idiomas)]
+            yield bloco
+        return
+
+    scanner = abrir_dataset(path).scanner(columns=colunas, filter=filtro_particoes(paises, idiomas), batch_size=chunk_size)
+    for lote in scanner.to_batches():
+        if lote.num_rows:
+            yield para_pandas(pa.Table.from_batches([lote]))
+
+def valores_particao(path, campo):
+    """Valores distintos de uma coluna de partição, lidos dos nomes das pastas."""
+    return sorted({p.name.split('=', 1)[1] for p in Path(path).rglob(f"{campo}=*") if p.is_dir()})
@@ -0,0 +1,179 @@
+import pandas as pd
+import numpy as np
+import typer
+import re
+import sys
+import unicodedata
+import zlib
+from pathlib import Path
+from tqdm import tqdm
+
+app = typer.Typer()
+
+# Deduplicação aproximada antes das etapas caras (tokens, ner, embeddings, tópicos):
+# MinHash sobre shingles de caracteres do texto normalizado + LSH por bandas.
+# Só os documentos canônicos seguem no pipeline; o 'expandir' devolve os
+# resultados para as cópias usando o mapa canônico.
+# A deduplicação é dentro de um arquivo só: cópias que estão em arquivos diferentes
+# (por exemplo corpus.csv e o CSV de um país) não são comparadas entre si.
+
+PRIMO = np.uint64((1 << 61) - 1)
+
+def normalizar_texto(texto):
+    # minusculo, sem acento e sem pontuacao, pra repost com emoji/espaco diferente cair junto
+    texto = unicodedata.normalize('NFD', str(texto).lower())
+    texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
+    return ' '.join(re.sub(r'[^\w]+', ' ', texto).split())
+
+def hashes_shingles(texto, k):
+    if len(texto) <= k:
+        shingles = {texto}
+    else:
+        shingles = {texto[i:i + k] for i in range(len(texto) - k + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+def assinaturas_minhash(textos, num_perm=128, k=5, seed=42):
+    """Assinatura MinHash (num_perm valores) de cada texto."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    assinaturas = np.empty((len(textos), num_perm), dtype=np.uint64)
+    for i, texto in enumerate(tqdm(textos, desc="minhash")):
+        h = hashes_shingles(normalizar_texto(texto), k)
+        assinaturas[i] = ((np.outer(a, h) + b[:, None]) % PRIMO).min(axis=1)
+    return assinaturas
+
+def raiz(pais_uf, i):
+    while pais_uf[i] != i:
+        pais_uf[i] = pais_uf[pais_uf[i]]
+        i = pais_uf[i]
+    return i
+
+def agrupar_duplicatas(assinaturas, bandas=16, limiar=0.8):
+    """LSH por bandas + checagem da similaridade estimada. Devolve o canônico de cada documento.
+
+    Dentro de um balde, cada documento é comparado com o primeiro do balde (estrela),
+    e a união dos pares aprovados forma os clusters.
+    """
+    n, num_perm = assinaturas.shape
+    linhas = num_perm // bandas
+    pais_uf = np.arange(n)
+
+    for banda in range(bandas):
+        fatia = assinaturas[:, banda * linhas:(banda + 1) * linhas]
+        _, baldes = np.unique(fatia, axis=0, return_inverse=True)
+        baldes = baldes.ravel()
+
+        ordem = np.argsort(baldes, kind='stable')
+        inicio_balde = np.flatnonzero(np.r_[True, baldes[ordem][1:] != baldes[ordem][:-1]])
+        tamanhos = np.diff(np.r_[inicio_balde, n])
+
+        for ini, tam in zip(inicio_balde[tamanhos > 1], tamanhos[tamanhos > 1]):
+            membros = ordem[ini:ini + tam]
+            primeiro = membros[0]
+            similares = (assinaturas[membros[1:]] == assinaturas[primeiro]).mean(axis=1) >= limiar
+            for outro in membros[1:][similares]:
+                ra, rb = raiz(pais_uf, primeiro), raiz(pais_uf, outro)
+                if ra != rb:
+                    # a raiz é sempre a menor linha: o canônico é a primeira ocorrência
+                    pais_uf[max(ra, rb)] = min(ra, rb)
+
+    return np.array([raiz(pais_uf, i) for i in range(n)])
+
+@app.command()
+def deduplicar(
+    input_file: str = typer.Argument("data/interim/corpus_lang.csv", help="CSV com a coluna 'texto' (saída do lang_detect); só compara documentos deste arquivo"),
+    output_file: str = typer.Option(None, "--output", "-o", help="CSV só com os canônicos (padrão: <entrada>_dedup.csv)"),
+    chave: str = typer.Option("id", help="Coluna que identifica o documento (criada se não existir)"),
+    num_perm: int = typer.Option(128, help="Tamanho da assinatura MinHash"),
+    bandas: int = typer.Option(16, help="Bandas do LSH (num_perm precisa ser múltiplo)"),
+    shingle: int = typer.Option(5, help="Tamanho do shingle de caracteres"),
+    limiar: float = typer.Option(0.8, help="Similaridade de Jaccard estimada mínima pra considerar duplicata"),
+):
+    print(f"Lendo arquivo: {input_file}")
+
+    path_in = Path(input_file)
+    if not path_in.exists():
+        print(f"erro: nao encontrei o arquivo {input_file}")
+        sys.exit(1)
+
+    df = pd.read_csv(path_in)
+    if 'texto' not in df.columns:
+        print("erro: ta faltando a coluna 'texto'.")
+        sys.exit(1)
+    if num_perm % bandas != 0:
+        print(f"erro: num_perm ({num_perm}) tem que ser múltiplo de bandas ({bandas})")
+        sys.exit(1)
+
+    # sem coluna de id, cria uma pra conseguir ligar os resultados de volta depois
+    if chave not in df.columns:
+        df.insert(0, chave, [f"{path_in.stem}_{i:06d}" for i in range(len(df))])
+        print(f"aviso: coluna '{chave}' criada a partir do número da linha")
+
+    textos = df['texto'].fillna('').astype(str).tolist()
+    assinaturas = assinaturas_minhash(textos, num_perm=num_perm, k=shingle)
+    canonico = agrupar_duplicatas(assinaturas, bandas=bandas, limiar=limiar)
+
+    chaves = df[chave].astype(str).to_numpy()
+    mapa = pd.DataFrame({
+        chave: chaves,
+        "canonico": chaves[canonico],
+        "similaridade": (assinaturas == assinaturas[canonico]).mean(axis=1),
+    })
+    mapa["tamanho_cluster"] = mapa.groupby("canonico")[chave].transform("size")
+
+    if output_file is None:
+        output_file = str(path_in.with_name(f"{path_in.stem}_dedup.csv"))
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    path_mapa = path_out.with_name(f"{path_out.stem}_mapa.csv")
+
+    eh_canonico = canonico == np.arange(len(df))
+    df[eh_canonico].to_csv(path_out, index=False)
+    mapa.to_csv(path_mapa, index=False)
+
+    n_clusters = int((mapa["tamanho_cluster"] > 1).groupby(mapa["canonico"]).any().sum())
+    print(f"\ndocumentos: {len(df)} | canônicos: {int(eh_canonico.sum())} | clusters com duplicata: {n_clusters}")
+    print(f"canônicos salvos em: {path_out}")
+    print(f"mapa canônico salvo em: {path_mapa}")
+
+@app.command()
+def expandir(
+    resultado_file: str = typer.Argument(..., help="Resultado de uma etapa rodada só nos canônicos (.csv, .parquet ou pasta de parquets)"),
+    mapa_file: str = typer.Argument(..., help="Mapa gerado pelo 'deduplicar' (<saida>_mapa.csv)"),
+    output_file: str = typer.Option(..., "--output", "-o", help="Resultado expandido para todas as cópias"),
+    chave: str = typer.Option("id", help="Coluna que identifica o documento"),
+):
+    for path in [resultado_file, mapa_file]:
+        if not Path(path).exists():
+            print(f"erro: nao encontrei o arquivo {path}")
+            sys.exit(1)
+
+    ler = lambda p: pd.read_parquet(p) if str(p).endswith('.parquet') or Path(p).is_dir() else pd.read_csv(p)
+    resultado = ler(resultado_file)
+    mapa = pd.read_csv(mapa_file, dtype={chave: str, "canonico": str})
+
+    if chave not in resultado.columns:
+        print(f"erro: o resultado não tem a coluna '{chave}'")
+        sys.exit(1)
+
+    # cada linha do canônico é repetida para cada cópia, trocando só a chave
+    resultado[chave] = resultado[chave].astype(str)
+    expandido = (resultado.rename(columns={chave: "canonico"})
+                          .merge(mapa[[chave, "canonico"]], on="canonico", how="inner"))
+    colunas = [chave] + [c for c in resultado.columns if c != chave] + ["canonico"]
+    expandido = expandido[colunas]
+
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    if path_out.suffix == '.parquet':
+        expandido.to_parquet(path_out, index=False)
+    else:
+        expandido.to_csv(path_out, index=False)
+
+    print(f"linhas: {len(resultado)} -> {len(expandido)}")
+    print(f"resultado expandido salvo em: {output_file}")
+
+if __name__ == "__main__":
+    app()
@@ -1,18 +1,114 @@
-from sentence_transformers import SentenceTransformer
 import pandas as pd
+import numpy as np
 import typer
 import sys 
+import sqlite3
+import hashlib
 from pathlib import Path
-from tqdm import tqdm
+from matriz_embeddings import salvar_matriz, DTYPES_MATRIZ
+from instrumentacao import Medicao
+from codificador import BACKENDS, codificar, verificar_precisao
 
 app = typer.Typer()
 
+# o sqlite limita a quantidade de parametros numa query, entao busca em pedacos
+TAMANHO_BUSCA = 900
+
+def hash_texto(texto):
+    # normaliza o texto (espacos sobrando) antes de tirar o hash,
+    # assim o mesmo post com espacamento diferente cai na mesma chave
+    texto_norm = " ".join(str(texto).split())
+    return hashlib.sha1(texto_norm.encode("utf-8")).hexdigest()
+
+def abrir_cache(cache_file):
+    # cache local em sqlite: (modelo, hash do texto) -> vetor em bytes
+    path_cache = Path(cache_file)
+    path_cache.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path_cache)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "modelo TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vetor BLOB NOT NULL, "
+        "PRIMARY KEY (modelo, hash))"
+    )
+    return conn
+
+def buscar_no_cache(conn, model_name, hashes):
+    # devolve um dict hash -> vetor so com o que ja estava salvo
+    encontrados = {}
+    for i in range(0, len(hashes), TAMANHO_BUSCA):
+        pedaco = hashes[i:i + TAMANHO_BUSCA]
+        marcadores = ",".join("?" * len(pedaco))
+        linhas = conn.execute(
+            f"SELECT hash, vetor FROM embeddings WHERE modelo = ? AND hash IN ({marcadores})",
+            [model_name, *pedaco]
+        )
+        for h, vetor in linhas:
+            encontrados[h] = np.frombuffer(vetor, dtype=np.float32)
+    return encontrados
+
+def salvar_no_cache(conn, model_name, hashes, vetores):
+    vetores = np.asarray(vetores, dtype=np.float32)
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (modelo, hash, dim, vetor) VALUES (?, ?, ?, ?)",
+        [(model_name, h, vetores.shape[1], v.tobytes()) for h, v in zip(hashes, vetores)]
+    )
+    conn.commit()
+
+def chave_modelo(model_name, backend):
+    # vetores do int8/onnx sao quase iguais aos do float, mas nao iguais: cada um tem a sua chave
+    return model_name if backend == 'float' else f"{model_name}#{backend}"
+
+def verificar_backend(textos, model_name, backend, amostra, limiar):
+    # int8/onnx so valem se ficarem perto do modelo float
+    media, minimo = verificar_precisao(textos, model_name, backend, amostra=amostra)
+    print(f"precisao do backend {backend}: cosseno medio {media:.4f}, minimo {minimo:.4f} (amostra de {min(amostra, len(textos))})")
+    if media < limiar:
+        print(f"erro: cosseno medio abaixo de {limiar}. use --backend float ou ajuste --limiar-cosseno")
+        sys.exit(1)
+
+def encode_com_cache(textos, model_name, conn, backend='float', workers=1, batch_size=32, codificar_fn=codificar):
+    # so manda pro modelo os textos que nao estao no cache
+    # e junta tudo de volta na ordem original
+    hashes = [hash_texto(t) for t in textos]
+    distintos = list(dict.fromkeys(hashes))
+    chave = chave_modelo(model_name, backend)
+
+    vetores = buscar_no_cache(conn, chave, distintos)
+    faltando = [h for h in distintos if h not in vetores]
+
+    print(f"cache: {len(distintos) - len(faltando)} hits, {len(faltando)} misses")
+
+    if faltando:
+        # pega um texto de exemplo pra cada hash que falta
+        texto_do_hash = {}
+        for h, t in zip(hashes, textos):
+            texto_do_hash.setdefault(h, t)
+
+        # so carrega o modelo se tiver alguma coisa pra codificar
+        novos = codificar_fn([texto_do_hash[h] for h in faltando], model_name, backend, workers, batch_size)
+
+        salvar_no_cache(conn, chave, faltando, novos)
+        vetores.update(zip(faltando, np.asarray(novos, dtype=np.float32)))
+
+    return np.stack([vetores[h] for h in hashes]) if hashes else np.empty((0, 0), dtype=np.float32)
+
 @app.command()
 def main(
     input_file: str = "data/processed/espanha_tokens.parquet",
     output_file: str = "data/embeddings/embeddings.parquet",
-    model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"
+    model_name: str = "paraphrase-multilingual-MiniLM-L12-v2",
+    cache_file: str = typer.Option("data/embeddings/cache.sqlite", help="arquivo do cache de embeddings"),
+    usar_cache: bool = typer.Option(True, help="--no-usar-cache codifica tudo de novo sem olhar o cache"),
+    dtype: str = typer.Option("float32", help="tipo da matriz .npy salva ao lado do parquet (float32 ou float16)"),
+    coluna_embedding: bool = typer.Option(True, help="--no-coluna-embedding salva os vetores so no .npy"),
+    backend: str = typer.Option("float", help="float, int8 (quantizacao dinamica) ou onnx"),
+    workers: int = typer.Option(1, help="processos codificando ao mesmo tempo (cada um com o seu modelo)"),
+    batch_size: int = typer.Option(32, help="textos por lote do encode"),
+    verificar: int = typer.Option(256, help="textos da amostra que compara int8/onnx com o float (0 desliga)"),
+    limiar_cosseno: float = typer.Option(0.99, help="cosseno medio minimo contra o float pra aceitar o backend")
 ):
+    medicao = Medicao("embeddings", input_file=input_file, model_name=model_name, usar_cache=usar_cache, dtype=dtype,
+                      backend=backend, workers=workers, batch_size=batch_size)
     print(f"lendo arquivo: {input_file}")
     
     # confere se o arquivo de input existe
@@ -27,32 +123,65 @@ def main(
         print(f"deu erro pra ler o arquivo parquet: {e}")
         sys.exit(1)
     
+    if dtype not in DTYPES_MATRIZ:
+        print(f"erro: dtype tem que ser um de {DTYPES_MATRIZ}")
+        sys.exit(1)
+
+    if backend not in BACKENDS:
+        print(f"erro: backend tem que ser um de {BACKENDS}")
+        sys.exit(1)
+    
     # confere se a coluna texto existe
     if 'texto' not in df.columns:
         print("erro: coluna 'texto' nao encontrada no arquivo de entrada")
         sys.exit(1)
     
-    # carrega o modelo sentence transformer
-    model = SentenceTransformer(model_name)
-    
-    # barra de progresso pra acompanhar
-    tqdm.pandas(desc="processando")
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    def codificar_verificado(textos, *args):
+        # a verificacao so roda quando algum texto vai mesmo pro modelo (com tudo no cache, nao carrega nada)
+        if backend != 'float' and verificar > 0 and len(textos):
+            verificar_backend(textos, model_name, backend, verificar, limiar_cosseno)
+            medicao.marcar("verificacao")
+        return codificar(textos, *args)
+
     print(f"processando {len(df)} linhas...")
     
-    # transforma a coluna 'texto' em uma lista
-    embeddings = model.encode(df['texto'].tolist())
+    if usar_cache:
+        # so os textos novos passam pelo modelo, o resto vem do cache
+        conn = abrir_cache(cache_file)
+        try:
+            embeddings = encode_com_cache(df['texto'].tolist(), model_name, conn, backend, workers, batch_size,
+                                          codificar_fn=codificar_verificado)
+        finally:
+            conn.close()
+    else:
+        # textos ordenados por tamanho em baldes, divididos entre os processos
+        embeddings = codificar_verificado(df['texto'].tolist(), model_name, backend, workers, batch_size)
+
+    # o modelo e carregado dentro do codificar (e so se precisar), entao entra aqui
+    medicao.marcar("process")
 
-    # 
-    df['embedding'] = list(embeddings)
+    # linha de cada documento na matriz .npy
+    df['emb_row'] = np.arange(len(df))
+    
+    # a coluna de lista e opcional: os scripts de topicos leem o .npy direto
+    if coluna_embedding:
+        df['embedding'] = list(embeddings)
     
     # cria a pasta se nao existir
     path_out = Path(output_file)
     path_out.parent.mkdir(parents=True, exist_ok=True)
     
     df.to_parquet(output_file)
+    path_npy = salvar_matriz(embeddings, path_out, dtype=dtype)
+    medicao.marcar("write")
     
     print("pronto!")
     print(f"arquivo salvo em: {output_file}")
+    print(f"matriz ({dtype}) salva em: {path_npy}")
+    medicao.finalizar(n_docs=len(df))
 
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
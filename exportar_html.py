@@ -0,0 +1,145 @@
+import numpy as np
+import typer
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from resultados_topicos import PASTA_MAPA, ler_mapa_topicos
+
+# Gera os HTML dos tópicos a partir do artefato mapa_topicos/ gravado pelos scripts de
+# tópicos (BERTopic.py / bertopicc.py). Não carrega o modelo: o layout 2-D e as palavras
+# já estão prontos, então cada gráfico é só plotly + write_html, em paralelo.
+
+app = typer.Typer()
+
+PALAVRAS_NO_GRAFICO = 5
+
+def figura_mapa(topicos, titulo):
+    """Mapa de distância entre tópicos: um círculo por tópico, área proporcional ao tamanho."""
+    import plotly.graph_objects as go
+
+    tamanho = np.sqrt(topicos['tamanho'].to_numpy(dtype=float))
+    tamanho = 10 + 50 * tamanho / max(tamanho.max(), 1)
+    fig = go.Figure(go.Scatter(
+        x=topicos['x'], y=topicos['y'],
+        mode='markers+text',
+        text=topicos['topic_id'].astype(str),
+        marker=dict(size=tamanho, opacity=0.6, line=dict(width=1, color='DarkSlateGrey')),
+        customdata=np.stack([topicos['nome'], topicos['tamanho'], topicos['palavras']], axis=1),
+        hovertemplate="<b>%{customdata[0]}</b><br>documentos: %{customdata[1]}<br>%{customdata[2]}<extra></extra>",
+    ))
+    fig.update_layout(title=titulo, template='simple_white', width=800, height=700,
+                      xaxis=dict(visible=False), yaxis=dict(visible=False))
+    return fig
+
+def figura_barras(topicos, palavras, titulo, colunas=4):
+    """Barras horizontais com as palavras de maior score de cada tópico."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    linhas = max(1, -(-len(topicos) // colunas))
+    fig = make_subplots(rows=linhas, cols=colunas, subplot_titles=[f"Tópico {t}" for t in topicos['topic_id']],
+                        horizontal_spacing=0.1, vertical_spacing=0.4 / linhas)
+    por_topico = dict(tuple(palavras.groupby('topic_id')))
+
+    for i, t in enumerate(topicos['topic_id']):
+        top = por_topico.get(t, palavras.iloc[:0]).sort_values('rank').head(PALAVRAS_NO_GRAFICO)
+        fig.add_trace(go.Bar(x=top['score'][::-1], y=top['palavra'][::-1], orientation='h'),
+                      row=i // colunas + 1, col=i % colunas + 1)
+
+    fig.update_layout(title=titulo, template='plotly_white', showlegend=False,
+                      width=250 * colunas, height=250 * linhas)
+    return fig
+
+def renderizar(tarefa):
+    """Roda dentro do pool: monta uma figura e grava o HTML."""
+    if tarefa["tipo"] == "mapa":
+        fig = figura_mapa(tarefa["topicos"], tarefa["titulo"])
+    else:
+        fig = figura_barras(tarefa["topicos"], tarefa["palavras"], tarefa["titulo"])
+    # inline por padrão (o HTML abre sem internet, como antes); 'cdn' deixa cada arquivo ~3 MB menor
+    fig.write_html(tarefa["arquivo"], include_plotlyjs='cdn' if tarefa["cdn"] else True)
+    return Path(tarefa["arquivo"]).name
+
+def tarefas_de_exportacao(topicos, palavras, paises, pasta, estilo, top_global, top_pais, filtro_paises, incluir_global):
+    """Lista de gráficos a gerar (mesmos nomes de arquivo de antes)."""
+    tarefas = []
+    if incluir_global:
+        tarefas.append({"tipo": "mapa", "titulo": "Mapa global de tópicos", "topicos": topicos,
+                        "arquivo": str(pasta / "global_topics_map.html")})
+        maiores = topicos.nlargest(top_global, 'tamanho')
+        tarefas.append({"tipo": "barras", "titulo": "Tópicos globais", "topicos": maiores,
+                        "palavras": palavras[palavras['topic_id'].isin(maiores['topic_id'])],
+                        "arquivo": str(pasta / "global_topics_bar.html")})
+
+    for pais, contagem in paises.groupby('pais', observed=True):
+        if filtro_paises and pais not in filtro_paises:
+            continue
+        # tamanho do tópico dentro do país, não o global
+        do_pais = topicos.drop(columns='tamanho').merge(contagem[['topic_id', 'n_docs']].rename(columns={'n_docs': 'tamanho'}), on='topic_id')
+        if do_pais.empty:
+            continue
+        if estilo == "barras":
+            do_pais = do_pais.nlargest(top_pais, 'tamanho')
+        arquivo = str(pasta / f"topics_{str(pais).lower().replace(' ', '_')}.html")
+        tarefas.append({"tipo": estilo, "titulo": f"Tópicos: {pais}", "topicos": do_pais,
+                        "palavras": palavras[palavras['topic_id'].isin(do_pais['topic_id'])],
+                        "arquivo": arquivo})
+    return tarefas
+
+@app.command()
+def main(
+    output_dir: str = typer.Argument("results/topics/", help="Pasta de saída do BERTopic.py / bertopicc.py"),
+    estilo: str = typer.Option("barras", help="Gráfico por país: 'barras' ou 'mapa'"),
+    pais: list[str] = typer.Option([], "--pais", help="Só esses países (pode repetir)"),
+    incluir_global: bool = typer.Option(True, "--global/--sem-global", help="Gera também os gráficos globais"),
+    top_global: int = typer.Option(20, help="Tópicos no gráfico de barras global"),
+    top_pais: int = typer.Option(10, help="Tópicos no gráfico de barras de cada país"),
+    pular_existentes: bool = typer.Option(False, "--pular-existentes", help="Não regera HTML mais novo que o mapa"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processos renderizando ao mesmo tempo"),
+    plotly_cdn: bool = typer.Option(False, "--plotly-cdn", help="Carrega o plotly.js da internet em vez de embutir no HTML"),
+):
+    print("--- Exportação dos gráficos de tópicos (HTML) ---")
+
+    pasta = Path(output_dir)
+    if not (pasta / PASTA_MAPA).exists():
+        print(f"ERRO: Não encontrei {pasta / PASTA_MAPA}. Rode o script de tópicos antes.")
+        sys.exit(1)
+
+    if estilo not in ("barras", "mapa"):
+        print(f"ERRO: estilo '{estilo}' desconhecido. Use 'barras' ou 'mapa'.")
+        sys.exit(1)
+
+    topicos, palavras, paises = ler_mapa_topicos(pasta)
+    tarefas = tarefas_de_exportacao(topicos, palavras, paises, pasta, estilo, top_global, top_pais, set(pais), incluir_global)
+
+    if pular_existentes:
+        referencia = (pasta / PASTA_MAPA / "topicos.parquet").stat().st_mtime
+        antes = len(tarefas)
+        tarefas = [t for t in tarefas if not (Path(t["arquivo"]).exists() and Path(t["arquivo"]).stat().st_mtime >= referencia)]
+        print(f"   [i] {antes - len(tarefas)} gráficos já atualizados, pulando")
+
+    if not tarefas:
+        print("Nada para gerar.")
+        return
+    for t in tarefas:
+        t["cdn"] = plotly_cdn
+
+    print(f"Gerando {len(tarefas)} gráficos em {min(workers, len(tarefas))} processos...")
+    erros = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(tarefas))) as pool:
+        futuros = {pool.submit(renderizar, t): t["arquivo"] for t in tarefas}
+        for futuro in as_completed(futuros):
+            try:
+                print(f"   -> Visualização: {futuro.result()}")
+            except Exception as e:
+                erros += 1
+                print(f"   [!] Erro ao gerar {Path(futuros[futuro]).name}: {e}")
+
+    print(f"\nGráficos salvos em: {output_dir}" + (f" ({erros} com erro)" if erros else ""))
+    # falha de renderização tem que falhar a etapa (senão o pipeline guarda a impressão)
+    if erros:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    app()
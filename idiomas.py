@@ -0,0 +1,26 @@
+# Tabela única de idiomas: o nome que sai do lang_detect (ou o código) -> código curto.
+# tokens.py, ner.py, nlp_unico.py e keywords.py escolhem o modelo/stopwords por aqui,
+# então a mesma linha cai sempre no mesmo idioma em todos eles.
+import unicodedata
+
+CODIGOS_IDIOMA = {
+    'portugues': 'pt',
+    'espanhol': 'es',
+    'ingles': 'en',
+    'pt': 'pt',
+    'es': 'es',
+    'en': 'en'
+}
+
+# código -> modelo do spaCy
+MODELOS_SPACY = {
+    'pt': 'pt_core_news_sm',
+    'es': 'es_core_news_sm',
+    'en': 'en_core_web_sm'
+}
+
+def codigo_idioma(idioma, padrao="pt"):
+    # sem acento e em minúsculas: 'Inglês', 'ingles' e 'en' viram 'en'
+    idioma = ''.join(c for c in unicodedata.normalize('NFD', str(idioma).strip().lower())
+                     if unicodedata.category(c) != 'Mn')
+    return CODIGOS_IDIOMA.get(idioma, padrao)
@@ -0,0 +1,184 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import typer
+import hashlib
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from dataset_corpus import (
+    COLUNAS_TEXTO, COLUNAS_DICIONARIO, SCHEMA_ARQUIVO,
+    nome_coluna, detectar_separador, ler_corpus,
+)
+from instrumentacao import Medicao
+
+# Lê os exports brutos (CSV com ';' ou ',', com ou sem BOM, 'text' ou 'texto', 'País' ou
+# 'country') uma vez só e grava o corpus canônico particionado por país/idioma.
+# Cada arquivo de origem vira um .parquet por partição; rodar de novo com o mesmo
+# arquivo substitui o que ele tinha gravado antes.
+# Os exports se sobrepõem (o corpus.csv repete textos dos CSVs por país, sem o mesmo id):
+# uma linha cujo id de origem ou texto (hash_texto) já foi gravado por outro arquivo é
+# pulada, então fica valendo a versão do arquivo ingerido primeiro.
+
+app = typer.Typer()
+
+def classificar_idiomas(textos, pool, workers):
+    """Mesmo detect_language do lang_detect.py, dividido entre os processos do pool."""
+    from lang_detect import classificar_lote
+    if pool is None:
+        return classificar_lote(textos)
+    tamanho = max(1, -(-len(textos) // workers))
+    partes = [textos[i:i + tamanho] for i in range(0, len(textos), tamanho)]
+    return [idioma for resultado in pool.map(classificar_lote, partes) for idioma in resultado]
+
+def hash_texto(texto):
+    """Hash do texto com os espaços normalizados: mesma postagem em dois exports, mesmo hash."""
+    return hashlib.sha1(' '.join(str(texto).split()).encode('utf-8')).hexdigest()[:16]
+
+def documentos_gravados(output_dir, arquivo):
+    """ids e hashes de texto já gravados no dataset por outros arquivos de origem."""
+    if not any(Path(output_dir).glob("pais=*/idioma=*/*.parquet")):
+        return set(), set()
+    df = ler_corpus(output_dir, colunas=['id', 'hash_texto', 'arquivo_origem'])
+    df = df[df['arquivo_origem'] != arquivo]
+    return set(df['id'].dropna()), set(df['hash_texto'].dropna())
+
+def normalizar_bloco(bloco, pais_padrao, arquivo, contador_ids):
+    """Padroniza nomes de colunas, preenche pais/id e deixa só as colunas do esquema."""
+    bloco = bloco.rename(columns=nome_coluna)
+    bloco = bloco.loc[:, ~bloco.columns.duplicated()]
+
+    if 'pais' not in bloco.columns:
+        bloco['pais'] = pais_padrao
+    bloco['pais'] = bloco['pais'].fillna(pais_padrao).astype(str).str.strip().str.replace('/', '-')
+
+    # sem id: '<Pais>_<arquivo>_0001'... começa pelo país como no corpus.csv, e o nome do
+    # arquivo evita colidir com os ids do corpus.csv quando os dois são ingeridos
+    if 'id' not in bloco.columns:
+        ids = []
+        for pais in bloco['pais']:
+            contador_ids[pais] += 1
+            ids.append(f"{pais}_{pais_padrao.lower()}_{contador_ids[pais]:04d}")
+        bloco['id'] = ids
+
+    bloco['arquivo_origem'] = arquivo
+    bloco['hash_texto'] = bloco['texto'].map(hash_texto, na_action='ignore')
+    for c in COLUNAS_TEXTO:
+        if c not in bloco.columns:
+            bloco[c] = None
+    return bloco
+
+def gravar_particoes(bloco, output_dir, stem, escritores):
+    """Anexa cada grupo (pais, idioma) do bloco no parquet da sua partição."""
+    contagem = Counter()
+    for (pais, idioma), grupo in bloco.groupby(['pais', 'idioma'], sort=False):
+        chave = (pais, idioma)
+        if chave not in escritores:
+            pasta = Path(output_dir) / f"pais={pais}" / f"idioma={idioma}"
+            pasta.mkdir(parents=True, exist_ok=True)
+            escritores[chave] = pq.ParquetWriter(
+                pasta / f"{stem}.parquet", SCHEMA_ARQUIVO,
+                compression='zstd', use_dictionary=COLUNAS_DICIONARIO,
+            )
+        valores = grupo[COLUNAS_TEXTO].astype(object).where(grupo[COLUNAS_TEXTO].notna(), None)
+        escritores[chave].write_table(pa.Table.from_pandas(valores, schema=SCHEMA_ARQUIVO, preserve_index=False))
+        contagem[chave] += len(grupo)
+    return contagem
+
+def ingerir_arquivo(path, output_dir, chunk_size, pool, workers):
+    sep = detectar_separador(path)
+    stem = path.stem
+    print(f"{path.name}: separador '{sep}'")
+
+    # reingestão do mesmo arquivo: apaga as partes antigas dele antes de gravar
+    for antigo in Path(output_dir).glob(f"pais=*/idioma=*/{stem}.parquet"):
+        antigo.unlink()
+
+    escritores = {}
+    contagem = Counter()
+    contador_ids = Counter()
+    ids_vistos, hashes_vistos = documentos_gravados(output_dir, path.name)
+    pulados = 0
+    try:
+        leitor = pd.read_csv(path, sep=sep, dtype=str, encoding='utf-8-sig', chunksize=chunk_size)
+        for bloco in leitor:
+            # só o id que veio no arquivo reconhece o documento em outro export (o gerado não)
+            id_origem = 'id' in [nome_coluna(c) for c in bloco.columns]
+            bloco = normalizar_bloco(bloco, stem, path.name, contador_ids)
+
+            # já gravado por outro arquivo (mesmo id de origem ou mesmo texto): pula
+            repetido = bloco['hash_texto'].isin(hashes_vistos)
+            if id_origem:
+                repetido |= bloco['id'].isin(ids_vistos)
+            pulados += int(repetido.sum())
+            bloco = bloco[~repetido.to_numpy()]
+            if bloco.empty:
+                continue
+
+            # idioma só é detectado quando o arquivo ainda não tem (os *_lang.csv já têm)
+            faltando = bloco['idioma'].isna() if 'idioma' in bloco.columns else pd.Series(True, index=bloco.index)
+            if faltando.any():
+                if 'idioma' not in bloco.columns:
+                    bloco['idioma'] = None
+                bloco.loc[faltando, 'idioma'] = classificar_idiomas(bloco.loc[faltando, 'texto'].tolist(), pool, workers)
+
+            contagem += gravar_particoes(bloco, output_dir, stem, escritores)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+
+    if pulados:
+        print(f"{path.name}: {pulados} documentos já estavam no dataset por outro arquivo, pulados")
+    return contagem
+
+@app.command()
+def main(
+    arquivos: list[str] = typer.Argument(None, help="CSVs brutos (padrão: corpus.csv)"),
+    output_dir: str = typer.Option("data/corpus", "--output-dir", "-o", help="Pasta do dataset particionado"),
+    chunk_size: int = typer.Option(50000, help="Linhas lidas por bloco"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processos para detectar idioma"),
+):
+    medicao = Medicao("ingestao", output_dir=output_dir, chunk_size=chunk_size)
+    arquivos = arquivos or ["corpus.csv"]
+
+    faltando = [a for a in arquivos if not Path(a).exists()]
+    if faltando:
+        print(f"Erro: nao encontrei {', '.join(faltando)}")
+        sys.exit(1)
+
+    # confere a coluna de texto antes de gravar qualquer coisa
+    for a in arquivos:
+        cabecalho = pd.read_csv(a, sep=detectar_separador(a), nrows=0, encoding='utf-8-sig').columns
+        if 'texto' not in [nome_coluna(c) for c in cabecalho]:
+            print(f"Erro: {a} nao tem coluna de texto ('texto' ou 'text').")
+            sys.exit(1)
+    medicao.marcar("load")
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    total = Counter()
+
+    from lang_detect import iniciar_worker
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=iniciar_worker) if workers > 1 else None
+    if pool is None:
+        iniciar_worker()
+
+    try:
+        for a in arquivos:
+            total += ingerir_arquivo(Path(a), output_dir, chunk_size, pool, workers)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    medicao.marcar("process")
+
+    resumo = pd.Series(list(total.values()), index=pd.MultiIndex.from_tuples(list(total), names=['pais', 'idioma']), dtype='int64')
+    print("\n--- Documentos por partição ---")
+    print(resumo.sort_index().to_string())
+
+    n_docs = len(ler_corpus(output_dir, colunas=['id']))
+    print(f"\nTudo certo! {int(resumo.sum())} documentos gravados agora, {n_docs} no dataset: {output_dir}")
+    medicao.finalizar(n_docs=int(resumo.sum()))
+
+if __name__ == "__main__":
+    app()
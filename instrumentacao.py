@@ -0,0 +1,97 @@
+import cProfile
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentação compartilhada pelos comandos do pipeline.
+#   CIBERML_METRICAS  arquivo JSON lines das métricas (padrão results/metricas.jsonl; vazio desliga)
+#   CIBERML_PROFILE   pasta para o dump do cProfile de cada execução (desligado por padrão)
+
+METRICAS_PADRAO = "results/metricas.jsonl"
+
+def pico_rss_mb():
+    """Pico de memória residente (MB) deste processo e dos filhos já encerrados."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux devolve KB, macOS devolve bytes
+    return pico / (1024 * 1024) if platform.system() == "Darwin" else pico / 1024
+
+class Medicao:
+    """Mede um comando por fases: cada marcar(fase) conta o tempo desde a marca anterior.
+
+    Uso:
+        medicao = Medicao("tokens", input_file=input_file)
+        ...carrega...
+        medicao.marcar("load")
+        ...
+        medicao.finalizar(n_docs=len(df))
+    """
+
+    def __init__(self, comando, **parametros):
+        self.comando = comando
+        self.parametros = {k: str(v) for k, v in parametros.items()}
+        self.inicio = time.perf_counter()
+        self.ultima_marca = self.inicio
+        self.data = datetime.now()
+        self.fases = {}
+        self.memoria_df = {}
+
+        self.pasta_profile = os.environ.get("CIBERML_PROFILE")
+        self.profiler = None
+        if self.pasta_profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def marcar(self, fase):
+        agora = time.perf_counter()
+        self.fases[fase] = self.fases.get(fase, 0.0) + (agora - self.ultima_marca)
+        self.ultima_marca = agora
+
+    def dataframe(self, nome, df):
+        """Guarda o tamanho em memória (MB) de um DataFrame."""
+        self.memoria_df[nome] = float(df.memory_usage(deep=True).sum()) / (1024 * 1024)
+
+    def finalizar(self, n_docs=None):
+        total = time.perf_counter() - self.inicio
+        registro = {
+            "comando": self.comando,
+            "data": self.data.isoformat(timespec="seconds"),
+            "parametros": self.parametros,
+            "fases_s": {k: round(v, 4) for k, v in self.fases.items()},
+            "total_s": round(total, 4),
+            "n_docs": n_docs,
+            "docs_por_seg": round(n_docs / total, 2) if n_docs and total > 0 else None,
+            "pico_rss_mb": pico_rss_mb(),
+            "memoria_df_mb": {k: round(v, 2) for k, v in self.memoria_df.items()},
+            "host": platform.node(),
+            "pid": os.getpid(),
+        }
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            pasta = Path(self.pasta_profile)
+            pasta.mkdir(parents=True, exist_ok=True)
+            path_prof = pasta / f"{self.comando}_{self.data:%Y%m%d_%H%M%S}_{os.getpid()}.prof"
+            self.profiler.dump_stats(path_prof)
+            registro["profile"] = str(path_prof)
+
+        destino = os.environ.get("CIBERML_METRICAS", METRICAS_PADRAO)
+        if destino:
+            path = Path(destino)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+        print(f"[metricas] {self.comando}: {total:.2f}s" +
+              (f", {registro['docs_por_seg']} docs/s" if registro["docs_por_seg"] else "") +
+              (f", pico {registro['pico_rss_mb']:.0f} MB" if registro["pico_rss_mb"] else ""))
+        return registro
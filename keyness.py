@@ -0,0 +1,187 @@
+import pandas as pd
+import numpy as np
+import typer
+import sys
+from pathlib import Path
+from colocacoes import ler_lemas, codificar_lemas
+from keywords import carregar_stopwords
+from idiomas import codigo_idioma
+from kwic import normalize
+from instrumentacao import Medicao
+
+app = typer.Typer()
+
+# Keyness comparativa: cada país contra o resto do corpus, todos de uma vez.
+# Uma matriz esparsa termo x país com as contagens de todos os *_tokens.parquet; o
+# log-likelihood (Rayson & Garside) e o %DIFF (Gabrielatos & Marchi) saem de operações
+# vetorizadas sobre as entradas não nulas, então o custo quase não muda com o número de países.
+# Os termos ausentes de um país (entradas zero) são os negativos mais fortes dele; como o LL
+# deles só depende da frequência no resto, basta pegar os mais frequentes (termos_ausentes).
+# O tamanho de cada país conta todos os tokens (tokens_por_pais); o min_freq só escolhe quais
+# termos recebem pontuação, sem mexer nos totais.
+
+# LL crítico (1 grau de liberdade) para cada p-valor
+LL_CRITICO = {0.05: 3.84, 0.01: 6.63, 0.001: 10.83, 0.0001: 15.13}
+
+def contagens_por_pais(ids, doc, pais_doc, n_termos, n_paises):
+    """Matriz CSR termo x país com o número de ocorrências (termos raros, id -1, ficam de fora)."""
+    from scipy import sparse
+
+    validos = ids >= 0
+    pais_token = pais_doc[doc[validos]]
+    uns = np.ones(int(validos.sum()), dtype=np.int64)
+    return sparse.coo_matrix((uns, (ids[validos], pais_token)), shape=(n_termos, n_paises)).tocsr()
+
+def tokens_por_pais(doc, pais_doc, n_paises):
+    """Total de tokens de cada país, contando também os termos raros que saem da matriz."""
+    return np.bincount(pais_doc[doc], minlength=n_paises).astype(np.float64)
+
+def termos_ausentes(matriz, top_n, permitidos):
+    """(termo, pais) dos top_n termos mais frequentes no resto que não aparecem em cada país."""
+    total_termo = np.asarray(matriz.sum(axis=1)).ravel()
+    ordem = np.argsort(-total_termo, kind="stable")
+    ordem = ordem[permitidos[ordem]]
+    csc = matriz.tocsc()
+
+    termos, paises = [], []
+    for j in range(matriz.shape[1]):
+        presentes = np.zeros(matriz.shape[0], dtype=bool)
+        presentes[csc.indices[csc.indptr[j]:csc.indptr[j + 1]]] = True
+        escolhidos = ordem[~presentes[ordem]][:top_n]
+        termos.append(escolhidos)
+        paises.append(np.full(len(escolhidos), j))
+    return np.concatenate(termos), np.concatenate(paises)
+
+def keyness(matriz, total_pais, termo=None, pais=None):
+    """LL e %DIFF de cada (termo, país) contra o resto do corpus.
+
+    total_pais é o número de tokens de cada país (tokens_por_pais). Sem termo/pais, calcula para todas as entradas não nulas da matriz; com eles
+    (por exemplo os de termos_ausentes), só para esses pares.
+    Devolve (termo, pais, a, b, ll, pct_diff), onde a = ocorrências no país e
+    b = ocorrências nos outros países. LL negativo = termo usado menos que no resto.
+    """
+    if termo is None:
+        coo = matriz.tocoo()
+        termo, pais = coo.row, coo.col
+        a = coo.data.astype(np.float64)
+    else:
+        a = np.asarray(matriz[termo, pais]).ravel().astype(np.float64)
+
+    total_termo = np.asarray(matriz.sum(axis=1)).ravel().astype(np.float64)
+    total_pais = np.asarray(total_pais, dtype=np.float64)
+    n = total_pais.sum()
+
+    b = total_termo[termo] - a
+    c = total_pais[pais]
+    d = n - c
+
+    e1 = c * (a + b) / n
+    e2 = d * (a + b) / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ll = 2 * (np.where(a > 0, a * np.log(a / e1), 0.0) + np.where(b > 0, b * np.log(b / e2), 0.0))
+
+        # %DIFF com as frequências normalizadas; termo ausente no resto fica com inf
+        freq_pais = a / c
+        freq_resto = np.where(d > 0, b / d, 0.0)
+        pct_diff = np.where(freq_resto > 0, 100 * (freq_pais - freq_resto) / freq_resto, np.inf)
+
+    ll = np.where(freq_pais < freq_resto, -ll, ll)
+    return termo, pais, a, b, ll, pct_diff
+
+@app.command()
+def main(
+    input_glob: str = typer.Argument("data/processed/*_tokens.parquet", help="Parquet(s) de lemas (tokens.py / nlp_unico.py)"),
+    output_file: str = typer.Option("results/keyness.csv", "--output", "-o", help="CSV com os termos-chave de cada país"),
+    top_n: int = typer.Option(50, help="Termos por país"),
+    min_freq: int = typer.Option(5, help="Termos com menos ocorrências no corpus todo ficam de fora"),
+    p_valor: float = typer.Option(0.01, help=f"Corte de significância do LL ({', '.join(map(str, LL_CRITICO))})"),
+    negativos: bool = typer.Option(False, "--negativos", help="Também lista os termos sub-usados (LL negativo), incluindo os ausentes do país"),
+    stopwords: bool = typer.Option(True, "--stopwords/--sem-stopwords", help="Tira as stopwords dos idiomas do corpus"),
+    pais: list[str] = typer.Option([], "--pais", help="Só esses países (o resto do corpus passa a ser só eles)"),
+    idioma: list[str] = typer.Option([], "--idioma", help="Só esses idiomas (pode repetir)"),
+):
+    medicao = Medicao("keyness", input_glob=input_glob, min_freq=min_freq, p_valor=p_valor)
+    print("--- Keyness por país (LL e %DIFF contra o resto do corpus) ---")
+
+    if p_valor not in LL_CRITICO:
+        print(f"Erro: p-valor tem que ser um de {list(LL_CRITICO)}")
+        sys.exit(1)
+
+    arquivos = sorted(Path().glob(input_glob)) if any(c in input_glob for c in "*?[") else [Path(input_glob)]
+    arquivos = [a for a in arquivos if a.exists()]
+    if not arquivos:
+        print(f"Erro: nenhum arquivo encontrado para {input_glob}")
+        sys.exit(1)
+
+    df = ler_lemas(arquivos, pais, idioma)
+    if "lemas" not in df.columns or "pais" not in df.columns:
+        print("Erro: os arquivos precisam das colunas 'lemas' e 'pais'. Rode o tokens.py (ou o nlp_unico.py) antes.")
+        sys.exit(1)
+
+    listas = [x.tolist() if hasattr(x, "tolist") else x for x in df["lemas"]]
+    listas = [x if isinstance(x, list) else [] for x in listas]
+    pais_doc, paises = pd.factorize(df["pais"].astype(str))
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    if len(paises) < 2:
+        print(f"Erro: keyness compara países, e só achei {list(paises)}.")
+        sys.exit(1)
+    print(f"{len(listas)} documentos, {len(paises)} países: {', '.join(paises)}")
+
+    ids, doc, vocab = codificar_lemas(listas, min_freq)
+    matriz = contagens_por_pais(ids, doc, pais_doc, len(vocab), len(paises))
+    total_pais = tokens_por_pais(doc, pais_doc, len(paises))
+
+    # stopwords e termos curtos saem antes, pra não ocuparem o lugar dos ausentes
+    termos_vocab = vocab["termo"].astype(str)
+    permitidos = np.ones(len(vocab), dtype=bool)
+    if stopwords:
+        idiomas = df["idioma"].dropna().astype(str).unique() if "idioma" in df.columns else ["pt"]
+        # o vocabulário passou pelo normalize do kwic (sem acento): 'não' tem que virar 'nao'
+        stop = {normalize(w) for w in set().union(*(carregar_stopwords(codigo_idioma(i)) for i in idiomas))}
+        permitidos = (~termos_vocab.isin(stop) & (termos_vocab.str.len() >= 3)).to_numpy()
+
+    termo, idx_pais, a, b, ll, pct_diff = keyness(matriz, total_pais)
+    if negativos:
+        partes = [(termo, idx_pais, a, b, ll, pct_diff), keyness(matriz, total_pais, *termos_ausentes(matriz, top_n, permitidos))]
+        termo, idx_pais, a, b, ll, pct_diff = (np.concatenate(x) for x in zip(*partes))
+
+    resultado = pd.DataFrame({
+        "pais": np.asarray(paises, dtype=object)[idx_pais],
+        "termo": vocab["termo"].to_numpy(dtype=object)[termo],
+        "freq_pais": a.astype(np.int64),
+        "freq_resto": b.astype(np.int64),
+        "por_milhao_pais": np.round(1e6 * a / total_pais[idx_pais], 2),
+        "ll": np.round(ll, 3),
+        "pct_diff": np.round(pct_diff, 2),
+    })
+    resultado = resultado[permitidos[termo]]
+
+    corte = LL_CRITICO[p_valor]
+    significativos = resultado["ll"].abs() >= corte
+    if not negativos:
+        significativos &= resultado["ll"] > 0
+    resultado = resultado[significativos]
+
+    # top_n por país e sentido (positivos e, se pedido, negativos) ordenados por |LL|
+    resultado = resultado.assign(sentido=np.where(resultado["ll"] > 0, "+", "-"))
+    resultado = resultado.reindex(resultado["ll"].abs().sort_values(ascending=False).index)
+    resultado = resultado.groupby(["pais", "sentido"], sort=False).head(top_n)
+    resultado = resultado.sort_values(["pais", "sentido"], kind="stable")
+    resultado.insert(2, "rank", resultado.groupby(["pais", "sentido"]).cumcount() + 1)
+    medicao.marcar("process")
+
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    resultado.to_csv(path_out, index=False, encoding="utf-8-sig")
+    medicao.marcar("write")
+
+    print(f"\nTermos-chave (LL >= {corte}, p < {p_valor}) por país:")
+    for p, grupo in resultado[resultado["sentido"] == "+"].groupby("pais", sort=True):
+        print(f"   {p}: {', '.join(grupo['termo'].head(8))}")
+    print(f"\n✅ Keyness salva em: {output_file} ({len(resultado)} linhas)")
+    medicao.finalizar(n_docs=len(listas))
+
+if __name__ == "__main__":
+    app()
@@ -1,52 +1,273 @@
 import pandas as pd
+import numpy as np
 import typer
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import yake
+import importlib.util
+from instrumentacao import Medicao
+from idiomas import codigo_idioma
 
 app = typer.Typer()
 
+# Os lemas não têm pontuação, então a "frase" do YAKE vira um bloco de N lemas seguidos
+TOKENS_POR_FRASE = 20
+
+def carregar_stopwords(lan):
+    # usa as mesmas listas que o YAKE usa por dentro
+    # (a pasta mudou de lugar entre as versoes do yake)
+    # acha a pasta do pacote sem importar o yake (o motor vetorizado nao precisa dele)
+    spec = importlib.util.find_spec("yake")
+    if spec is None or not spec.submodule_search_locations:
+        return set()
+    raiz = Path(list(spec.submodule_search_locations)[0])
+    pasta = next((p for p in [raiz / "StopwordsList", raiz / "core" / "StopwordsList"] if p.exists()), None)
+    if pasta is None:
+        return set()
+    arquivo = pasta / f"stopwords_{lan[:2].lower()}.txt"
+    if not arquivo.exists():
+        arquivo = pasta / "stopwords_noLang.txt"
+    if not arquivo.exists():
+        return set()
+    try:
+        texto = arquivo.read_text(encoding="utf-8")
+    except UnicodeDecodeError:
+        texto = arquivo.read_text(encoding="ISO-8859-1")
+    return set(texto.lower().split())
+
+def achatar_lemas(listas):
+    # transforma a lista de listas em vetores: lema, documento e posicao no documento
+    tamanhos = np.fromiter((len(x) for x in listas), dtype=np.int64, count=len(listas))
+    tokens = pd.Series([t for x in listas for t in x], dtype=object).astype(str)
+    doc = np.repeat(np.arange(len(listas)), tamanhos)
+    pos = np.arange(len(tokens)) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    return tokens, doc, pos
+
+def contagem_maiusculas(textos):
+    # os lemas estao todos em minusculo, entao a informacao de caixa alta vem do texto original
+    palavras = pd.Series(list(textos), dtype=object).dropna().astype(str)
+    palavras = palavras.str.findall(r"[^\W\d_]+").explode().dropna()
+    if palavras.empty:
+        vazio = pd.Series(dtype=float)
+        return vazio, vazio
+
+    minusculas = palavras.str.lower()
+    sigla = palavras.str.isupper() & (palavras.str.len() > 1)
+    inicial = palavras.str[0].str.isupper() & ~sigla
+    return inicial.groupby(minusculas).sum(), sigla.groupby(minusculas).sum()
+
+def pontuar_palavras(codigos, doc, pos, vocab, eh_stop, textos):
+    """Features do YAKE para cada lema do vocabulário, tudo com contagens vetorizadas.
+
+    Devolve o score S(w) de cada palavra (quanto menor, mais relevante).
+    """
+    V = len(vocab)
+    n_docs = int(doc.max()) + 1
+
+    tf = np.bincount(codigos, minlength=V).astype(float)
+    tf_validos = tf[~eh_stop] if (~eh_stop).any() else tf
+    media_tf, desvio_tf, max_tf = tf_validos.mean(), tf_validos.std(), tf.max()
+
+    # caixa alta: maior entre "Inicial maiuscula" e "SIGLA"
+    iniciais, siglas = contagem_maiusculas(textos)
+    tf_u = iniciais.reindex(vocab, fill_value=0).to_numpy(dtype=float)
+    tf_a = siglas.reindex(vocab, fill_value=0).to_numpy(dtype=float)
+    t_case = np.maximum(tf_u, tf_a) / (1 + np.log(tf))
+
+    # posicao: mediana da frase em que o lema aparece
+    frase = pos // TOKENS_POR_FRASE
+    frase_ordenada = frase[np.lexsort((frase, codigos))]
+    n = tf.astype(np.int64)
+    inicio = np.cumsum(n) - n
+    mediana = (frase_ordenada[inicio + (n - 1) // 2] + frase_ordenada[inicio + n // 2]) / 2
+    t_pos = np.log(np.log(3 + mediana))
+
+    # frequencia normalizada
+    t_fnorm = tf / (media_tf + desvio_tf)
+
+    # relacao com o contexto: quantos vizinhos diferentes a palavra tem a esquerda/direita
+    mesmo_doc = doc[1:] == doc[:-1]
+    esquerda = codigos[:-1][mesmo_doc]
+    direita = codigos[1:][mesmo_doc]
+    pares = np.unique(esquerda * V + direita)
+    total_esq = np.bincount(direita, minlength=V)
+    total_dir = np.bincount(esquerda, minlength=V)
+    wl = np.divide(np.bincount(pares % V, minlength=V), total_esq,
+                   out=np.zeros(V), where=total_esq > 0)
+    wr = np.divide(np.bincount(pares // V, minlength=V), total_dir,
+                   out=np.zeros(V), where=total_dir > 0)
+    t_rel = 1 + (wl + wr) * tf / max_tf
+
+    # espalhamento: em quantos documentos diferentes a palavra aparece
+    df_termo = np.bincount(np.unique(codigos * n_docs + doc) // n_docs, minlength=V)
+    t_sent = df_termo / n_docs
+
+    return t_rel * t_pos / (t_case + t_fnorm / t_rel + t_sent / t_rel)
+
+def keywords_vetorizado(listas, textos, stopwords, top_n=20, ngram_max=3):
+    """Keywords no estilo YAKE (n-gramas até ngram_max) direto da coluna de lemas."""
+    colunas = ["keyword", "score", "tf", "n"]
+    tokens, doc, pos = achatar_lemas(listas)
+    if len(tokens) == 0:
+        return pd.DataFrame(columns=colunas)
+
+    codigos, vocab = pd.factorize(tokens)
+    codigos = codigos.astype(np.int64)
+    vocab_s = pd.Series(vocab)
+
+    # igual ao YAKE: stopword ou palavra muito curta nao pode abrir nem fechar um candidato
+    eh_stop = (vocab_s.isin(stopwords) | (vocab_s.str.len() < 3)).to_numpy()
+    # numeros e simbolos nao viram candidato
+    valido = vocab_s.str.fullmatch(r"[^\W\d]+").fillna(False).to_numpy(dtype=bool)
+
+    s_palavra = pontuar_palavras(codigos, doc, pos, vocab, eh_stop, textos)
+
+    candidatos = []
+    for k in range(1, ngram_max + 1):
+        m = len(codigos) - k + 1
+        if m <= 0:
+            break
+        idx = np.arange(m)
+        janela = np.stack([codigos[idx + j] for j in range(k)], axis=1)
+        janela = janela[doc[idx] == doc[idx + k - 1]]
+
+        ok = ~eh_stop[janela[:, 0]] & ~eh_stop[janela[:, -1]] & valido[janela].all(axis=1)
+        janela = janela[ok]
+        if len(janela) == 0:
+            continue
+
+        unicos, tf_kw = np.unique(janela, axis=0, return_counts=True)
+
+        # S(kw) = prod S(w) / (TF(kw) * (1 + soma S(w))), ignorando stopwords do meio
+        s = s_palavra[unicos]
+        conta = ~eh_stop[unicos]
+        prod = np.where(conta, s, 1.0).prod(axis=1)
+        soma = np.where(conta, s, 0.0).sum(axis=1)
+        score = prod / (tf_kw * (1 + soma))
+
+        melhores = np.argsort(score, kind="stable")[:top_n]
+        candidatos.append(pd.DataFrame({
+            "keyword": [" ".join(vocab[unicos[i]]) for i in melhores],
+            "score": score[melhores],
+            "tf": tf_kw[melhores],
+            "n": k
+        }))
+
+    if not candidatos:
+        return pd.DataFrame(columns=colunas)
+
+    return (pd.concat(candidatos, ignore_index=True)
+              .sort_values("score", kind="stable")
+              .head(top_n)
+              .reset_index(drop=True))
+
+def processar_grupo(tarefa):
+    # roda num processo separado: um grupo (pais, idioma) por vez
+    chave, listas, textos, lan, top_n, ngram_max = tarefa
+    resultado = keywords_vetorizado(listas, textos, carregar_stopwords(lan), top_n, ngram_max)
+    for coluna, valor in chave.items():
+        resultado.insert(0, coluna, valor)
+    return resultado
+
+def ler_tokens(input_file):
+    # aceita um arquivo ou um padrao tipo data/processed/*_tokens.parquet
+    if any(c in input_file for c in "*?["):
+        arquivos = sorted(Path().glob(input_file))
+    else:
+        arquivos = [Path(input_file)] if Path(input_file).exists() else []
+    if not arquivos:
+        return None
+    return pd.concat([pd.read_parquet(a) for a in arquivos], ignore_index=True)
+
 @app.command()
 def main(
     input_file: str = "data/processed/mocambique_tokens.parquet",
     output_file: str = "results/keywords_mocambique.csv",
-    top_n: int = 20
+    top_n: int = 20,
+    motor: str = typer.Option("yake", help="'yake' (corpus inteiro, n=1, colunas keyword/score) ou 'vetorizado' (n-gramas por grupo, com pais/idioma/tf/n)"),
+    ngram_max: int = typer.Option(3, help="Tamanho máximo dos n-gramas no motor vetorizado"),
+    agrupar_por: list[str] = typer.Option(["pais", "idioma"], help="Colunas de grupo no motor vetorizado"),
+    lan: str = typer.Option("pt", help="Idioma das stopwords quando não há coluna 'idioma'"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processos para rodar os grupos em paralelo")
 ):
+    medicao = Medicao("keywords", input_file=input_file, motor=motor, ngram_max=ngram_max, workers=workers)
     print(f"Lendo arquivo: {input_file}")
 
-    path_in = Path(input_file)
-    if not path_in.exists():
+    df = ler_tokens(input_file)
+    if df is None:
         print(f"Erro: arquivo {input_file} não existe.")
         raise typer.Exit(code=1)
 
-    df = pd.read_parquet(path_in)
-
     df["lemas"] = df["lemas"].apply(lambda x: x.tolist() if hasattr(x, "tolist") else x)
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    if motor == "vetorizado":
+        df["lemas"] = df["lemas"].apply(lambda x: x if isinstance(x, list) else [])
+        textos = df["texto"] if "texto" in df.columns else pd.Series([None] * len(df))
 
-    corpus = " ".join([" ".join(lemas) for lemas in df["lemas"] if isinstance(lemas, list)])
+        colunas_grupo = [c for c in agrupar_por if c in df.columns]
+        grupos = df.groupby(colunas_grupo, sort=True).indices if colunas_grupo else {(): np.arange(len(df))}
 
-    print("Tamanho do corpus (tokens):", len(corpus.split()))
+        tarefas = []
+        for valores, posicoes in grupos.items():
+            valores = valores if isinstance(valores, tuple) else (valores,)
+            chave = dict(zip(colunas_grupo, valores))
+            lan_grupo = codigo_idioma(chave["idioma"], lan) if "idioma" in chave else lan
+            tarefas.append((
+                chave,
+                df["lemas"].iloc[posicoes].tolist(),
+                textos.iloc[posicoes].tolist(),
+                lan_grupo,
+                top_n,
+                ngram_max
+            ))
 
-    #Formação principal do YAKE
-    kw_extractor = yake.KeywordExtractor(
-        lan="pt",
-        n=1,
-        top=top_n,
-        dedupLim=0.9,
-        features=None
-    )
+        print(f"Tamanho do corpus (tokens): {int(df['lemas'].map(len).sum())} em {len(tarefas)} grupo(s)")
 
-    keywords = kw_extractor.extract_keywords(corpus)
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tarefas)))) as pool:
+            resultados = list(pool.map(processar_grupo, tarefas))
+
+        # a ordem das colunas de grupo fica a mesma do agrupar_por
+        result_df = pd.concat(resultados, ignore_index=True)
+        result_df = result_df[colunas_grupo + [c for c in result_df.columns if c not in colunas_grupo]]
+
+    elif motor == "yake":
+        corpus = " ".join([" ".join(lemas) for lemas in df["lemas"] if isinstance(lemas, list)])
+
+        print("Tamanho do corpus (tokens):", len(corpus.split()))
+
+        import yake
+
+        #Formação principal do YAKE
+        kw_extractor = yake.KeywordExtractor(
+            lan=lan,
+            n=1,
+            top=top_n,
+            dedupLim=0.9,
+            features=None
+        )
+
+        keywords = kw_extractor.extract_keywords(corpus)
+
+        result_df = pd.DataFrame(keywords, columns=["keyword", "score"])
+
+    else:
+        print(f"Erro: motor '{motor}' desconhecido. Use 'vetorizado' ou 'yake'.")
+        raise typer.Exit(code=1)
 
-    result_df = pd.DataFrame(keywords, columns=["keyword", "score"])
+    medicao.marcar("process")
 
     #Salvar tudo
     path_out = Path(output_file)
     path_out.parent.mkdir(parents=True, exist_ok=True)
 
     result_df.to_csv(path_out, index=False, encoding="utf-8-sig")
+    medicao.marcar("write")
 
     print(f"\n✅ Keywords salvas em: {output_file}")
     print(result_df)
+    medicao.finalizar(n_docs=len(df))
 
 
 if __name__ == "__main__":
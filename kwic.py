@@ -1,8 +1,10 @@
 import pandas as pd
+import numpy as np
 import typer
 from pathlib import Path
 from tqdm import tqdm
 import unicodedata 
+from instrumentacao import Medicao
 
 app = typer.Typer()
 
@@ -46,6 +48,118 @@ def kwic_for_term(df, term, window=5):
     return pd.DataFrame(resultados)
 
 
+## Índice invertido: lema normalizado -> (doc, posição)
+# Arquivos dentro da pasta do índice:
+#   docs.parquet      uma linha por documento (arquivo, linha, texto, pais, idioma, inicio, n_lemas)
+#   lemas.npy         todos os lemas em sequência, como id do lema distinto (aberto com mmap)
+#   lemas_vocab.parquet  texto de cada lema distinto (coluna 'lema'), na ordem dos ids
+#   vocab.parquet     termo normalizado -> (inicio, n) dentro das postings
+#   postings_doc.npy  doc de cada ocorrência, agrupado por termo
+#   postings_pos.npy  posição do lema dentro do doc
+def construir_indice(arquivos, pasta_indice):
+    docs = []
+    todos_lemas = []
+    inicio = 0
+
+    for arquivo in arquivos:
+        df = pd.read_parquet(arquivo)
+        listas = [x.tolist() if hasattr(x, 'tolist') else x for x in df['lemas']]
+        listas = [x if isinstance(x, list) else [] for x in listas]
+        tamanhos = np.array([len(x) for x in listas], dtype=np.int64)
+
+        docs.append(pd.DataFrame({
+            "arquivo": Path(arquivo).name,
+            "linha": df.index,
+            "texto": df["texto"] if "texto" in df.columns else "",
+            "pais": df["pais"] if "pais" in df.columns else "",
+            "idioma": df["idioma"] if "idioma" in df.columns else "",
+            "inicio": inicio + np.cumsum(tamanhos) - tamanhos,
+            "n_lemas": tamanhos
+        }))
+        for lemas in listas:
+            todos_lemas.extend(lemas)
+        inicio += int(tamanhos.sum())
+
+    docs = pd.concat(docs, ignore_index=True)
+    lemas = pd.Series(todos_lemas, dtype=object)
+
+    # normaliza cada lema distinto uma vez só, nao uma vez por ocorrência
+    # (lema faltando vira "", nao o texto "None")
+    codigos, distintos = pd.factorize(lemas.fillna(""), use_na_sentinel=False)
+    termo_por_distinto, termos = pd.factorize(pd.Series([normalize(l) for l in distintos], dtype=object))
+    termo_por_token = termo_por_distinto[codigos] if len(codigos) else np.array([], dtype=np.int64)
+
+    # agrupa as ocorrências por termo mantendo a ordem do corpus (sort estável)
+    ordem = np.argsort(termo_por_token, kind='stable')
+    doc_por_token = np.repeat(np.arange(len(docs), dtype=np.int32), docs['n_lemas'].to_numpy())
+    postings_doc = doc_por_token[ordem]
+    postings_pos = (ordem - docs['inicio'].to_numpy()[postings_doc]).astype(np.int32)
+
+    contagens = np.bincount(termo_por_token, minlength=len(termos))
+    vocab = pd.DataFrame({
+        "termo": termos,
+        "inicio": (np.cumsum(contagens) - contagens).astype(np.int64),
+        "n": contagens
+    })
+
+    pasta = Path(pasta_indice)
+    pasta.mkdir(parents=True, exist_ok=True)
+    docs.to_parquet(pasta / "docs.parquet", index=False)
+    np.save(pasta / "lemas.npy", codigos.astype(np.int32))
+    pd.DataFrame({"lema": pd.Series(distintos, dtype=object)}).to_parquet(pasta / "lemas_vocab.parquet", index=False)
+    vocab.to_parquet(pasta / "vocab.parquet", index=False)
+    np.save(pasta / "postings_doc.npy", postings_doc)
+    np.save(pasta / "postings_pos.npy", postings_pos)
+
+    return len(docs), len(lemas), len(vocab)
+
+
+def carregar_indice(pasta_indice):
+    pasta = Path(pasta_indice)
+    vocab = pd.read_parquet(pasta / "vocab.parquet")
+    docs = pd.read_parquet(pasta / "docs.parquet")
+    return {
+        "vocab": dict(zip(vocab["termo"], zip(vocab["inicio"], vocab["n"]))),
+        "docs": docs,
+        "inicio_doc": docs["inicio"].to_numpy(),
+        "fim_doc": (docs["inicio"] + docs["n_lemas"]).to_numpy(),
+        "lemas": np.load(pasta / "lemas.npy", mmap_mode="r"),
+        "lemas_vocab": pd.read_parquet(pasta / "lemas_vocab.parquet")["lema"].to_numpy(dtype=object),
+        "postings_doc": np.load(pasta / "postings_doc.npy", mmap_mode="r"),
+        "postings_pos": np.load(pasta / "postings_pos.npy", mmap_mode="r"),
+    }
+
+
+#mesmo formato do kwic_for_term, mas lendo as janelas direto das posições do índice
+def kwic_indexado(indice, term, window=5):
+    term_norm = normalize(term)
+    if term_norm not in indice["vocab"]:
+        return pd.DataFrame()
+
+    ini, n = indice["vocab"][term_norm]
+    docs_ids = np.asarray(indice["postings_doc"][ini:ini + n])
+    posicoes = indice["inicio_doc"][docs_ids] + np.asarray(indice["postings_pos"][ini:ini + n])
+    inicios = indice["inicio_doc"][docs_ids]
+    fins = indice["fim_doc"][docs_ids]
+    # só as janelas saem do mmap; o texto vem do vocabulário de lemas distintos
+    lemas, vocab = indice["lemas"], indice["lemas_vocab"]
+    janela = lambda s, e: " ".join(vocab[np.asarray(lemas[s:e])])
+
+    docs = indice["docs"].iloc[docs_ids]
+
+    return pd.DataFrame({
+        "termo": term,
+        "linha": docs["linha"].to_numpy(),
+        "before": [janela(max(s, p - window), p) for s, p in zip(inicios, posicoes)],
+        "keyword": vocab[np.asarray(lemas[posicoes])] if len(posicoes) else [],
+        "after": [janela(p + 1, min(f, p + window + 1)) for f, p in zip(fins, posicoes)],
+        "texto_original": docs["texto"].to_numpy(),
+        "pais": docs["pais"].to_numpy(),
+        "idioma": docs["idioma"].to_numpy(),
+        "arquivo": docs["arquivo"].to_numpy()
+    })
+
+
 def sample_kwic(df, n=10):
     if len(df) <= n:
         return df
@@ -59,20 +173,38 @@ def main(
     input_file: str = "data/processed/inglaterra_tokens.parquet",
     output_file: str = "results/kwic_inglaterra.csv",
     termos: list[str] = typer.Argument(...),
-    window: int = 5
+    window: int = 5,
+    indice: str = typer.Option(None, help="Pasta do índice invertido (kwic_indice.py). Se passar, o input_file é ignorado")
 ):
 
-    print(f"Lendo arquivo: {input_file}")
+    medicao = Medicao("kwic", input_file=input_file, indice=indice, n_termos=len(termos), window=window)
+
+    if indice:
+        print(f"Lendo índice: {indice}")
+        if not (Path(indice) / "vocab.parquet").exists():
+            print(f"Erro: índice {indice} não encontrado. Rode o kwic_indice.py antes.")
+            raise typer.Exit(code=1)
+
+        dados_indice = carregar_indice(indice)
+        n_docs = len(dados_indice["docs"])
+        buscar = lambda termo: kwic_indexado(dados_indice, termo, window=window)
+    else:
+        print(f"Lendo arquivo: {input_file}")
+
+        path_in = Path(input_file)
+        if not path_in.exists():
+            print(f"Erro: arquivo {input_file} não encontrado.")
+            raise typer.Exit(code=1)
 
-    path_in = Path(input_file)
-    if not path_in.exists():
-        print(f"Erro: arquivo {input_file} não encontrado.")
-        raise typer.Exit(code=1)
+        df = pd.read_parquet(path_in)
 
-    df = pd.read_parquet(path_in)
+        # Fazer com que todos os lemas sejam listas, do contrario voltara um documento vazio
+        df['lemas'] = df['lemas'].apply(lambda x: x.tolist() if hasattr(x, 'tolist') else x)
+        medicao.dataframe("entrada", df)
+        n_docs = len(df)
+        buscar = lambda termo: kwic_for_term(df, termo, window=window)
 
-    # Fazer com que todos os lemas sejam listas, do contrario voltara um documento vazio
-    df['lemas'] = df['lemas'].apply(lambda x: x.tolist() if hasattr(x, 'tolist') else x)
+    medicao.marcar("load")
 
     # Lista de termos vem corretamente como lista
     lista_termos = [normalize(t) for t in termos]
@@ -81,19 +213,22 @@ def main(
 
     print("Gerando KWICs...")
     for termo in tqdm(lista_termos):
-        df_kwic = kwic_for_term(df, termo, window=window)
+        df_kwic = buscar(termo)
         df_kwic_sample = sample_kwic(df_kwic, n=10)
         todos_kwics.append(df_kwic_sample)
 
     final_df = pd.concat(todos_kwics, ignore_index=True)
+    medicao.marcar("process")
 
     path_out = Path(output_file)
     path_out.parent.mkdir(parents=True, exist_ok=True)
 
     final_df.to_csv(path_out, index=False, encoding="utf-8-sig")
+    medicao.marcar("write")
 
     print(f"\n✅ KWIC salvo em: {output_file}")
     print(f"Total de linhas: {len(final_df)}")
+    medicao.finalizar(n_docs=n_docs)
 
 
 if __name__ == "__main__":
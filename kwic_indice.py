@@ -0,0 +1,32 @@
+import typer
+from pathlib import Path
+
+from kwic import construir_indice
+
+app = typer.Typer()
+
+#Criação do índice invertido usado pelo kwic.py --indice
+
+@app.command()
+def main(
+    input_glob: str = "data/processed/*_tokens.parquet",
+    output_dir: str = "data/index/kwic"
+):
+
+    arquivos = sorted(Path().glob(input_glob))
+    if not arquivos:
+        print(f"Erro: nenhum arquivo encontrado para {input_glob}")
+        raise typer.Exit(code=1)
+
+    print(f"Indexando {len(arquivos)} arquivo(s):")
+    for arquivo in arquivos:
+        print(f"   - {arquivo}")
+
+    n_docs, n_lemas, n_termos = construir_indice(arquivos, output_dir)
+
+    print(f"\n✅ Índice salvo em: {output_dir}")
+    print(f"Documentos: {n_docs} | Lemas: {n_lemas} | Termos distintos: {n_termos}")
+
+
+if __name__ == "__main__":
+    app()
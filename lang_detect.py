@@ -2,7 +2,12 @@ import pandas as pd
 import langid
 import typer
 from pathlib import Path
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
 import sys
+from instrumentacao import Medicao
 
 app = typer.Typer()
 
@@ -38,15 +43,137 @@ def detect_language(text: str) -> str:
         # se der qualquer problema estranho, marcamos como erro
         return "erro"
 
+def hash_texto(text) -> str:
+    # chave curtinha pra saber se um texto ja foi classificado
+    return hashlib.blake2b(str(text).strip().encode("utf-8"), digest_size=16).hexdigest()
+
+def iniciar_worker():
+    # cada processo do pool tem o seu proprio langid, entao precisa configurar de novo
+    langid.set_languages(supported_languages)
+
+def classificar_lote(textos):
+    return [detect_language(t) for t in textos]
+
+def padronizar_colunas(df):
+    # mesma padronizacao do modo normal: colunas minusculas e 'text' -> 'texto'
+    df.columns = [c.lower() for c in df.columns]
+    if 'texto' not in df.columns and 'text' in df.columns:
+        df = df.rename(columns={'text': 'texto'})
+    return df
+
+class CacheIdiomas:
+    # hash -> idioma com no maximo max_itens na memoria: quando enche,
+    # sai o que foi usado ha mais tempo (LRU), pra memoria nao crescer com o arquivo
+    def __init__(self, max_itens):
+        self.max_itens = max_itens
+        self._dados = OrderedDict()
+
+    def __len__(self):
+        return len(self._dados)
+
+    def get(self, h):
+        idioma = self._dados.get(h)
+        if idioma is not None:
+            self._dados.move_to_end(h)
+        return idioma
+
+    def put(self, h, idioma):
+        self._dados[h] = idioma
+        self._dados.move_to_end(h)
+        if len(self._dados) > self.max_itens:
+            self._dados.popitem(last=False)
+
+def carregar_cache_idiomas(path_cache, max_itens):
+    # hash -> idioma de execucoes anteriores (lido em blocos, fica so o final se passar do limite)
+    cache = CacheIdiomas(max_itens)
+    if path_cache is None or not Path(path_cache).exists():
+        return cache
+    for parte in pd.read_csv(path_cache, dtype=str, chunksize=100000):
+        for h, idioma in zip(parte['hash'], parte['idioma']):
+            cache.put(h, idioma)
+    return cache
+
+def anexar_cache_idiomas(path_cache, novos):
+    # so os textos classificados agora vao pro arquivo (o que ja estava la continua)
+    if path_cache is None or not novos:
+        return
+    path_cache = Path(path_cache)
+    path_cache.parent.mkdir(parents=True, exist_ok=True)
+    primeiro = not path_cache.exists()
+    pd.DataFrame(list(novos.items()), columns=['hash', 'idioma']).to_csv(
+        path_cache, mode='w' if primeiro else 'a', header=primeiro, index=False)
+
+def detectar_em_blocos(path_in, path_out, chunk_size, workers, cache, path_cache=None):
+    # le o csv em pedacos, classifica cada pedaco no pool e vai
+    # escrevendo o resultado no arquivo de saida aos poucos
+    # devolve tambem quantas linhas o cache respondeu sem classificar
+    contagem = Counter()
+    primeiro = True
+    novos_total = 0
+    linhas_cache = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_worker) as pool:
+        for n_bloco, bloco in enumerate(pd.read_csv(path_in, sep=';', chunksize=chunk_size)):
+            bloco = padronizar_colunas(bloco)
+            if 'texto' not in bloco.columns:
+                print(f"Erro: a coluna de conteúdo ('texto' ou 'text') não existe nesse arquivo.")
+                sys.exit(1)
+
+            hashes = bloco['texto'].map(hash_texto)
+
+            # so vai pro pool o que ainda nao foi classificado (nem nesse arquivo nem antes)
+            # idiomas_bloco so guarda os hashes deste bloco, entao fica do tamanho do chunk
+            idiomas_bloco = {}
+            novos = {}
+            for h, texto in zip(hashes, bloco['texto']):
+                if h in idiomas_bloco or h in novos:
+                    continue
+                idioma = cache.get(h)
+                if idioma is None:
+                    novos[h] = texto
+                else:
+                    idiomas_bloco[h] = idioma
+
+            if novos:
+                itens = list(novos.items())
+                tamanho = -(-len(itens) // workers)  # divide em partes iguais pro pool
+                partes = [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+                resultados = pool.map(classificar_lote, [[t for _, t in parte] for parte in partes])
+                classificados = {}
+                for parte, idiomas in zip(partes, resultados):
+                    classificados.update(zip((h for h, _ in parte), idiomas))
+                for h, idioma in classificados.items():
+                    cache.put(h, idioma)
+                idiomas_bloco.update(classificados)
+                anexar_cache_idiomas(path_cache, classificados)
+                novos_total += len(novos)
+
+            linhas_cache += int((~hashes.isin(novos.keys())).sum())
+            bloco['idioma'] = hashes.map(idiomas_bloco)
+            bloco.to_csv(path_out, mode='w' if primeiro else 'a', header=primeiro, index=False)
+            primeiro = False
+
+            contagem.update(bloco['idioma'])
+            print(f"bloco {n_bloco + 1}: {len(bloco)} linhas ({len(novos)} textos novos)")
+
+    return contagem, novos_total, linhas_cache
+
 @app.command()
 def main(
     input_file: str = "brasil.csv",
-    output_file: str = "data/interim/brasil_lang_completo.csv"
+    output_file: str = "data/interim/brasil_lang_completo.csv",
+    streaming: bool = typer.Option(False, "--streaming", help="le o csv em blocos e classifica em paralelo"),
+    chunk_size: int = typer.Option(100000, help="linhas por bloco no modo --streaming"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="processos no modo --streaming"),
+    cache_idiomas: str = typer.Option(None, help="csv hash,idioma pra nao classificar de novo textos ja vistos"),
+    max_cache: int = typer.Option(1_000_000, help="hashes guardados na memoria no modo --streaming (os menos usados saem)")
 ):
+    medicao = Medicao("lang_detect", input_file=input_file, streaming=streaming, chunk_size=chunk_size, workers=workers)
     print(f"Iniciando a leitura do arquivo: {input_file}")
     
     # avisa a biblioteca pra focar so nos nossos idiomas
     langid.set_languages(supported_languages)
+    medicao.marcar("model_load")
 
     # verifica se o arquivo existe mesmo
     path_in = Path(input_file)
@@ -54,6 +181,33 @@ def main(
         print(f"Erro: nao encontrei o arquivo {input_file}")
         sys.exit(1)
 
+    if streaming:
+        path_out = Path(output_file)
+        path_out.parent.mkdir(parents=True, exist_ok=True)
+
+        cache = carregar_cache_idiomas(cache_idiomas, max_cache)
+        print(f"cache de idiomas: {len(cache)} hashes carregados")
+        print(f"Identificando os idiomas em blocos de {chunk_size} linhas ({workers} processos)...")
+
+        medicao.marcar("load")
+
+        try:
+            contagem, novos, linhas_cache = detectar_em_blocos(path_in, path_out, chunk_size, workers, cache, cache_idiomas)
+        except Exception as e:
+            print(f"Erro ao tentar processar o csv: {e}")
+            sys.exit(1)
+
+        # no modo em blocos leitura, classificacao e escrita andam juntas
+        medicao.marcar("process")
+
+        print("\n--- Resultado final ---")
+        print(pd.Series(contagem).sort_values(ascending=False))
+        print(f"textos classificados agora: {novos} | linhas respondidas pelo cache: {linhas_cache}")
+        print(f"\nTudo certo! arquivo salvo em: {output_file}")
+        medicao.marcar("write")
+        medicao.finalizar(n_docs=sum(contagem.values()))
+        return
+
     try:
         # tenta ler o csv usando ponto e virgula como separador
         df = pd.read_csv(path_in, sep=';')
@@ -81,10 +235,14 @@ def main(
         
     # -------------------------------------------------------------
     
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
     print("Identificando os idiomas agora...")
     
     # aplica a nossa funcao linha por linha
     df['idioma'] = df['texto'].apply(detect_language)
+    medicao.marcar("process")
 
     print("\n--- Resultado final ---")
     print(df['idioma'].value_counts())
@@ -95,8 +253,10 @@ def main(
     
     # salva o arquivo novo pronto pra usar
     df.to_csv(path_out, index=False)
+    medicao.marcar("write")
     
     print(f"\nTudo certo! arquivo salvo em: {output_file}")
+    medicao.finalizar(n_docs=len(df))
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
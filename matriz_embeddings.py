@@ -0,0 +1,46 @@
+import numpy as np
+import pyarrow.parquet as pq
+import pandas as pd
+from pathlib import Path
+
+# Matriz de embeddings contígua salva ao lado do parquet (embeddings.parquet -> embeddings.npy).
+# A coluna 'emb_row' do parquet diz qual linha da matriz pertence a cada documento.
+
+DTYPES_MATRIZ = ['float32', 'float16']
+
+def caminho_matriz(path_parquet):
+    return Path(path_parquet).with_suffix('.npy')
+
+def salvar_matriz(embeddings, path_parquet, dtype='float32'):
+    """Salva os embeddings como .npy contíguo (float32 ou float16) e devolve o caminho."""
+    path_npy = caminho_matriz(path_parquet)
+    path_npy.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path_npy, np.ascontiguousarray(embeddings, dtype=dtype))
+    return path_npy
+
+def ler_documentos(path_parquet):
+    """Lê o parquet de embeddings sem a coluna 'embedding' quando existe a matriz .npy ao lado."""
+    if caminho_matriz(path_parquet).exists():
+        colunas = [c for c in pq.read_schema(path_parquet).names if c != 'embedding']
+        return pd.read_parquet(path_parquet, columns=colunas)
+    return pd.read_parquet(path_parquet)
+
+def carregar_matriz(df, path_parquet):
+    """Devolve a matriz de embeddings alinhada com as linhas de df.
+
+    Usa o .npy com mmap_mode='r' (sem cópia) quando ele existe; senão monta a matriz
+    a partir da coluna 'embedding' como antes. Devolve None se não houver nenhum dos dois.
+    """
+    path_npy = caminho_matriz(path_parquet)
+    if path_npy.exists() and 'emb_row' in df.columns:
+        matriz = np.load(path_npy, mmap_mode='r')
+        linhas = df['emb_row'].to_numpy()
+        if len(linhas) == matriz.shape[0] and np.array_equal(linhas, np.arange(len(linhas))):
+            return matriz
+        # df filtrado/reordenado: aqui a cópia é inevitável
+        return matriz[linhas]
+
+    if 'embedding' in df.columns:
+        return np.stack(df['embedding'].values)
+
+    return None
@@ -1,25 +1,28 @@
 import pandas as pd
-import spacy
+import pyarrow as pa
+import pyarrow.parquet as pq
 import typer
+from collections import Counter
 from pathlib import Path
 from tqdm import tqdm
 import sys
+from instrumentacao import Medicao
+from dataset_corpus import colunas_corpus, blocos_corpus
+from idiomas import MODELOS_SPACY, codigo_idioma
 
 app = typer.Typer()
 tqdm.pandas()
 
 # 1. Mapeamento de Idioma para Modelos SpaCy
-modelos = {
-    'pt': 'pt_core_news_sm',
-    'es': 'es_core_news_sm',
-    'en': 'en_core_web_sm'
-}
+# (tabela compartilhada com o tokens.py, em idiomas.py)
+modelos = MODELOS_SPACY
 
 # Tipos de entidades de interesse (PER, ORG, LOCAL)
 ENTITIES_OF_INTEREST = ['PER', 'ORG', 'LOC', 'PERSON', 'GPE']
 
 def carregar_modelos():
     """Carrega os modelos do spaCy, garantindo que o sentencizer esteja ativo para extração de contexto."""
+    import spacy  # import tardio: só quem carrega modelo paga o tempo do spaCy
     cache = {}
     print("carregando modelos para NER...")
     
@@ -44,12 +47,28 @@ def carregar_modelos():
     
     return cache
 
+def normalizar_idioma(serie):
+    """Normaliza a coluna 'idioma' para códigos ISO (Se vier como 'Portugues')."""
+    serie = serie.astype(str).str.lower().str.replace('portugues', 'pt')
+    serie = serie.str.replace('ingles', 'en')
+    serie = serie.str.replace('espanhol', 'es')
+    return serie
+
+def entidades_relevantes(doc):
+    """Spans das entidades de interesse (Pessoa, Organização, Local) de um doc."""
+    return [ent for ent in doc.ents if ent.label_ in ENTITIES_OF_INTEREST]
+
+def entidades_do_doc(doc):
+    """Gera (texto_entidade, tipo_entidade, contexto) para as entidades relevantes de um doc."""
+    for ent in entidades_relevantes(doc):
+        # ent.sent.text funciona por causa do sentencizer
+        yield ent.text, ent.label_, ent.sent.text
+
 def extrair_entidades(texto, idioma, cache):
     """Processa o texto e extrai entidades relevantes."""
     
     # Normaliza a coluna 'idioma' para códigos ISO ('Portugues' -> 'pt')
-    idioma_code = idioma.lower().strip()
-    idioma_code = idioma_code if idioma_code in modelos else 'pt' # Fallback
+    idioma_code = codigo_idioma(idioma, 'pt') # Fallback
     
     if pd.isna(texto) or idioma_code not in cache:
         return []
@@ -57,26 +76,193 @@ def extrair_entidades(texto, idioma, cache):
     nlp = cache[idioma_code]
     doc = nlp(str(texto)[:100000]) # Limita o texto para segurança
 
-    entidades_encontradas = []
-    for ent in doc.ents:
-        # Verifica se o tipo de entidade é relevante (Pessoa, Organização, Local)
-        if ent.label_ in ENTITIES_OF_INTEREST:
-            entidades_encontradas.append({
-                "texto_entidade": ent.text,
-                "tipo_entidade": ent.label_,
-                # ent.sent.text agora funciona!
-                "contexto": ent.sent.text 
-            })
-            
-    return entidades_encontradas
+    return [
+        {"texto_entidade": texto_ent, "tipo_entidade": tipo, "contexto": contexto}
+        for texto_ent, tipo, contexto in entidades_do_doc(doc)
+    ]
+
+class BufferEntidades:
+    """Buffer colunar de entidades, descarregado no CSV de saída a cada `tamanho` linhas.
+
+    Evita montar uma lista de dicts por linha e o explode/apply(pd.Series) no final:
+    a memória fica limitada ao tamanho do buffer, não ao tamanho do corpus.
+    """
+
+    def __init__(self, path_out, colunas, tamanho=50000):
+        self.path_out = Path(path_out)
+        self.colunas = colunas
+        self.tamanho = tamanho
+        self.total = 0
+        self._dados = {c: [] for c in colunas}
+        self._cabecalho_escrito = False
+
+    def adicionar(self, **valores):
+        for c in self.colunas:
+            self._dados[c].append(valores.get(c))
+        if len(self._dados[self.colunas[0]]) >= self.tamanho:
+            self.flush()
+
+    def flush(self):
+        n = len(self._dados[self.colunas[0]])
+        if n == 0 and self._cabecalho_escrito:
+            return
+
+        # O BOM do utf-8-sig só pode ir no começo do arquivo
+        primeiro = not self._cabecalho_escrito
+        pd.DataFrame(self._dados, columns=self.colunas).to_csv(
+            self.path_out,
+            mode='w' if primeiro else 'a',
+            header=primeiro,
+            index=False,
+            encoding='utf-8-sig' if primeiro else 'utf-8'
+        )
+        self._cabecalho_escrito = True
+        self.total += n
+        self._dados = {c: [] for c in self.colunas}
+
+    def fechar(self):
+        self.flush()
+        return self.total
+
+# Esquemas da loja de entidades: rótulos repetidos como dicionário (categóricas no pandas)
+CATEGORICA = pa.dictionary(pa.int32(), pa.string())
+SCHEMA_SENTENCAS = pa.schema([
+    ('doc_id', pa.string()), ('inicio', pa.int32()), ('fim', pa.int32()),
+    ('pais', CATEGORICA), ('idioma', CATEGORICA), ('texto', pa.string()),
+])
+SCHEMA_ENTIDADES = pa.schema([
+    ('doc_id', pa.string()), ('inicio', pa.int32()), ('fim', pa.int32()), ('sent_inicio', pa.int32()),
+    ('pais', CATEGORICA), ('tipo', CATEGORICA), ('entidade_id', pa.int32()),
+])
+
+class LojaEntidades:
+    """Saída normalizada do NER numa pasta de parquets, gravada em blocos.
+
+      sentencas.parquet    (doc_id, inicio, fim) -> texto da frase; cada frase com entidade aparece uma vez
+      entidades.parquet    doc_id, offsets da entidade e da frase (sent_inicio), pais, tipo, entidade_id
+      strings.parquet      entidade_id -> texto da entidade (cada texto distinto guardado uma vez só)
+      frequencias.parquet  menções e documentos por (pais, entidade, tipo), prontos para os painéis
+
+    Os offsets são em caracteres, no texto do documento (já cortado nos 100000 caracteres).
+    """
+
+    def __init__(self, pasta, tamanho=50000):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.tamanho = tamanho
+        self.total = 0
+        self.strings = {}
+        self.mencoes = Counter()
+        self.docs = Counter()
+        self._sentencas = {c: [] for c in SCHEMA_SENTENCAS.names}
+        self._entidades = {c: [] for c in SCHEMA_ENTIDADES.names}
+        self._escritores = {
+            "sentencas": pq.ParquetWriter(self.pasta / "sentencas.parquet", SCHEMA_SENTENCAS, compression='zstd'),
+            "entidades": pq.ParquetWriter(self.pasta / "entidades.parquet", SCHEMA_ENTIDADES, compression='zstd'),
+        }
+
+    def adicionar_doc(self, doc_id, pais, idioma, doc):
+        ents = entidades_relevantes(doc)
+        if not ents:
+            return
+
+        frases = {}
+        chaves_doc = set()
+        for ent in ents:
+            sent = ent.sent
+            frases.setdefault(sent.start_char, sent)
+            entidade_id = self.strings.setdefault(ent.text, len(self.strings))
+
+            for c, v in zip(SCHEMA_ENTIDADES.names, (doc_id, ent.start_char, ent.end_char, sent.start_char, pais, ent.label_, entidade_id)):
+                self._entidades[c].append(v)
+            chave = (pais, entidade_id, ent.label_)
+            self.mencoes[chave] += 1
+            chaves_doc.add(chave)
+
+        for chave in chaves_doc:
+            self.docs[chave] += 1
+        for inicio, sent in frases.items():
+            for c, v in zip(SCHEMA_SENTENCAS.names, (doc_id, inicio, sent.end_char, pais, idioma, sent.text)):
+                self._sentencas[c].append(v)
+
+        if len(self._entidades['doc_id']) >= self.tamanho:
+            self.flush()
+
+    def flush(self):
+        n = len(self._entidades['doc_id'])
+        if n:
+            self._escritores["entidades"].write_table(pa.Table.from_pydict(self._entidades, schema=SCHEMA_ENTIDADES))
+            self._escritores["sentencas"].write_table(pa.Table.from_pydict(self._sentencas, schema=SCHEMA_SENTENCAS))
+        self.total += n
+        self._sentencas = {c: [] for c in SCHEMA_SENTENCAS.names}
+        self._entidades = {c: [] for c in SCHEMA_ENTIDADES.names}
+
+    def fechar(self):
+        self.flush()
+        for escritor in self._escritores.values():
+            escritor.close()
+
+        textos = list(self.strings)
+        pd.DataFrame({"entidade_id": pd.Series(range(len(textos)), dtype='int32'), "texto": textos}) \
+            .to_parquet(self.pasta / "strings.parquet", index=False)
+
+        chaves = list(self.mencoes)
+        freq = pd.DataFrame(chaves, columns=['pais', 'entidade_id', 'tipo'])
+        freq['entidade_id'] = freq['entidade_id'].astype('int32')
+        freq['entidade'] = [textos[i] for i in freq['entidade_id']]
+        freq['n_mencoes'] = [self.mencoes[k] for k in chaves]
+        freq['n_docs'] = [self.docs[k] for k in chaves]
+        freq['pais'] = freq['pais'].astype('category')
+        freq['tipo'] = freq['tipo'].astype('category')
+        freq = freq.sort_values(['pais', 'n_mencoes'], ascending=[True, False], kind='stable')
+        freq.to_parquet(self.pasta / "frequencias.parquet", index=False)
+        return self.total
+
+def ler_loja(pasta):
+    """Lê a loja de entidades com o texto da entidade de volta (para quem precisa da tabela larga)."""
+    pasta = Path(pasta)
+    strings = pd.read_parquet(pasta / "strings.parquet")['texto'].to_numpy(dtype=object)
+    entidades = pd.read_parquet(pasta / "entidades.parquet")
+    entidades['texto_entidade'] = strings[entidades['entidade_id'].to_numpy()]
+    return entidades, pd.read_parquet(pasta / "sentencas.parquet")
+
+def codigos_modelo(idiomas):
+    """Código do modelo de cada idioma, com o fallback 'pt' para idioma desconhecido."""
+    return idiomas.map(lambda i: codigo_idioma(i, 'pt'))
+
+def docs_na_ordem(textos, codigos, meus_modelos, batch_size=256, n_process=1):
+    """Docs de um bloco na ordem das linhas: um nlp.pipe por idioma presente no bloco.
+
+    Textos de idioma sem modelo carregado ficam com None.
+    """
+    posicoes_idioma = {}
+    for pos, lang_code in enumerate(codigos):
+        posicoes_idioma.setdefault(lang_code, []).append(pos)
+
+    docs = [None] * len(textos)
+    for lang_code, posicoes in posicoes_idioma.items():
+        if lang_code not in meus_modelos:
+            continue
+        lote = meus_modelos[lang_code].pipe([textos[p] for p in posicoes], batch_size=batch_size, n_process=n_process)
+        for pos, doc in zip(posicoes, lote):
+            docs[pos] = doc
+    return docs
 
 @app.command()
 def main(
     # Argumento Posicional Obrigatório
     input_file: str = typer.Argument(..., help="Caminho para o arquivo de entrada (ex: data/interim/brasil_lang.csv)"),
     # Opção para Output
-    output_file: str = typer.Option(None, "--output", "-o", help="Caminho para o arquivo CSV de saída (ex: results/ner_brasil.csv)")
+    output_file: str = typer.Option(None, "--output", "-o", help="Caminho para o arquivo CSV de saída (ex: results/ner_brasil.csv)"),
+    batch_size: int = typer.Option(256, help="Textos por lote no nlp.pipe"),
+    n_process: int = typer.Option(1, help="Processos do spaCy por idioma"),
+    chunk_size: int = typer.Option(20000, help="Linhas lidas do CSV por bloco (o arquivo é lido uma vez só)"),
+    flush_size: int = typer.Option(50000, help="Entidades acumuladas antes de gravar no disco"),
+    filtro_pais: list[str] = typer.Option([], "--pais", help="Só esses países (no dataset do ingestao.py lê só essas partições)"),
+    loja: str = typer.Option(None, help="Pasta da loja de entidades (frases sem repetição, strings internadas, frequências por país)"),
+    csv: bool = typer.Option(True, "--csv/--sem-csv", help="Grava também o CSV antigo (uma linha por entidade, com o contexto)")
 ):
+    medicao = Medicao("ner", input_file=input_file, batch_size=batch_size, n_process=n_process, chunk_size=chunk_size)
     print(f"Lendo arquivo: {input_file}")
     
     path_in = Path(input_file)
@@ -85,55 +271,93 @@ def main(
         sys.exit(1)
         
     try:
-        df = pd.read_csv(path_in)
+        # Só o cabeçalho: o arquivo é lido em blocos mais adiante
+        colunas_entrada = colunas_corpus(path_in)
     except Exception as e:
         print(f"deu erro pra ler o csv: {e}")
         sys.exit(1)
 
-    if 'texto' not in df.columns or 'idioma' not in df.columns:
+    if 'texto' not in colunas_entrada or 'idioma' not in colunas_entrada:
         print("erro: ta faltando a coluna 'texto' ou 'idioma'.")
         sys.exit(1)
 
-    # --- CORREÇÃO DE DADOS: Normaliza a coluna 'idioma' (Se vier como 'Portugues') ---
-    df['idioma'] = df['idioma'].astype(str).str.lower().str.replace('portugues', 'pt')
-    df['idioma'] = df['idioma'].str.replace('ingles', 'en')
-    df['idioma'] = df['idioma'].str.replace('espanhol', 'es')
-    # ---------------------------------------------------------------------------------
-
-    meus_modelos = carregar_modelos()
-    
-    print(f"processando {len(df)} linhas para NER...")
-    df['entidades_raw'] = df.progress_apply(
-        lambda linha: extrair_entidades(linha.get('texto'), linha.get('idioma'), meus_modelos), 
-        axis=1
-    )
-    
-    # -------------------------------------------------------------
-    # EXPANDIR O DATAFRAME (Explode)
-    # -------------------------------------------------------------
-    
-    df_entidades = df.explode('entidades_raw')
-    df_entidades = df_entidades.dropna(subset=['entidades_raw'])
-    
-    df_final = pd.concat([df_entidades.drop('entidades_raw', axis=1), 
-                          df_entidades['entidades_raw'].apply(pd.Series)], axis=1)
+    if not csv and not loja:
+        print("erro: com --sem-csv tem que passar a pasta da --loja.")
+        sys.exit(1)
 
     # Determinação do caminho de saída
     if output_file is None:
-        file_name_stem = path_in.stem.replace('_lang', '_ner')
+        file_name_stem = f"{path_in.name}_ner" if path_in.is_dir() else path_in.stem.replace('_lang', '_ner')
         output_file = f"results/{file_name_stem}.csv"
         
     path_out = Path(output_file)
     path_out.parent.mkdir(parents=True, exist_ok=True)
-    
-    cols_finais = [c for c in df_final.columns if c in ['texto_entidade', 'tipo_entidade', 'contexto', 'idioma', 'pais']]
-    df_final[cols_finais].to_csv(path_out, index=False, encoding="utf-8-sig")
+
+    # Mesmas colunas de saída de antes: idioma/pais na ordem do arquivo + colunas da entidade
+    colunas_lidas = [c for c in colunas_entrada if c in ['texto', 'idioma', 'pais']]
+    cols_finais = [c for c in colunas_lidas if c != 'texto'] + ['texto_entidade', 'tipo_entidade', 'contexto']
+    # o id só vai para a loja (chave das frases), o CSV continua igual
+    if 'id' in colunas_entrada:
+        colunas_lidas.append('id')
+
+    medicao.marcar("load")
+
+    meus_modelos = carregar_modelos()
+    medicao.marcar("model_load")
+    buffer = BufferEntidades(path_out, cols_finais, tamanho=flush_size) if csv else None
+    loja_entidades = LojaEntidades(loja, tamanho=flush_size) if loja else None
+
+    # O arquivo é lido uma vez, em blocos; as linhas de cada bloco vão pro nlp.pipe do
+    # seu idioma e as entidades saem na ordem das linhas de entrada
+    total_docs = 0
+    progresso = tqdm(desc="NER", unit=" docs")
+    for bloco in blocos_corpus(path_in, colunas_lidas, chunk_size, paises=filtro_pais or None):
+        bloco = bloco[bloco['texto'].notna()]
+        idiomas = normalizar_idioma(bloco['idioma'])
+        # Mesmo fallback do extrair_entidades: idioma desconhecido vai pro modelo 'pt'
+        codigos = codigos_modelo(bloco['idioma'])
+        textos = [str(t)[:100000] for t in bloco['texto']]
+        docs = docs_na_ordem(textos, codigos, meus_modelos, batch_size=batch_size, n_process=n_process)
+
+        paises_bloco = bloco['pais'] if 'pais' in bloco.columns else [None] * len(bloco)
+        # sem coluna 'id', o doc fica identificado pela linha do CSV
+        ids_bloco = bloco['id'].astype(str) if 'id' in bloco.columns else bloco.index.astype(str)
+        for doc, idioma, pais, doc_id in zip(docs, idiomas, paises_bloco, ids_bloco):
+            progresso.update()
+            if doc is None:
+                continue
+            total_docs += 1
+            if loja_entidades is not None:
+                loja_entidades.adicionar_doc(doc_id, pais, idioma, doc)
+            if buffer is None:
+                continue
+            for texto_ent, tipo, contexto in entidades_do_doc(doc):
+                buffer.adicionar(
+                    idioma=idioma,
+                    pais=pais,
+                    texto_entidade=texto_ent,
+                    tipo_entidade=tipo,
+                    contexto=contexto
+                )
+
+    progresso.close()
+
+    # leitura em blocos e gravação do buffer acontecem junto com o NLP
+    medicao.marcar("process")
+    total_entidades = buffer.fechar() if buffer is not None else 0
+    if loja_entidades is not None:
+        total_entidades = loja_entidades.fechar()
+    medicao.marcar("write")
     
     print("pronto!")
-    print(f"Arquivo de Entidades (NER) salvo em: {output_file}")
-    print(f"Total de entidades extraídas: {len(df_final)}")
+    print(f"Documentos processados: {total_docs}")
+    if buffer is not None:
+        print(f"Arquivo de Entidades (NER) salvo em: {output_file}")
+    if loja_entidades is not None:
+        print(f"Loja de entidades salva em: {loja} ({len(loja_entidades.strings)} entidades distintas)")
+    print(f"Total de entidades extraídas: {total_entidades}")
+    medicao.finalizar(n_docs=total_docs)
 
 
 if __name__ == "__main__":
     app()
-    
\ No newline at end of file
@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+import typer
+from pathlib import Path
+from tqdm import tqdm
+import sys
+from instrumentacao import Medicao
+from dataset_corpus import ler_corpus
+from tokens import codigos_lemas, lematizar_doc
+from ner import modelos as modelos_ner, normalizar_idioma, codigos_modelo, docs_na_ordem, entidades_do_doc, BufferEntidades, LojaEntidades
+
+# Etapa única de NLP: cada documento passa uma vez só pelo spaCy (lematizador + NER +
+# sentencizer) e sai daqui tanto o parquet de lemas do tokens.py quanto a tabela de
+# entidades do ner.py, com as mesmas colunas dos dois. Os dois escolhem o modelo pela
+# mesma tabela (idiomas.py), então o Doc da NER serve também para os lemas.
+
+app = typer.Typer()
+
+def carregar_modelos_presentes(codigos):
+    """Carrega só os modelos dos idiomas que aparecem no arquivo, com lematizador e NER ligados."""
+    import spacy
+    cache = {}
+    print(f"carregando modelos: {', '.join(codigos)}")
+
+    for lang_code in codigos:
+        nome_modelo = modelos_ner[lang_code]
+        try:
+            # sem o parser (igual aos dois scripts), mas com tagger/lematizador e NER juntos
+            nlp = spacy.load(nome_modelo, exclude=['parser'])
+        except OSError:
+            print(f"aviso: Modelo {nome_modelo} não encontrado. Certifique-se de que foi baixado.")
+            sys.exit(1)
+
+        # sem parser, o sentencizer é quem define ent.sent para o contexto
+        if "sentencizer" not in nlp.pipe_names:
+            nlp.add_pipe("sentencizer", before="ner")
+        cache[lang_code] = nlp
+
+    return cache
+
+@app.command()
+def main(
+    input_file: str = "data/interim/brasil_lang.csv",
+    output_file: str = typer.Option("data/processed/brasil_tokens.parquet", help="parquet com os lemas (mesmo formato do tokens.py)"),
+    ner_file: str = typer.Option(None, help="CSV de entidades (padrão results/<arquivo>_ner.csv, igual ao ner.py)"),
+    batch_size: int = typer.Option(256, help="quantos textos o nlp.pipe processa por vez"),
+    n_process: int = typer.Option(1, help="quantos processos o spacy usa por idioma"),
+    flush_size: int = typer.Option(50000, help="entidades acumuladas antes de gravar no disco"),
+    chunk_size: int = typer.Option(20000, help="linhas por bloco (as entidades saem na ordem das linhas, como no ner.py)"),
+    pais: list[str] = typer.Option([], "--pais", help="só esses países (no dataset do ingestao.py lê só essas partições)"),
+    loja: str = typer.Option(None, help="pasta da loja de entidades do ner.py (frases sem repetição, strings internadas, frequências)"),
+    csv: bool = typer.Option(True, "--csv/--sem-csv", help="grava também o CSV de entidades no formato antigo")
+):
+    medicao = Medicao("nlp_unico", input_file=input_file, batch_size=batch_size, n_process=n_process)
+    print(f"lendo arquivo: {input_file}")
+
+    path_in = Path(input_file)
+    if not path_in.exists():
+        print(f"erro: nao encontrei o arquivo {input_file}")
+        sys.exit(1)
+
+    try:
+        df = ler_corpus(path_in, paises=pais or None)
+    except Exception as e:
+        print(f"deu erro pra ler o csv: {e}")
+        sys.exit(1)
+
+    if 'texto' not in df.columns or 'idioma' not in df.columns:
+        print("erro: ta faltando a coluna 'texto' ou 'idioma'. roda o script de detectar idioma antes")
+        sys.exit(1)
+
+    if not csv and not loja:
+        print("erro: com --sem-csv tem que passar a pasta da --loja")
+        sys.exit(1)
+
+    if ner_file is None:
+        ner_file = f"results/{path_in.name}_ner.csv" if path_in.is_dir() else f"results/{path_in.stem.replace('_lang', '_ner')}.csv"
+
+    medicao.dataframe("entrada", df)
+
+    # lemas só para os idiomas que o tokens.py conhece (o resto fica com lista vazia),
+    # entidades para todas as linhas, caindo no modelo 'pt' como no ner.py
+    # quando a linha tem lemas, o modelo é o mesmo da NER (só o fallback 'pt' é da NER)
+    codigos = codigos_modelo(df['idioma'])
+    lematizar = codigos_lemas(df['idioma']).notna().to_numpy()
+    idioma_ner = normalizar_idioma(df['idioma'])
+    paises = df['pais'] if 'pais' in df.columns else pd.Series([None] * len(df), index=df.index)
+    # chave das frases na loja: o id do documento, ou a linha quando não tem id
+    ids_doc = df['id'].astype(str) if 'id' in df.columns else pd.Series(df.index.astype(str), index=df.index)
+
+    # ordem dos modelos do ner.py, pra tabela de entidades sair na mesma ordem
+    presentes = [c for c in modelos_ner if c in set(codigos[df['texto'].notna()])]
+    medicao.marcar("load")
+
+    meus_modelos = carregar_modelos_presentes(presentes)
+    medicao.marcar("model_load")
+
+    # mesmas colunas de saída do ner.py
+    cols_ner = [c for c in df.columns if c in ['idioma', 'pais']] + ['texto_entidade', 'tipo_entidade', 'contexto']
+    buffer = None
+    if csv:
+        path_ner = Path(ner_file)
+        path_ner.parent.mkdir(parents=True, exist_ok=True)
+        buffer = BufferEntidades(path_ner, cols_ner, tamanho=flush_size)
+    loja_entidades = LojaEntidades(loja, tamanho=flush_size) if loja else None
+
+    print(f"processando {len(df)} linhas...")
+    lemas = [[] for _ in range(len(df))]
+    com_texto = np.flatnonzero(df['texto'].notna().to_numpy())
+
+    # blocos de linhas: em cada um, um nlp.pipe por idioma, e os docs voltam na ordem das linhas
+    progresso = tqdm(total=len(com_texto), desc="NLP")
+    for inicio in range(0, len(com_texto), chunk_size):
+        posicoes = com_texto[inicio:inicio + chunk_size]
+        textos = [str(t)[:100000] for t in df['texto'].iloc[posicoes]]
+        docs = docs_na_ordem(textos, codigos.iloc[posicoes], meus_modelos, batch_size=batch_size, n_process=n_process)
+        progresso.update(len(posicoes))
+
+        for pos, doc in zip(posicoes, docs):
+            if lematizar[pos]:
+                lemas[pos] = lematizar_doc(doc)
+            if loja_entidades is not None:
+                loja_entidades.adicionar_doc(ids_doc.iat[pos], paises.iat[pos], idioma_ner.iat[pos], doc)
+            if buffer is None:
+                continue
+            for texto_ent, tipo, contexto in entidades_do_doc(doc):
+                buffer.adicionar(
+                    idioma=idioma_ner.iat[pos],
+                    pais=paises.iat[pos],
+                    texto_entidade=texto_ent,
+                    tipo_entidade=tipo,
+                    contexto=contexto
+                )
+    progresso.close()
+
+    df['lemas'] = lemas
+    medicao.marcar("process")
+
+    # mesmo parquet do tokens.py
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+
+    cols_finais = ['texto', 'idioma', 'lemas']
+    for col in ['id', 'data', 'pais', 'codigo legenda']:
+        achei = [c for c in df.columns if c.lower() == col.lower()]
+        if achei:
+            cols_finais.insert(0, achei[0])
+
+    df[cols_finais].to_parquet(path_out, index=False)
+    total_entidades = buffer.fechar() if buffer is not None else 0
+    if loja_entidades is not None:
+        total_entidades = loja_entidades.fechar()
+    medicao.marcar("write")
+
+    print("pronto!")
+    print(f"lemas salvos em: {output_file}")
+    if buffer is not None:
+        print(f"entidades (NER) salvas em: {ner_file} ({total_entidades} entidades)")
+    if loja_entidades is not None:
+        print(f"loja de entidades salva em: {loja} ({total_entidades} entidades, {len(loja_entidades.strings)} distintas)")
+    medicao.finalizar(n_docs=len(df))
+
+if __name__ == "__main__":
+    app()
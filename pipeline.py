@@ -0,0 +1,301 @@
+import typer
+import ast
+import hashlib
+import json
+import subprocess
+import sys
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+app = typer.Typer()
+
+# Pipeline incremental: cada etapa tem uma impressão digital (fingerprint) feita do
+# código dos scripts, dos parâmetros e do conteúdo dos arquivos de entrada.
+# Só roda de novo a etapa cuja impressão mudou (ou cuja saída sumiu).
+
+ESTADO_PADRAO = "data/.pipeline_estado.json"
+
+def slug(nome):
+    # 'Moçambique.csv' -> 'mocambique'
+    nome = Path(nome).stem.strip().lower().replace(' ', '_')
+    return ''.join(c for c in unicodedata.normalize('NFD', nome) if unicodedata.category(c) != 'Mn')
+
+def scripts_locais(scripts):
+    """Os scripts mais os módulos do repositório que eles importam (recursivo, inclusive
+    os imports dentro de funções), pra impressão mudar quando um helper muda."""
+    vistos = []
+    pendentes = list(scripts)
+    while pendentes:
+        script = pendentes.pop(0)
+        if script in vistos or not Path(script).exists():
+            continue
+        vistos.append(script)
+        for no in ast.walk(ast.parse(Path(script).read_text(encoding="utf-8"))):
+            if isinstance(no, ast.Import):
+                nomes = [a.name for a in no.names]
+            elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+                nomes = [no.module]
+            else:
+                continue
+            for nome in nomes:
+                modulo = str(Path(script).parent / f"{nome.split('.')[0]}.py")
+                if Path(modulo).exists() and modulo not in vistos:
+                    pendentes.append(modulo)
+    return vistos
+
+def montar_etapas(arquivo_bruto, model_name, termos, script_topicos, deduplicar=False, html=False):
+    """Monta o DAG de etapas para um arquivo bruto (lang_detect -> nlp -> embeddings -> análises)."""
+    s = slug(arquivo_bruto)
+    lang = f"data/interim/{s}_lang.csv"
+    lang_dedup = f"data/interim/{s}_lang_dedup.csv"
+    tokens = f"data/processed/{s}_tokens.parquet"
+    emb = f"data/embeddings/{s}_embeddings.parquet"
+    pasta_topicos = f"results/topics/{s}"
+
+    etapas = [
+        {
+            "nome": f"{s}/lang_detect",
+            "codigo": ["lang_detect.py"],
+            "args": ["--input-file", arquivo_bruto, "--output-file", lang],
+            "entradas": [arquivo_bruto],
+            "saidas": [lang],
+            "depende": [],
+        },
+    ]
+
+    # com dedup, a etapa de NLP só vê os documentos canônicos
+    etapa_texto = f"{s}/lang_detect"
+    if deduplicar:
+        etapas.append({
+            "nome": f"{s}/dedup",
+            "codigo": ["dedup.py"],
+            "args": ["deduplicar", lang, "--output", lang_dedup],
+            "entradas": [lang],
+            "saidas": [lang_dedup, lang_dedup.replace(".csv", "_mapa.csv")],
+            "depende": [f"{s}/lang_detect"],
+        })
+        lang, etapa_texto = lang_dedup, f"{s}/dedup"
+
+    etapas += [
+        {
+            # lemas e entidades saem da mesma passada do spaCy
+            "nome": f"{s}/nlp",
+            "codigo": ["nlp_unico.py", "tokens.py", "ner.py"],
+            # entidades na loja normalizada do ner.py (sem o CSV com a frase repetida por entidade)
+            "args": ["--input-file", lang, "--output-file", tokens, "--loja", f"results/ner_{s}", "--sem-csv"],
+            "entradas": [lang],
+            "saidas": [tokens, f"results/ner_{s}/entidades.parquet", f"results/ner_{s}/frequencias.parquet"],
+            "depende": [etapa_texto],
+        },
+        {
+            "nome": f"{s}/embeddings",
+            "codigo": ["embeddings.py", "matriz_embeddings.py"],
+            "args": ["--input-file", tokens, "--output-file", emb, "--model-name", model_name],
+            "entradas": [tokens],
+            "saidas": [emb, str(Path(emb).with_suffix('.npy'))],
+            "depende": [f"{s}/nlp"],
+        },
+        {
+            "nome": f"{s}/topicos",
+            "codigo": [script_topicos, "matriz_embeddings.py", "resultados_topicos.py"],
+            "args": [emb, "--output-dir", pasta_topicos],
+            "entradas": [emb, str(Path(emb).with_suffix('.npy'))],
+            "saidas": [f"{pasta_topicos}/global_bertopic_model", f"{pasta_topicos}/mapa_topicos/topicos.parquet"],
+            "depende": [f"{s}/embeddings"],
+        },
+        {
+            "nome": f"{s}/keywords",
+            "codigo": ["keywords.py"],
+            "args": ["--input-file", tokens, "--output-file", f"results/keywords_{s}.csv"],
+            "entradas": [tokens],
+            "saidas": [f"results/keywords_{s}.csv"],
+            "depende": [f"{s}/nlp"],
+        },
+    ]
+
+    # com dedup, os resultados dos canônicos voltam para todas as cópias pelo mapa
+    if deduplicar:
+        mapa = lang_dedup.replace(".csv", "_mapa.csv")
+        expandir = [
+            (f"{s}/expandir_tokens", tokens, f"data/processed/{s}_tokens_expandido.parquet", f"{s}/nlp"),
+            (f"{s}/expandir_documentos", f"{pasta_topicos}/documentos.parquet",
+             f"{pasta_topicos}/documentos_expandido.parquet", f"{s}/topicos"),
+            (f"{s}/expandir_topicos", f"{pasta_topicos}/topics_dataset",
+             f"{pasta_topicos}/topicos_expandido.parquet", f"{s}/topicos"),
+        ]
+        for nome, resultado, saida, depende in expandir:
+            etapas.append({
+                "nome": nome,
+                "codigo": ["dedup.py"],
+                "args": ["expandir", resultado, mapa, "--output", saida],
+                "entradas": [resultado, mapa],
+                "saidas": [saida],
+                "depende": [depende, f"{s}/dedup"],
+            })
+
+    # os gráficos saem do mapa_topicos/, fora do treino
+    if html:
+        etapas.append({
+            "nome": f"{s}/html",
+            "codigo": ["exportar_html.py", "resultados_topicos.py"],
+            "args": [pasta_topicos],
+            "entradas": [f"{pasta_topicos}/mapa_topicos/topicos.parquet"],
+            "saidas": [f"{pasta_topicos}/global_topics_map.html"],
+            "depende": [f"{s}/topicos"],
+        })
+
+    # KWIC só entra se tiver termos pra buscar
+    if termos:
+        etapas.append({
+            "nome": f"{s}/kwic",
+            "codigo": ["kwic.py"],
+            "args": ["--input-file", tokens, "--output-file", f"results/kwic_{s}.csv", *termos],
+            "entradas": [tokens],
+            "saidas": [f"results/kwic_{s}.csv"],
+            "depende": [f"{s}/nlp"],
+        })
+
+    # o primeiro da lista continua sendo o script que roda; o resto só entra na impressão
+    for etapa in etapas:
+        etapa["codigo"] = scripts_locais(etapa["codigo"])
+    return etapas
+
+def hash_arquivo(path, cache_arquivos):
+    """Hash do conteúdo de um arquivo (ou de uma pasta inteira), reaproveitando o
+    hash salvo quando tamanho e data de modificação não mudaram."""
+    path = Path(path)
+    if not path.exists():
+        return "ausente"
+
+    if path.is_dir():
+        h = hashlib.sha256()
+        for filho in sorted(p for p in path.rglob('*') if p.is_file()):
+            h.update(str(filho.relative_to(path)).encode())
+            h.update(hash_arquivo(filho, cache_arquivos).encode())
+        return h.hexdigest()
+
+    info = path.stat()
+    chave = str(path)
+    assinatura = [info.st_size, info.st_mtime_ns]
+    salvo = cache_arquivos.get(chave)
+    if salvo and salvo[:2] == assinatura:
+        return salvo[2]
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    cache_arquivos[chave] = assinatura + [h.hexdigest()]
+    return h.hexdigest()
+
+def fingerprint(etapa, cache_arquivos):
+    h = hashlib.sha256()
+    for script in etapa["codigo"]:
+        h.update(f"codigo:{script}:{hash_arquivo(script, cache_arquivos)}".encode())
+    h.update(("args:" + json.dumps(etapa["args"])).encode())
+    for entrada in etapa["entradas"]:
+        h.update(f"entrada:{entrada}:{hash_arquivo(entrada, cache_arquivos)}".encode())
+    return h.hexdigest()
+
+def niveis(etapas):
+    """Agrupa as etapas em níveis: tudo dentro de um nível pode rodar em paralelo."""
+    feitas = set()
+    restantes = list(etapas)
+    resultado = []
+    while restantes:
+        nivel = [e for e in restantes if all(d in feitas for d in e["depende"])]
+        if not nivel:
+            raise ValueError(f"dependência circular ou inexistente: {[e['nome'] for e in restantes]}")
+        resultado.append(nivel)
+        feitas.update(e["nome"] for e in nivel)
+        restantes = [e for e in restantes if e["nome"] not in feitas]
+    return resultado
+
+def rodar_etapa(etapa):
+    comando = [sys.executable, etapa["codigo"][0], *etapa["args"]]
+    print(f"   [>] {etapa['nome']}: {' '.join(comando[1:])}")
+    processo = subprocess.run(comando, capture_output=True, text=True)
+    if processo.returncode != 0:
+        print(f"   [!] {etapa['nome']} falhou (código {processo.returncode}):\n{processo.stdout[-2000:]}{processo.stderr[-2000:]}")
+    else:
+        print(f"   [ok] {etapa['nome']}")
+    return processo.returncode == 0
+
+@app.command()
+def main(
+    arquivos: list[str] = typer.Argument(None, help="CSVs brutos de entrada (padrão: corpus.csv)"),
+    model_name: str = "paraphrase-multilingual-MiniLM-L12-v2",
+    termos: list[str] = typer.Option([], "--termo", help="Termos do KWIC (pode repetir)"),
+    script_topicos: str = typer.Option("bertopicc.py", help="Script de tópicos (bertopicc.py ou BERTopic.py)"),
+    deduplicar: bool = typer.Option(False, "--dedup", help="Roda o dedup.py antes da etapa de NLP (dentro de cada arquivo; cópias entre arquivos diferentes continuam)"),
+    html: bool = typer.Option(False, "--html", help="Gera os gráficos HTML dos tópicos (exportar_html.py)"),
+    workers: int = typer.Option(2, help="Etapas independentes rodando ao mesmo tempo"),
+    estado_file: str = typer.Option(ESTADO_PADRAO, help="Arquivo com as impressões da última execução"),
+    forcar: bool = typer.Option(False, "--forcar", help="Roda tudo de novo, ignorando o estado salvo"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Só mostra o que seria executado"),
+):
+    arquivos = arquivos or ["corpus.csv"]
+    for arquivo in arquivos:
+        if not Path(arquivo).exists():
+            print(f"ERRO: Arquivo não encontrado: {arquivo}")
+            sys.exit(1)
+
+    if deduplicar and len(arquivos) > 1:
+        print("aviso: o --dedup roda em cada arquivo separado; documentos repetidos entre "
+              f"{', '.join(arquivos)} continuam passando pelo NLP, embeddings e tópicos de cada um")
+
+    path_estado = Path(estado_file)
+    estado = json.loads(path_estado.read_text()) if path_estado.exists() else {}
+    impressoes = estado.get("etapas", {})
+    cache_arquivos = estado.get("arquivos", {})
+
+    etapas = []
+    for arquivo in arquivos:
+        etapas.extend(montar_etapas(arquivo, model_name, termos, script_topicos, deduplicar, html))
+
+    falharam = set()
+    executadas = 0
+
+    for nivel in niveis(etapas):
+        pendentes = []
+        for etapa in nivel:
+            if any(d in falharam for d in etapa["depende"]):
+                print(f"   [-] {etapa['nome']}: pulada (dependência falhou)")
+                falharam.add(etapa["nome"])
+                continue
+
+            # calculado só agora: as entradas podem ter sido geradas no nível anterior
+            etapa["fingerprint"] = fingerprint(etapa, cache_arquivos)
+            saidas_ok = all(Path(s).exists() for s in etapa["saidas"])
+            if not forcar and saidas_ok and impressoes.get(etapa["nome"]) == etapa["fingerprint"]:
+                print(f"   [=] {etapa['nome']}: sem mudanças")
+                continue
+            pendentes.append(etapa)
+
+        if dry_run:
+            for etapa in pendentes:
+                print(f"   [>] {etapa['nome']}: seria executada")
+            continue
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            resultados = list(executor.map(rodar_etapa, pendentes))
+
+        for etapa, ok in zip(pendentes, resultados):
+            if ok:
+                impressoes[etapa["nome"]] = etapa["fingerprint"]
+                executadas += 1
+            else:
+                falharam.add(etapa["nome"])
+                impressoes.pop(etapa["nome"], None)
+
+        # salva o estado a cada nível pra não perder o progresso se algo quebrar
+        path_estado.parent.mkdir(parents=True, exist_ok=True)
+        path_estado.write_text(json.dumps({"etapas": impressoes, "arquivos": cache_arquivos}, indent=2))
+
+    print(f"\nEtapas executadas: {executadas} | falharam: {len(falharam)}")
+    if falharam:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    app()
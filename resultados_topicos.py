@@ -0,0 +1,136 @@
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Colunas do resultado enxuto de tópicos (uma linha por documento)
+COLUNAS_TOPICOS = ['id', 'pais', 'topic_id', 'topic_prob']
+
+def garantir_coluna_pais(df: pd.DataFrame) -> bool:
+    """Cria 'pais' a partir do prefixo do 'id' (Ex: 'Brasil_0001' -> 'Brasil') quando a coluna não existe.
+
+    Devolve False quando não há nem 'pais' nem 'id'.
+    """
+    if 'pais' in df.columns:
+        return True
+    if 'id' not in df.columns:
+        return False
+    df['pais'] = df['id'].astype(str).apply(lambda x: x.split('_')[0] if '_' in x else 'Desconhecido')
+    return True
+
+def tabela_topicos(df: pd.DataFrame) -> pd.DataFrame:
+    """Monta a tabela enxuta e tipada (id, pais, topic_id, topic_prob) a partir do DataFrame treinado."""
+    ids = df['id'] if 'id' in df.columns else df.index.to_series()
+    return pd.DataFrame({
+        'id': ids.astype(str).to_numpy(),
+        'pais': df['pais'].astype(str).astype('category').to_numpy(),
+        'topic_id': pd.to_numeric(df['topic_id']).astype('int32').to_numpy(),
+        'topic_prob': pd.to_numeric(df['topic_prob'], errors='coerce').astype('float32').to_numpy(),
+    })
+
+def save_topic_results(df: pd.DataFrame, output_dir: Path, exportar_csv: bool = False):
+    """Salva os resultados de tópicos sem duplicar texto nem embedding.
+
+    - topics_dataset/pais=<pais>/: parquet particionado com id, pais, topic_id, topic_prob
+    - documentos.parquet: id, texto e lemas, gravados uma única vez
+    - topics_<pais>.csv: só com exportar_csv, com as mesmas colunas enxutas
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    topicos = tabela_topicos(df)
+
+    # Reescreve o dataset inteiro para não misturar partições de execuções antigas
+    path_dataset = output_dir / "topics_dataset"
+    if path_dataset.exists():
+        shutil.rmtree(path_dataset)
+    topicos.to_parquet(path_dataset, partition_cols=['pais'], index=False)
+    print(f"   -> Dados salvos: {path_dataset.name}/ ({topicos['pais'].nunique()} países)")
+
+    cols_docs = [c for c in ['texto', 'idioma', 'lemas'] if c in df.columns]
+    documentos = pd.concat([topicos[['id']], df[cols_docs].reset_index(drop=True)], axis=1)
+    documentos.to_parquet(output_dir / "documentos.parquet", index=False)
+    print(f"   -> Textos salvos: documentos.parquet")
+
+    if exportar_csv:
+        for pais, df_pais in topicos.groupby('pais', observed=True):
+            pais_slug = str(pais).lower().replace(' ', '_')
+            fname_csv = f"topics_{pais_slug}.csv"
+            df_pais.to_csv(output_dir / fname_csv, index=False, encoding='utf-8-sig')
+            print(f"   -> CSV: {fname_csv}")
+
+# --- Mapa de tópicos: layout 2-D e palavras calculados uma vez, renderizados depois pelo exportar_html.py ---
+
+PASTA_MAPA = "mapa_topicos"
+PALAVRAS_POR_TOPICO = 10
+
+def layout_2d(vetores: np.ndarray) -> np.ndarray:
+    """Projeta os vetores dos tópicos em 2-D (PCA dos vetores normalizados)."""
+    X = np.asarray(vetores, dtype=np.float64)
+    X = X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+    X = X - X.mean(axis=0)
+    if len(X) < 2:
+        return np.zeros((len(X), 2))
+    _, _, vt = np.linalg.svd(X, full_matrices=False)
+    coords = X @ vt[:2].T
+    if coords.shape[1] < 2:
+        coords = np.hstack([coords, np.zeros((len(coords), 2 - coords.shape[1]))])
+    return coords
+
+def salvar_mapa_topicos(model, df: pd.DataFrame, output_dir: Path):
+    """Grava o artefato do mapa de tópicos em <output_dir>/mapa_topicos/.
+
+    - topicos.parquet: topic_id, nome, tamanho, x, y, palavras (top palavras juntas)
+    - palavras.parquet: topic_id, rank, palavra, score
+    - paises.parquet: pais, topic_id, n_docs
+    """
+    pasta = Path(output_dir) / PASTA_MAPA
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    info = model.get_topic_info()
+    ids = sorted(model.get_topics())
+    vetores = getattr(model, "topic_embeddings_", None)
+
+    # o -1 (outliers) não entra no mapa
+    reais = [t for t in ids if t != -1]
+    coords = np.zeros((len(reais), 2))
+    if vetores is not None and len(reais):
+        coords = layout_2d(np.asarray(vetores)[[ids.index(t) for t in reais]])
+
+    nomes = dict(zip(info['Topic'], info['Name']))
+    tamanhos = dict(zip(info['Topic'], info['Count']))
+    palavras = {t: (model.get_topic(t) or [])[:PALAVRAS_POR_TOPICO] for t in reais}
+
+    pd.DataFrame({
+        'topic_id': np.asarray(reais, dtype='int32'),
+        'nome': [str(nomes.get(t, t)) for t in reais],
+        'tamanho': np.asarray([tamanhos.get(t, 0) for t in reais], dtype='int32'),
+        'x': coords[:, 0].astype('float32'),
+        'y': coords[:, 1].astype('float32'),
+        'palavras': [", ".join(p for p, _ in palavras[t]) for t in reais],
+    }).to_parquet(pasta / "topicos.parquet", index=False)
+
+    pd.DataFrame(
+        [(t, i + 1, p, float(s)) for t in reais for i, (p, s) in enumerate(palavras[t])],
+        columns=['topic_id', 'rank', 'palavra', 'score'],
+    ).astype({'topic_id': 'int32', 'rank': 'int8', 'score': 'float32'}).to_parquet(pasta / "palavras.parquet", index=False)
+
+    contagem = (
+        tabela_topicos(df).query('topic_id != -1')
+        .groupby(['pais', 'topic_id'], observed=True).size()
+        .rename('n_docs').reset_index()
+    )
+    contagem['n_docs'] = contagem['n_docs'].astype('int32')
+    contagem.to_parquet(pasta / "paises.parquet", index=False)
+
+    print(f"   -> Mapa de tópicos: {PASTA_MAPA}/ ({len(reais)} tópicos, {contagem['pais'].nunique()} países)")
+    return pasta
+
+def ler_mapa_topicos(output_dir: Path):
+    """Lê o artefato gravado por salvar_mapa_topicos: (topicos, palavras, paises)."""
+    pasta = Path(output_dir) / PASTA_MAPA
+    return (
+        pd.read_parquet(pasta / "topicos.parquet"),
+        pd.read_parquet(pasta / "palavras.parquet"),
+        pd.read_parquet(pasta / "paises.parquet"),
+    )
@@ -1,51 +1,60 @@
 import pandas as pd
-import spacy
 import typer
 from pathlib import Path
 from tqdm import tqdm
 import sys
+from instrumentacao import Medicao
+from dataset_corpus import ler_corpus
+from idiomas import MODELOS_SPACY, codigo_idioma
 
 app = typer.Typer()
 
-# dicionario pra mapear o nome do idioma que ta no csv pro modelo do spacy
-# tem que bater certinho com o que saiu do script anterior
-modelos = {
-    'Portugues': 'pt_core_news_sm',
-    'Espanhol': 'es_core_news_sm',
-    'Inglês': 'en_core_web_sm',
-    # coloquei essas variações só pra garantir se vier diferente
-    'Ingles': 'en_core_web_sm',
-    'pt': 'pt_core_news_sm',
-    'es': 'es_core_news_sm',
-    'en': 'en_core_web_sm'
-}
+# codigo do idioma -> modelo do spacy
+# o nome que ta no csv ('Portugues', 'Inglês', 'en'...) vira codigo pela tabela do idiomas.py,
+# a mesma do ner.py; idioma fora da tabela fica sem lemas
+modelos = MODELOS_SPACY
+
+def codigos_lemas(idiomas):
+    # codigo do modelo de cada linha (None = idioma sem modelo, fica sem lemas)
+    return idiomas.map(lambda i: codigo_idioma(i, None))
 
 def carregar_modelos():
     # carrega os modelos do spacy pra memoria
     # tirei o parser e ner pra ficar mais rapido
+    # o import fica aqui pra nao pesar o --help nem quem so usa lematizar_doc
+    import spacy
     cache = {}
     print("carregando modelos...")
     
-    for idioma, nome_modelo in modelos.items():
-        # verifica se ja carregou pra nao carregar duas vezes a mesma coisa
-        if nome_modelo not in cache.values():
-            try:
-                nlp = spacy.load(nome_modelo, disable=['parser', 'ner'])
-                cache[idioma] = nlp
-            except OSError:
-                print(f"aviso: nao achei o modelo {nome_modelo}. tem que baixar antes")
+    for lang_code, nome_modelo in modelos.items():
+        try:
+            nlp = spacy.load(nome_modelo, disable=['parser', 'ner'])
+            cache[lang_code] = nlp
+        except OSError:
+            print(f"aviso: nao achei o modelo {nome_modelo}. tem que baixar antes")
     
     return cache
 
+def lematizar_doc(doc):
+    # aqui acontece a limpeza
+    # pega o lema , joga pra minusculo
+    # e tira pontuacao e espacos vazios
+    return [
+        token.lemma_.lower() 
+        for token in doc 
+        if not token.is_punct and not token.is_space
+    ]
+
 def pegar_lemas(texto, idioma, cache):
     # funcao que roda linha por linha pra limpar o texto
     
     # se nao tiver texto ou nao tiver modelo pro idioma, retorna vazio
-    if pd.isna(texto) or idioma not in cache:
+    lang_code = codigo_idioma(idioma, None)
+    if pd.isna(texto) or lang_code not in cache:
         return []
     
     # pega o nlp certo pro idioma
-    nlp = cache[idioma]
+    nlp = cache[lang_code]
     
     # corta o texto se for gigante pra nao travar tudo
     texto_seguro = str(texto)[:100000]
@@ -53,22 +62,47 @@ def pegar_lemas(texto, idioma, cache):
     # processa o texto
     doc = nlp(texto_seguro)
     
-    # aqui acontece a limpeza
-    # pega o lema , joga pra minusculo
-    # e tira pontuacao e espacos vazios
-    lista_limpa = [
-        token.lemma_.lower() 
-        for token in doc 
-        if not token.is_punct and not token.is_space
-    ]
-    
-    return lista_limpa
+    return lematizar_doc(doc)
+
+def pegar_lemas_em_lote(df, cache, batch_size=256, n_process=1):
+    # versao em lote do pegar_lemas: junta as linhas por idioma e manda
+    # tudo pro nlp.pipe de uma vez, em vez de chamar o nlp linha por linha
+    # devolve uma lista de lemas na mesma ordem das linhas do df
+    lemas = [[] for _ in range(len(df))]
+
+    # .indices da as posicoes (nao o index) de cada grupo
+    codigos = codigos_lemas(df['idioma'])
+    grupos = codigos.groupby(codigos.to_numpy(), sort=False).indices
+
+    for idioma, posicoes in grupos.items():
+        if idioma not in cache:
+            continue
+
+        # mesma regra do pegar_lemas: texto vazio fica com lista vazia
+        textos = df['texto'].iloc[posicoes]
+        validos = textos.notna().to_numpy()
+        posicoes = posicoes[validos]
+        textos = [str(t)[:100000] for t in textos[validos]]
+
+        docs = cache[idioma].pipe(textos, batch_size=batch_size, n_process=n_process)
+
+        # o pipe devolve os docs na mesma ordem que entrou, entao da pra
+        # casar com as posicoes originais
+        for pos, doc in zip(posicoes, tqdm(docs, total=len(textos), desc=f"processando {idioma}")):
+            lemas[pos] = lematizar_doc(doc)
+
+    return lemas
 
 @app.command()
 def main(
     input_file: str = "data/interim/brasil_lang.csv",
-    output_file: str = "data/processed/brasil_tokens.parquet"
+    output_file: str = "data/processed/brasil_tokens.parquet",
+    lote: bool = typer.Option(True, help="agrupa por idioma e usa nlp.pipe (--no-lote roda linha por linha)"),
+    batch_size: int = typer.Option(256, help="quantos textos o nlp.pipe processa por vez"),
+    n_process: int = typer.Option(1, help="quantos processos o spacy usa no modo em lote"),
+    pais: list[str] = typer.Option([], "--pais", help="só esses países (no dataset do ingestao.py lê só essas partições)")
 ):
+    medicao = Medicao("tokens", input_file=input_file, lote=lote, batch_size=batch_size, n_process=n_process)
     print(f"lendo arquivo: {input_file}")
     
     path_in = Path(input_file)
@@ -77,7 +111,8 @@ def main(
         sys.exit(1)
         
     try:
-        df = pd.read_csv(path_in)
+        # aceita o csv do lang_detect ou a pasta do dataset particionado (ingestao.py)
+        df = ler_corpus(path_in, paises=pais or None)
     except Exception as e:
         print(f"deu erro pra ler o csv: {e}")
         sys.exit(1)
@@ -87,19 +122,29 @@ def main(
         print("erro: ta faltando a coluna 'idioma'. roda o script de detectar idioma antes")
         sys.exit(1)
 
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
     # carrega os modelos antes de comecar o loop
     meus_modelos = carregar_modelos()
-    
-    # barra de progresso pra acompanhar
-    tqdm.pandas(desc="processando")
+    medicao.marcar("model_load")
     
     print(f"processando {len(df)} linhas...")
     
-    # aplica a funcao em cada linha do dataframe
-    df['lemas'] = df.progress_apply(
-        lambda linha: pegar_lemas(linha.get('texto'), linha.get('idioma'), meus_modelos), 
-        axis=1
-    )
+    if lote:
+        # manda cada idioma inteiro pro nlp.pipe
+        df['lemas'] = pegar_lemas_em_lote(df, meus_modelos, batch_size=batch_size, n_process=n_process)
+    else:
+        # barra de progresso pra acompanhar
+        tqdm.pandas(desc="processando")
+        
+        # aplica a funcao em cada linha do dataframe
+        df['lemas'] = df.progress_apply(
+            lambda linha: pegar_lemas(linha.get('texto'), linha.get('idioma'), meus_modelos), 
+            axis=1
+        )
+    
+    medicao.marcar("process")
     
     # cria a pasta se nao existir
     path_out = Path(output_file)
@@ -118,9 +163,11 @@ def main(
             
     # salva em parquet que é melhor pra listas
     df[cols_finais].to_parquet(path_out, index=False)
+    medicao.marcar("write")
     
     print("pronto!")
     print(f"arquivo salvo em: {output_file}")
+    medicao.finalizar(n_docs=len(df))
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
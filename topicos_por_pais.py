@@ -0,0 +1,226 @@
+import pandas as pd
+import numpy as np
+import typer
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from matriz_embeddings import ler_documentos, caminho_matriz, salvar_matriz
+from resultados_topicos import garantir_coluna_pais
+from bertopicc import HDB_MIN_CLUSTER_SIZE, UMAP_N_NEIGHBORS
+from instrumentacao import Medicao
+
+# Um modelo BERTopic por país, treinados em paralelo (um processo por país) junto com o
+# modelo global. Todos os processos leem a mesma matriz .npy com mmap, cada um só as
+# suas linhas. No fim, cada tópico local é ligado ao tópico global de centróide mais
+# parecido (similaridade de cosseno entre os topic_embeddings_).
+
+app = typer.Typer()
+
+GLOBAL = "__global__"
+MODELO_GLOBAL_POR_PAIS = "global_bertopic_model_por_pais"
+
+def slug_pais(pais):
+    return str(pais).lower().replace(' ', '_')
+
+def treinar_particao(nome, linhas, textos, path_npy, path_modelo, min_topic_size):
+    """Roda dentro do pool: treina o BERTopic de uma partição e salva o modelo.
+
+    Devolve só o que é pequeno (tópicos por documento, probabilidades e centróides),
+    pra não mandar o modelo inteiro de volta pelo pickle.
+    """
+    from bertopic import BERTopic
+    from umap import UMAP
+
+    # só as linhas desta partição saem do mmap (a matriz inteira fica no page cache)
+    embeddings = np.asarray(np.load(path_npy, mmap_mode='r')[linhas], dtype=np.float32)
+
+    # mesma configuração do bertopicc.py; n_neighbors não pode passar do número de documentos
+    umap_model = UMAP(
+        n_neighbors=min(UMAP_N_NEIGHBORS, len(linhas) - 1),
+        n_components=5,
+        min_dist=0.0,
+        metric='cosine',
+        random_state=42
+    )
+    model = BERTopic(min_topic_size=min_topic_size, umap_model=umap_model, verbose=False)
+    topics, probs = model.fit_transform(textos, embeddings=embeddings)
+
+    Path(path_modelo).parent.mkdir(parents=True, exist_ok=True)
+    model.save(str(path_modelo))
+
+    return {
+        "nome": nome,
+        "topics": np.asarray(topics, dtype=np.int32),
+        "probs": np.asarray(probs, dtype=np.float32) if probs is not None and np.ndim(probs) == 1 else None,
+        "centroides": centroides(model),
+        "palavras": {t: ", ".join(p for p, _ in model.get_topic(t)[:5]) for t in model.get_topics() if t != -1},
+    }
+
+def centroides(model):
+    """{topic_id: vetor} a partir dos topic_embeddings_ (o -1 fica de fora)."""
+    ids = sorted(model.get_topics())
+    return {
+        int(t): np.asarray(model.topic_embeddings_[i], dtype=np.float32)
+        for i, t in enumerate(ids) if t != -1
+    }
+
+def alinhar(locais, globais, limiar):
+    """Liga cada tópico local ao global de maior cosseno; abaixo do limiar vira -1."""
+    if not locais or not globais:
+        return {t: (-1, float('nan')) for t in locais}
+
+    ids_g = list(globais)
+    G = np.stack([globais[t] for t in ids_g])
+    G /= np.maximum(np.linalg.norm(G, axis=1, keepdims=True), 1e-12)
+
+    ids_l = list(locais)
+    L = np.stack([locais[t] for t in ids_l])
+    L /= np.maximum(np.linalg.norm(L, axis=1, keepdims=True), 1e-12)
+
+    sim = L @ G.T
+    melhor = sim.argmax(axis=1)
+    return {
+        t: (ids_g[j] if sim[i, j] >= limiar else -1, float(sim[i, j]))
+        for i, (t, j) in enumerate(zip(ids_l, melhor))
+    }
+
+@app.command()
+def main(
+    input_file: str = typer.Argument("data/embeddings/embeddings.parquet", help="Parquet de embeddings (saída do embeddings.py)"),
+    output_dir: str = typer.Option("results/topics/", "--output-dir", "-o", help="Pasta de saída"),
+    modelo_global: str = typer.Option(None, help=f"Modelo global já treinado (se não passar, é treinado junto com os países e salvo em {MODELO_GLOBAL_POR_PAIS})"),
+    min_topic_size: int = typer.Option(HDB_MIN_CLUSTER_SIZE, help="min_topic_size dos modelos"),
+    min_docs: int = typer.Option(100, help="Países com menos documentos que isso não ganham modelo próprio"),
+    limiar: float = typer.Option(0.5, help="Similaridade mínima para ligar um tópico local a um global"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processos (cada um treina um modelo)"),
+):
+    medicao = Medicao("topicos_por_pais", input_file=input_file, min_topic_size=min_topic_size, workers=workers)
+    print("--- Modelos de tópicos por país (em paralelo) ---")
+
+    path_in = Path(input_file)
+    if not path_in.exists():
+        print(f"ERRO: Arquivo não encontrado: {input_file}")
+        sys.exit(1)
+
+    df = ler_documentos(path_in)
+    if 'texto' not in df.columns or not garantir_coluna_pais(df):
+        print(f"ERRO: Faltam colunas obrigatórias ('texto' e 'pais' ou 'id'). Encontrado: {list(df.columns)}")
+        sys.exit(1)
+
+    output_dir_path = Path(output_dir)
+    output_dir_path.mkdir(parents=True, exist_ok=True)
+
+    # os processos precisam de um .npy pra abrir com mmap; sem ele, grava um a partir da coluna
+    path_npy = caminho_matriz(path_in)
+    if path_npy.exists() and 'emb_row' in df.columns:
+        linhas_emb = df['emb_row'].to_numpy()
+    elif 'embedding' in df.columns:
+        path_npy = salvar_matriz(np.stack(df['embedding'].values), output_dir_path / "embeddings_compartilhados.parquet")
+        linhas_emb = np.arange(len(df))
+        df = df.drop(columns=['embedding'])
+    else:
+        print("ERRO: Embeddings não encontrados (nem coluna 'embedding' nem matriz .npy).")
+        sys.exit(1)
+
+    textos = df['texto'].astype(str).tolist()
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    # partições: posições (no df) de cada país com documentos suficientes
+    particoes = {}
+    for pais, posicoes in df.groupby('pais', sort=True).indices.items():
+        if len(posicoes) < min_docs:
+            print(f"   [i] {pais}: só {len(posicoes)} documentos, fica só com o modelo global")
+            continue
+        particoes[pais] = posicoes
+
+    tarefas = {
+        pais: (pais, linhas_emb[pos], [textos[i] for i in pos], str(path_npy),
+               output_dir_path / "paises" / slug_pais(pais) / "bertopic_model", min_topic_size)
+        for pais, pos in particoes.items()
+    }
+    if modelo_global is None:
+        # o global entra no mesmo pool, junto com os países. Nome próprio: o global_bertopic_model
+        # da mesma pasta é o modelo KMeans que o atualizar_topicos/classificar_topicos usam
+        tarefas[GLOBAL] = (GLOBAL, linhas_emb, textos, str(path_npy),
+                           output_dir_path / MODELO_GLOBAL_POR_PAIS, min_topic_size)
+
+    print(f"Treinando {len(tarefas)} modelos em {workers} processos...")
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {pool.submit(treinar_particao, *args): nome for nome, args in tarefas.items()}
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                print(f"   [!] Erro ao treinar {nome}: {e}")
+                continue
+            n = len(resultados[nome]["centroides"])
+            print(f"   -> {'global' if nome == GLOBAL else nome}: {n} tópicos")
+
+    if modelo_global is not None:
+        from bertopic import BERTopic
+        print(f"Carregando modelo global: {modelo_global}")
+        model = BERTopic.load(modelo_global)
+        resultados[GLOBAL] = {
+            "centroides": centroides(model),
+            "palavras": {t: ", ".join(p for p, _ in model.get_topic(t)[:5]) for t in model.get_topics() if t != -1},
+        }
+
+    if GLOBAL not in resultados:
+        print("ERRO: Sem modelo global, não dá pra alinhar os tópicos.")
+        sys.exit(1)
+    medicao.marcar("process")
+
+    # alinhamento local -> global por similaridade dos centróides
+    globais = resultados[GLOBAL]
+    linhas_alinhamento = []
+    partes_docs = []
+    for pais, pos in particoes.items():
+        if pais not in resultados:
+            continue
+        r = resultados[pais]
+        mapa = alinhar(r["centroides"], globais["centroides"], limiar)
+        tamanhos = pd.Series(r["topics"]).value_counts()
+
+        for t, (g, sim) in mapa.items():
+            linhas_alinhamento.append({
+                "pais": pais,
+                "topic_local": t,
+                "n_docs": int(tamanhos.get(t, 0)),
+                "palavras_local": r["palavras"].get(t, ""),
+                "topic_global": g,
+                "similaridade": round(sim, 4),
+                "palavras_global": globais["palavras"].get(g, ""),
+            })
+
+        ids = df['id'].iloc[pos] if 'id' in df.columns else df.index[pos].to_series()
+        partes_docs.append(pd.DataFrame({
+            "id": ids.astype(str).to_numpy(),
+            "pais": pais,
+            "topic_local": r["topics"],
+            "topic_local_prob": r["probs"] if r["probs"] is not None else np.nan,
+            "topic_global": pd.Series(r["topics"]).map(lambda t: mapa.get(t, (-1, 0))[0]).astype('int32').to_numpy(),
+        }))
+
+    alinhamento = pd.DataFrame(linhas_alinhamento)
+    alinhamento.to_csv(output_dir_path / "alinhamento_paises.csv", index=False, encoding='utf-8-sig')
+
+    if partes_docs:
+        docs = pd.concat(partes_docs, ignore_index=True)
+        docs['pais'] = docs['pais'].astype('category')
+        docs.to_parquet(output_dir_path / "topicos_por_pais.parquet", index=False)
+    medicao.marcar("write")
+
+    print(f"\n   -> Alinhamento: alinhamento_paises.csv ({len(alinhamento)} tópicos locais)")
+    print(f"   -> Tópicos por documento: topicos_por_pais.parquet")
+    if len(alinhamento):
+        sem_par = (alinhamento['topic_global'] == -1).sum()
+        print(f"   Tópicos locais sem correspondente global (similaridade < {limiar}): {sem_par}")
+    print(f"\nConcluído! Verifique a pasta: {output_dir}")
+    medicao.finalizar(n_docs=len(df))
+
+if __name__ == "__main__":
+    app()
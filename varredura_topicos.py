@@ -0,0 +1,251 @@
+import pandas as pd
+import numpy as np
+import typer
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from matriz_embeddings import ler_documentos, carregar_matriz
+from keywords import carregar_stopwords
+from idiomas import codigo_idioma
+from BERTopic import KMEANS_N_CLUSTERS, UMAP_N_NEIGHBORS, HDB_MIN_CLUSTER_SIZE
+from instrumentacao import Medicao
+
+# Varredura de hiperparâmetros do modelo de tópicos.
+# Cada redução UMAP distinta é calculada uma vez e guardada em disco (chave = impressão
+# digital dos embeddings + parâmetros do UMAP); os agrupamentos (KMeans / HDBSCAN) de
+# cada redução rodam em paralelo num pool de processos, que leem a redução com mmap.
+
+app = typer.Typer()
+
+# mesmas configurações fixas do UMAP nos scripts de tópicos
+UMAP_METRICA = 'cosine'
+UMAP_SEED = 42
+
+def impressao_digital(embeddings, bloco=65536):
+    """sha256 do conteúdo da matriz (formato, dtype e bytes), lida em blocos."""
+    h = hashlib.sha256(f"{embeddings.shape}|{embeddings.dtype}".encode())
+    for i in range(0, embeddings.shape[0], bloco):
+        h.update(np.ascontiguousarray(embeddings[i:i + bloco]).tobytes())
+    return h.hexdigest()
+
+def chave_reducao(digital, vizinhos, componentes, min_dist):
+    params = {"emb": digital, "n_neighbors": vizinhos, "n_components": componentes,
+              "min_dist": min_dist, "metric": UMAP_METRICA, "random_state": UMAP_SEED}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:20]
+
+def reduzir(embeddings, pasta_cache, digital, vizinhos, componentes, min_dist):
+    """Devolve o caminho do .npy com a redução UMAP, calculando só se ainda não estiver no cache."""
+    path = Path(pasta_cache) / f"umap_{chave_reducao(digital, vizinhos, componentes, min_dist)}.npy"
+    if path.exists():
+        print(f"   [cache] UMAP n_neighbors={vizinhos} n_components={componentes} min_dist={min_dist}")
+        return path
+
+    from umap import UMAP
+    print(f"   [calc]  UMAP n_neighbors={vizinhos} n_components={componentes} min_dist={min_dist}...")
+    umap_model = UMAP(n_neighbors=vizinhos, n_components=componentes, min_dist=min_dist,
+                      metric=UMAP_METRICA, random_state=UMAP_SEED)
+    reduzido = umap_model.fit_transform(np.asarray(embeddings, dtype=np.float32))
+
+    # grava num temporário e renomeia, pra nunca deixar um .npy pela metade no cache
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp.npy')
+    np.save(tmp, np.ascontiguousarray(reduzido, dtype=np.float32))
+    os.replace(tmp, path)
+    return path
+
+def matriz_documento_termo(listas, stopwords):
+    """Matriz esparsa documento x termo (contagens) a partir das listas de lemas."""
+    from scipy import sparse
+
+    tamanhos = np.fromiter((len(l) for l in listas), dtype=np.int64, count=len(listas))
+    termos = pd.Series([t for l in listas for t in l], dtype=object)
+    linhas = np.repeat(np.arange(len(listas)), tamanhos)
+
+    validos = (termos.str.len() > 2) & ~termos.isin(stopwords)
+    codigos, vocab = pd.factorize(termos[validos])
+    X = sparse.csr_matrix(
+        (np.ones(len(codigos), dtype=np.float32), (linhas[validos.to_numpy()], codigos)),
+        shape=(len(listas), len(vocab)),
+    )
+    X.sum_duplicates()
+    return X, np.asarray(vocab)
+
+def listas_de_termos(df):
+    if 'lemas' in df.columns:
+        return [list(l) if l is not None else [] for l in df['lemas']]
+    return [str(t).lower().split() for t in df['texto']]
+
+# --- parte que roda dentro dos processos do pool ---
+
+_contagens = None
+_presenca = None
+_reducoes = {}
+
+def iniciar_worker(contagens):
+    global _contagens, _presenca
+    _contagens = contagens
+    _presenca = contagens.copy()
+    _presenca.data[:] = 1
+
+def coerencia_umass(rotulos, top_n):
+    """Coerência UMass média dos tópicos, com as top_n palavras de cada tópico pelo c-TF-IDF."""
+    from scipy import sparse
+
+    topicos = np.unique(rotulos[rotulos >= 0])
+    if len(topicos) == 0:
+        return float('nan')
+
+    # c-TF-IDF igual ao do BERTopic: tf por tópico * log(1 + média de palavras por tópico / freq. do termo)
+    mapa = {t: i for i, t in enumerate(topicos)}
+    docs = np.flatnonzero(rotulos >= 0)
+    classes = np.array([mapa[t] for t in rotulos[docs]])
+    P = sparse.csr_matrix((np.ones(len(docs)), (classes, docs)), shape=(len(topicos), len(rotulos)))
+    tf = np.asarray((P @ _contagens).todense())
+    freq = tf.sum(axis=0)
+    idf = np.log(1 + tf.sum(axis=1).mean() / np.maximum(freq, 1))
+    ctfidf = tf / np.maximum(tf.sum(axis=1, keepdims=True), 1) * idf
+
+    coerencias = []
+    for linha in ctfidf:
+        top = np.argsort(linha)[::-1][:top_n]
+        top = top[linha[top] > 0]
+        if len(top) < 2:
+            continue
+        # D(wi, wj) = documentos com as duas palavras, D(wj) = documentos com wj
+        sub = _presenca[:, top]
+        co = np.asarray((sub.T @ sub).todense())
+        df_termos = np.diag(co)
+        i, j = np.tril_indices(len(top), k=-1)
+        coerencias.append(np.mean(np.log((co[i, j] + 1) / df_termos[j])))
+
+    return float(np.mean(coerencias)) if coerencias else float('nan')
+
+def rodar_variante(tarefa):
+    """Agrupa uma redução com um algoritmo/parâmetro e calcula as métricas da tabela."""
+    from sklearn.metrics import silhouette_score
+
+    t0 = time.perf_counter()
+    path = tarefa["reducao"]
+    if path not in _reducoes:
+        _reducoes[path] = np.load(path, mmap_mode='r')
+    X = _reducoes[path]
+
+    if tarefa["algoritmo"] == "kmeans":
+        from sklearn.cluster import KMeans
+        rotulos = KMeans(n_clusters=tarefa["parametro"], random_state=42, n_init='auto').fit_predict(X)
+    else:
+        # mesmo HDBSCAN que o BERTopic usa por padrão; sem o pacote, o do sklearn
+        try:
+            from hdbscan import HDBSCAN
+            modelo = HDBSCAN(min_cluster_size=tarefa["parametro"], metric='euclidean', cluster_selection_method='eom')
+        except ImportError:
+            from sklearn.cluster import HDBSCAN
+            modelo = HDBSCAN(min_cluster_size=tarefa["parametro"], metric='euclidean', cluster_selection_method='eom')
+        rotulos = modelo.fit_predict(np.asarray(X))
+
+    rotulos = np.asarray(rotulos)
+    dentro = rotulos >= 0
+    n_topicos = len(np.unique(rotulos[dentro]))
+
+    silhueta = float('nan')
+    if 2 <= n_topicos < dentro.sum():
+        amostra = min(tarefa["amostra_silhueta"], int(dentro.sum()))
+        silhueta = float(silhouette_score(np.asarray(X)[dentro], rotulos[dentro], sample_size=amostra, random_state=42))
+
+    return {
+        **{k: v for k, v in tarefa.items() if k not in ("reducao", "amostra_silhueta", "top_n")},
+        "n_topicos": n_topicos,
+        "outliers": float(1 - dentro.mean()),
+        "silhueta": silhueta,
+        "coerencia_umass": coerencia_umass(rotulos, tarefa["top_n"]),
+        "tempo_s": round(time.perf_counter() - t0, 2),
+    }
+
+@app.command()
+def main(
+    input_file: str = typer.Argument("data/embeddings/embeddings.parquet", help="Parquet de embeddings (saída do embeddings.py)"),
+    vizinhos: list[int] = typer.Option([UMAP_N_NEIGHBORS], "--vizinhos", help="n_neighbors do UMAP (pode repetir)"),
+    componentes: list[int] = typer.Option([5], "--componentes", help="n_components do UMAP (pode repetir)"),
+    min_dist: list[float] = typer.Option([0.0], "--min-dist", help="min_dist do UMAP (pode repetir)"),
+    kmeans: list[int] = typer.Option([KMEANS_N_CLUSTERS], "--kmeans", help="K do KMeans (pode repetir; 0 desliga)"),
+    min_cluster: list[int] = typer.Option([HDB_MIN_CLUSTER_SIZE], "--min-cluster", help="min_cluster_size do HDBSCAN (pode repetir; 0 desliga)"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processos para os agrupamentos"),
+    cache_dir: str = typer.Option("data/cache/umap", help="Pasta do cache das reduções UMAP"),
+    output_file: str = typer.Option("results/topics/varredura.csv", "--output", "-o", help="Tabela comparativa"),
+    top_n: int = typer.Option(10, help="Palavras por tópico na coerência"),
+    amostra_silhueta: int = typer.Option(10000, help="Documentos amostrados no cálculo da silhueta"),
+):
+    medicao = Medicao("varredura_topicos", input_file=input_file, workers=workers)
+    print("--- Varredura de hiperparâmetros (UMAP + KMeans/HDBSCAN) ---")
+
+    path_in = Path(input_file)
+    if not path_in.exists():
+        print(f"ERRO: Arquivo não encontrado: {input_file}")
+        sys.exit(1)
+
+    df = ler_documentos(path_in)
+    if 'texto' not in df.columns:
+        print("ERRO: Falta a coluna obrigatória 'texto'.")
+        sys.exit(1)
+
+    embeddings = carregar_matriz(df, path_in)
+    if embeddings is None:
+        print("ERRO: Embeddings não encontrados (nem coluna 'embedding' nem matriz .npy).")
+        sys.exit(1)
+
+    variantes = [("kmeans", k) for k in kmeans if k > 0] + [("hdbscan", m) for m in min_cluster if m > 0]
+    if not variantes:
+        print("ERRO: Nenhum agrupamento para testar (--kmeans e --min-cluster vazios).")
+        sys.exit(1)
+
+    # stopwords dos idiomas presentes, pra coerência não ser dominada por "de", "que"...
+    idiomas = df['idioma'].dropna().unique() if 'idioma' in df.columns else ['pt']
+    stopwords = set().union(*[carregar_stopwords(c) for c in {codigo_idioma(i) for i in idiomas}])
+    contagens, vocab = matriz_documento_termo(listas_de_termos(df), stopwords)
+    print(f"{len(df)} documentos, vocabulário de {len(vocab)} termos")
+    medicao.dataframe("entrada", df)
+    medicao.marcar("load")
+
+    # 1. reduções: uma por combinação distinta de parâmetros do UMAP
+    print("Reduções UMAP:")
+    digital = impressao_digital(embeddings)
+    reducoes = {}
+    for v in dict.fromkeys(vizinhos):
+        for c in dict.fromkeys(componentes):
+            for d in dict.fromkeys(min_dist):
+                reducoes[(v, c, d)] = str(reduzir(embeddings, cache_dir, digital, v, c, d))
+    medicao.marcar("reducao")
+
+    # 2. agrupamentos em paralelo
+    tarefas = [
+        {"n_neighbors": v, "n_components": c, "min_dist": d, "algoritmo": alg, "parametro": p,
+         "reducao": path, "amostra_silhueta": amostra_silhueta, "top_n": top_n}
+        for (v, c, d), path in reducoes.items()
+        for alg, p in variantes
+    ]
+    print(f"\nRodando {len(tarefas)} variantes em {workers} processos...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_worker, initargs=(contagens,)) as pool:
+        resultados = []
+        for r in pool.map(rodar_variante, tarefas):
+            print(f"   {r['algoritmo']}={r['parametro']} (UMAP {r['n_neighbors']}/{r['n_components']}/{r['min_dist']}): "
+                  f"{r['n_topicos']} tópicos, {r['outliers']:.1%} outliers")
+            resultados.append(r)
+    medicao.marcar("process")
+
+    tabela = pd.DataFrame(resultados).sort_values("coerencia_umass", ascending=False)
+    path_out = Path(output_file)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    tabela.to_csv(path_out, index=False, encoding='utf-8-sig')
+    medicao.marcar("write")
+
+    print("\n--- Comparação (ordenada por coerência UMass) ---")
+    print(tabela.to_string(index=False))
+    print(f"\nTabela salva em: {output_file}")
+    medicao.finalizar(n_docs=len(df))
+
+if __name__ == "__main__":
+    app()